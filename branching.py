@@ -0,0 +1,187 @@
+"""
+Run variants of a world on from one burn-in, so the burn-in is paid for once rather than by every variant:
+    world = World(**cfg.world['settings'])
+    for _ in range(2000):
+        run_day(world)
+    results = branch(world, {'slow_growth': {'config': {'food': {'growth_rate': 5}}},
+                             'other_stream': {'seed': 'other'}}, days=1000)
+Each branch is a copy of the world in a forked process, sharing the burned-in world's memory until it writes to it, or
+where os.fork is not available, a copy unpickled from an in-memory snapshot of it.
+"""
+
+import contextlib
+import os
+import pickle
+import random
+import selectors
+import sys
+import traceback
+from multiprocessing import Pool
+from job_server import apply_config_overrides, restore_config, config_lines
+from simulation import run_day
+from validation import world_statistics
+from world_recorder import WorldRecorder
+
+METHODS = ['fork', 'snapshot']
+
+
+def take_snapshot(world):
+    """Return the world and the state of the random module pickled, without the recorders attached to the world."""
+    attached = world.history, world.gene_histograms, world.lineage
+    world.history, world.gene_histograms, world.lineage = None, None, None
+    try:
+        return pickle.dumps((world, random.getstate()), protocol=pickle.HIGHEST_PROTOCOL)
+    finally:
+        world.history, world.gene_histograms, world.lineage = attached
+
+
+def restore_snapshot(snapshot):
+    """Return a copy of a world from its snapshot, setting the random module to the state it was taken in."""
+    world, random_state = pickle.loads(snapshot)
+    random.setstate(random_state)
+    return world
+
+
+def run_branch(world, name, spec, days, measure=world_statistics, record=True):
+    """
+    Run a branch on from a world, changing the world in place.
+    :param world: The world, a copy of the burned-in world
+    :param name: The name of the branch, its world's seed is the burned-in world's seed followed by the name
+    :param spec: Dict of the branch's config overrides, as for apply_config_overrides, and the seed of its random
+    stream, None to carry on the burned-in world's stream
+    :param days: The number of days to run the branch for
+    :param measure: Function of the branch's world returning its result
+    :param record: Set to True to record the branch with a WorldRecorder, as a run of main.py is
+    :return: The result of measure
+    """
+    replaced = apply_config_overrides(spec.get('config', {}))
+    try:
+        if spec.get('seed') is not None:
+            random.seed(spec['seed'])
+        parent_seed, world.seed = world.seed, '%s_%s' % (world.seed, name)
+        world.history, world.gene_histograms, world.lineage = None, None, None
+
+        # Worlds print each day, keep it out of the output of the branching run
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            world_recorder = WorldRecorder(world) if record else None
+            if world_recorder is not None:
+                with open(os.path.join('data', world.seed, 'config.py'), 'a') as config_file:
+                    config_file.write('\n# Branch of %s at time %d\n' % (parent_seed, world.time))
+                    for line in config_lines(replaced) + (['# random.seed(%r)' % spec['seed']]
+                                                          if spec.get('seed') is not None else []):
+                        config_file.write(line + '\n')
+
+            for day in range(days + 1):
+                if world_recorder is not None:
+                    world_recorder.generate_world_stats()
+                    world_recorder.generate_world_data()
+                    world_recorder.output_world_data()
+                if day < days:
+                    run_day(world)
+
+            if world_recorder is not None:
+                world_recorder.output_world_stats()
+        return measure(world)
+    finally:
+        restore_config(replaced)
+
+
+def _run_snapshot_branch(arguments):
+    snapshot, name, spec, days, measure, record = arguments
+    return run_branch(restore_snapshot(snapshot), name, spec, days, measure, record)
+
+
+def _fork_branches(world, branches, days, measure, record, processes):
+    """Run each branch in a forked child, a few at a time, reading their pickled results back over pipes."""
+    results, failures = {}, {}
+    pending = list(branches.items())
+    selector = selectors.DefaultSelector()
+    sys.stdout.flush()  # a child would write out anything left in the buffer again
+    sys.stderr.flush()
+    random_state = random.getstate()  # the random module reseeds itself in forked children
+
+    while pending or selector.get_map():
+        while pending and len(selector.get_map()) < processes:
+            name, spec = pending.pop(0)
+            read_fd, write_fd = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                os.close(read_fd)
+                random.setstate(random_state)
+                try:
+                    outcome = (True, run_branch(world, name, spec, days, measure, record))
+                except BaseException:
+                    outcome = (False, traceback.format_exc())
+                with os.fdopen(write_fd, 'wb') as pipe:
+                    pickle.dump(outcome, pipe, protocol=pickle.HIGHEST_PROTOCOL)
+                os._exit(0)
+
+            os.close(write_fd)
+            selector.register(read_fd, selectors.EVENT_READ, (name, pid, []))
+
+        # Read the pipes as the children write, a result larger than a pipe holds would otherwise block its child
+        for key, _ in selector.select():
+            name, pid, chunks = key.data
+            chunk = os.read(key.fd, 1 << 16)
+            if chunk:
+                chunks.append(chunk)
+                continue
+
+            selector.unregister(key.fd)
+            os.close(key.fd)
+            _, status = os.waitpid(pid, 0)
+            if not chunks:
+                failures[name] = 'the branch process ended with status %d' % status
+                continue
+            succeeded, outcome = pickle.loads(b''.join(chunks))
+            if succeeded:
+                results[name] = outcome
+            else:
+                failures[name] = outcome
+
+    selector.close()
+    return results, failures
+
+
+def branch(world, branches, days, measure=world_statistics, record=True, processes=None, method=None):
+    """
+    Run branches on from a burned-in world, each with its own config overrides and random stream.
+
+    A branch that carries on the world's random stream draws the same random numbers as the other such branches until
+    their settings make them draw differently, so differences between them are down to their settings more than chance.
+    The burned-in world itself is left as it was.
+    :param world: The burned-in world
+    :param branches: Dict of the specs of the branches by name, see run_branch
+    :param days: The number of days to run each branch for
+    :param measure: Function of a branch's world returning its result, which is pickled back,
+    validation.world_statistics by default
+    :param record: Set to True to record each branch in data/<world seed>_<branch name> as a run of main.py is
+    :param processes: The number of branches run at once, one per CPU by default
+    :param method: 'fork' to fork a child for each branch, or 'snapshot' to unpickle each branch from a snapshot of the
+    world, fork where os.fork is available by default
+    :return: Dict of the results of the branches by name
+    """
+    method = method if method is not None else 'fork' if hasattr(os, 'fork') else 'snapshot'
+    if method not in METHODS:
+        raise ValueError('branching method must be one of %s, not %r' % (', '.join(METHODS), method))
+    processes = processes if processes is not None else os.cpu_count()
+
+    if method == 'fork':
+        finished, failures = _fork_branches(world, branches, days, measure, record, processes)
+        results = {name: finished[name] for name in branches if name in finished}
+    else:
+        snapshot = take_snapshot(world)
+        tasks = [(snapshot, name, spec, days, measure, record) for name, spec in branches.items()]
+        if processes == 1:
+            random_state = random.getstate()
+            outcomes = [_run_snapshot_branch(task) for task in tasks]
+            random.setstate(random_state)
+        else:
+            with Pool(processes) as pool:
+                outcomes = pool.map(_run_snapshot_branch, tasks)
+        results, failures = dict(zip(branches, outcomes)), {}
+
+    if failures:
+        raise RuntimeError('branches failed:\n' + '\n'.join('%s: %s' % (name, failure)
+                                                              for name, failure in failures.items()))
+    return results
@@ -8,6 +8,45 @@ save_world_view_every_day = False
 check_newly_spawned_plants = False  # for debugging
 check_newly_spawned_bugs = False
 
+# Monitoring
+live_feed = False  # publish the grid and daily statistics to shared memory, watch with: python live_feed.py <seed>
+memory_report_interval = None  # days between memory samples, see data_files/memory_report.txt, None to not sample
+memory_report_method = 'rss'  # 'rss', or 'tracemalloc' to also count matplotlib allocations at a cost in speed
+
+# Recording
+world_data_format = 'csv'  # 'csv' for a file per day, 'history' for a log of events with keyframes, or 'none'
+world_data_policy = 'every'  # 'every' interval days, 'log' for log-spaced days or 'change', see recording_policy.py
+world_data_interval = 1  # days between recordings of the world data
+stats_policy = 'every'  # which days of statistics are written, as for the world data
+stats_interval = 1  # days between written statistics
+log_days_per_decade = 20  # recordings for each tenfold increase in time of the 'log' policies
+change_threshold = 0.1  # relative change in a population or average reproduction threshold that triggers 'change'
+change_max_gap = 1000  # most days between recordings of the 'change' policies, None for no limit
+history_keyframe_interval = 100  # days between full copies of the world in a history
+gene_histograms = False  # write the taste and reproduction threshold histograms of each day, see gene_histograms.py
+lineage_tracking = False  # record the parent of every organism, written to data_files/lineage.npz
+lineage_prune_interval = 100  # days between dropping the records of lineages that died out
+world_index = False  # also bucket each day's organisms by day range and tile for region queries, see world_index.py
+index_chunk_days = 100
+index_tile_size = 16  # squares
+stats_flush_interval = 100  # days of statistics held in memory before they are appended to the CSV files
+stats_fsync = False  # force each flush of statistics onto the disk
+run_catalogue = False  # also store the config and statistics of each run in data/runs.sqlite, see run_catalogue.py
+
+# Job server, see job_server.py
+job_server_socket = 'data/job_server.sock'  # Unix socket the server listens on unless given a port
+job_server_workers = None  # warm worker processes running the submitted runs, one per CPU by default
+
+# Analysis
+lv_estimation_window = 200  # days fitted by the online Lotka-Volterra estimator, set to None to disable
+
+# Stopping, a run without a day or wall-clock budget also ends when the Enter key is pressed
+stop_days = None  # days to run
+stop_wall_clock = None  # seconds to run
+stop_on_extinction = True  # end once plants or bugs die out after the endangered time
+steady_state_window = None  # days in each half of the window compared for a steady state, None to not check
+steady_state_tolerance = 0.05  # largest change in mean or spread between the halves, relative to the level
+
 # World set up
 world = dict(
     settings=dict(
@@ -16,7 +55,9 @@ world = dict(
         columns=128,
         fertile_lands=None,  # fertile_lands=[[[20, 20], [29, 29]], [[50, 20], [59, 29]], [[20, 50], [29, 59]]])
         init_food=100,
-        init_bugs=10
+        init_bugs=10,
+        active_set_scheduling=False,  # skip plants that cannot change state, changes the random draws for a seed
+        packed_grid=False  # hold the grid in 2 bits per square instead of a byte, slower to read and write
     ),
     food_spawn_vals=dict(
         energy=20,
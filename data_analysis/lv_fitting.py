@@ -0,0 +1,117 @@
+import sys
+import numpy as np
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from scipy.integrate import odeint
+from scipy.optimize import minimize, differential_evolution
+from scipy.stats import qmc
+from data_analysis import competitive_lv, CC
+
+PARAMETERS = ['alpha', 'beta', 'delta', 'gamma']
+BOUNDS = {'alpha': (0.1, 0.3), 'beta': (4e-05, 6e-05), 'delta': (6e-05, 8e-05), 'gamma': (0.1, 0.3)}
+
+
+def competitive_lv_jacobian(population, t, alpha, beta, delta, gamma):
+    """Analytic Jacobian of competitive_lv with respect to the populations."""
+    x, y = population
+    return [[alpha * (1 - 2 * x / CC) - beta * y, -beta * x],
+            [delta * y, delta * x - gamma]]
+
+
+@lru_cache(maxsize=4096)
+def integrate(parameters, initial_populations, sample_size):
+    """Integrate competitive_lv once per parameter vector, repeated evaluations are served from the cache."""
+    t = np.arange(0, sample_size, 1)
+    model = odeint(competitive_lv, initial_populations, t, args=parameters, Dfun=competitive_lv_jacobian)
+    model.flags.writeable = False  # shared between callers through the cache
+    return model
+
+
+def objective(scaled_parameters, data, bounds, fixed):
+    """Mean squared error of the model for parameters scaled onto the unit box of their bounds."""
+    parameters = unscale(scaled_parameters, bounds, fixed)
+    model = integrate(parameters, tuple(data[0]), len(data))
+    return np.sum(np.square(model - data)) / len(data)
+
+
+def unscale(scaled_parameters, bounds, fixed):
+    """Map unit box co-ordinates of the free parameters to a full (alpha, beta, delta, gamma) tuple."""
+    free = iter(scaled_parameters)
+    parameters = []
+    for name in PARAMETERS:
+        if name in fixed:
+            parameters.append(float(fixed[name]))
+        else:
+            low, high = bounds[name]
+            parameters.append(low + float(next(free)) * (high - low))
+    return tuple(parameters)
+
+
+def local_fit(start, data, bounds, fixed):
+    """Run one bounded local minimisation from a start point in the unit box."""
+    return minimize(objective, start, args=(data, bounds, fixed), bounds=[(0, 1)] * len(start), method='L-BFGS-B')
+
+
+def fit(data, bounds=None, fixed=None, starts=16, method='multi_start', executor=None, seed=0):
+    """
+    Fit competitive_lv to a [plants, bugs] population series.
+    :param data: Array of populations with a row per day
+    :param bounds: Dict of (low, high) bounds for each parameter, BOUNDS by default
+    :param fixed: Dict of parameter values to hold fixed, e.g. {'alpha': 0.193485, 'gamma': 0.209544}
+    :param starts: Number of local minimisations for 'multi_start', or population size for 'differential_evolution'
+    :param method: 'multi_start' (Latin hypercube starts) or 'differential_evolution'
+    :param executor: A process pool to spread the work over, the fit is serial if None
+    :param seed: Seed for the start points
+    :return: Dict of fitted parameters and the objective value
+    """
+    data = np.asarray(data, dtype=float)
+    bounds = dict(BOUNDS, **(bounds or {}))
+    fixed = fixed or {}
+    dimensions = len([name for name in PARAMETERS if name not in fixed])
+    mapper = executor.map if executor is not None else map
+
+    if method == 'multi_start':
+        start_points = qmc.LatinHypercube(d=dimensions, seed=seed).random(starts)
+        results = list(mapper(local_fit, start_points, [data] * starts, [bounds] * starts, [fixed] * starts))
+        best = min(results, key=lambda result: result.fun)
+        x, fun = best.x, best.fun
+    elif method == 'differential_evolution':
+        best = differential_evolution(objective, [(0, 1)] * dimensions, args=(data, bounds, fixed), popsize=starts,
+                                      seed=seed, polish=True, updating='deferred' if executor else 'immediate',
+                                      workers=mapper if executor else 1)
+        x, fun = best.x, best.fun
+    else:
+        raise ValueError('unknown fitting method %r' % method)
+
+    fitted = dict(zip(PARAMETERS, unscale(x, bounds, fixed)))
+    fitted['objective'] = fun
+    return fitted
+
+
+def _fit_one(args):
+    data, kwargs = args
+    return fit(data, **kwargs)
+
+
+def fit_ensemble(datasets, processes=None, **kwargs):
+    """
+    Fit every run of an ensemble, one run per worker process.
+    :param datasets: List of [plants, bugs] population series
+    :param processes: Number of worker processes, the number of CPUs by default
+    :param kwargs: Passed to fit for each run
+    :return: List of fitted parameter dicts in the order of the datasets
+    """
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(_fit_one, [(data, kwargs) for data in datasets]))
+
+
+if __name__ == '__main__':
+    # python lv_fitting.py para_fit_.csv [more runs ...]
+    paths = sys.argv[1:] or ['para_fit_.csv']
+
+    if len(paths) == 1:
+        with ProcessPoolExecutor() as pool:
+            print(fit(np.loadtxt(paths[0], delimiter=','), executor=pool))
+    else:
+        for path, fitted in zip(paths, fit_ensemble([np.loadtxt(path, delimiter=',') for path in paths])):
+            print(path, fitted)
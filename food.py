@@ -29,6 +29,11 @@ class Food(Organism):
 
         Organism.__init__(self, position, energy, new_rep_thresh, energy_max, new_taste)
 
+    @classmethod
+    def unevolved_reproduction_thresholds(cls, number, reproduction_threshold, rng):
+        """Return thresholds mutated around the configured spawn value, as Food.__init__ does for each plant."""
+        return cls.mutate_all(cfg.world['food_spawn_vals']['reproduction_threshold'], 5, number, rng)
+
     def grow(self):
         self.lifetime += 1
         if self.energy < self.energy_max:
@@ -0,0 +1,141 @@
+import numpy as np
+import os
+from constants import FOOD_NAME, BUG_NAME
+from world_history import pack_columns, unpack_columns, index_dtype
+
+TASTE_BIN = 6  # taste bin width of the joint histogram, matching the gene heat maps
+REPRODUCTION_THRESHOLD_BIN = 2  # reproduction threshold bin width of the joint histogram
+TASTE_BINS = 360 // TASTE_BIN
+
+
+def histograms_path(seed):
+    return os.path.join('data', seed, 'data_files', 'gene_histograms')
+
+
+class GeneHistograms:
+    """
+    A class to count the tastes and reproduction thresholds of the alive organisms of each type as they spawn and die.
+
+    Genes only change when an organism is born, so a spawn or kill is one increment of each histogram.
+    """
+
+    def __init__(self, world):
+        """
+        Gene Histograms Initialisation
+        :param world: The world to count, its current organisms are counted and its spawns and kills from now on
+        """
+        self.world = world
+        self.taste = {name: [0] * 360 for name in (FOOD_NAME, BUG_NAME)}
+        self.reproduction_threshold = {name: [] for name in (FOOD_NAME, BUG_NAME)}  # grows with the largest value
+        self.joint = {name: [] for name in (FOOD_NAME, BUG_NAME)}  # [reproduction threshold bin][taste bin]
+
+        for name in (FOOD_NAME, BUG_NAME):
+            for organism in world.organism_lists[name]['alive']:
+                self.add(organism)
+
+        world.gene_histograms = self
+
+    def add(self, organism):
+        self._count(organism, 1)
+
+    def remove(self, organism):
+        self._count(organism, -1)
+
+    def _count(self, organism, change):
+        name, reproduction_threshold = organism.name, organism.reproduction_threshold
+        self.taste[name][organism.taste] += change
+
+        counts = self.reproduction_threshold[name]
+        if reproduction_threshold >= len(counts):
+            counts.extend([0] * (reproduction_threshold + 1 - len(counts)))
+        counts[reproduction_threshold] += change
+
+        joint, joint_bin = self.joint[name], reproduction_threshold // REPRODUCTION_THRESHOLD_BIN
+        while joint_bin >= len(joint):
+            joint.append([0] * TASTE_BINS)
+        joint[joint_bin][organism.taste // TASTE_BIN] += change
+
+    def arrays(self, name):
+        """Return the taste, reproduction threshold and joint histograms of an organism type as arrays."""
+        return (np.array(self.taste[name]), np.array(self.reproduction_threshold[name], dtype=np.int64),
+                np.array(self.joint[name], dtype=np.int64).reshape(-1, TASTE_BINS))
+
+
+class HistogramWriter:
+    """
+    A class to write the gene histograms of a world each day, instead of a snapshot of every organism.
+    """
+
+    def __init__(self, world):
+        """
+        Histogram Writer Initialisation
+        :param world: The world being recorded
+        """
+        self.world = world
+        self.gene_histograms = GeneHistograms(world)
+
+        path = histograms_path(world.seed)
+        if not os.path.exists(path):
+            os.makedirs(path)
+        self.histograms_file = open(os.path.join(path, 'histograms.bin'), 'wb')
+        self.index_file = open(os.path.join(path, 'index.bin'), 'wb')
+
+    def write_day(self):
+        columns = []
+        for name in (FOOD_NAME, BUG_NAME):
+            columns += [column.ravel() for column in self.gene_histograms.arrays(name)]
+        block = pack_columns(columns)
+
+        np.array([(self.world.time, False, self.histograms_file.tell(), len(block))],
+                 dtype=index_dtype).tofile(self.index_file)
+        self.histograms_file.write(block)
+        self.histograms_file.flush()
+        self.index_file.flush()
+
+    def close(self):
+        self.histograms_file.close()
+        self.index_file.close()
+
+
+class HistogramReader:
+    """
+    A class to read the daily gene histograms of a run.
+    """
+
+    def __init__(self, seed):
+        """
+        Histogram Reader Initialisation
+        :param seed: The seed of the run to read
+        """
+        path = histograms_path(seed)
+        self.index = np.fromfile(os.path.join(path, 'index.bin'), dtype=index_dtype)
+        self.days = self.index['day']
+        self.histograms_file = open(os.path.join(path, 'histograms.bin'), 'rb')
+
+    @staticmethod
+    def exists(seed):
+        return os.path.exists(os.path.join(histograms_path(seed), 'index.bin'))
+
+    def __contains__(self, day):
+        i = np.searchsorted(self.days, day)
+        return i < len(self.days) and self.days[i] == day
+
+    def read_day(self, day):
+        """
+        Read the gene histograms of a time.
+        :param day: The time to read
+        :return: Dict keyed by organism name of dicts of 'taste', 'reproduction_threshold' and 'joint' count arrays
+        """
+        if day not in self:
+            raise KeyError('day %r has no gene histograms' % day)
+
+        i = np.searchsorted(self.days, day)
+        self.histograms_file.seek(int(self.index['offset'][i]))
+        columns = unpack_columns(self.histograms_file.read(int(self.index['length'][i])))
+
+        histograms = {}
+        for name, (taste, reproduction_threshold, joint) in zip((FOOD_NAME, BUG_NAME), [columns[:3], columns[3:]]):
+            histograms[name] = {'taste': taste.astype(np.int64),
+                                'reproduction_threshold': reproduction_threshold.astype(np.int64),
+                                'joint': joint.astype(np.int64).reshape(-1, TASTE_BINS)}
+        return histograms
@@ -0,0 +1,475 @@
+"""
+Serve runs to a pool of warm worker processes: python job_server.py serve [--socket PATH | --port PORT] [--workers N]
+Submit a run and watch its progress: python job_server.py submit '{"days": 500, "config": {"food": {"growth_rate": 5}}}'
+Watch, cancel or list runs: python job_server.py watch JOB | cancel JOB | jobs
+Clients talk to the server in lines of JSON over a Unix socket, data/job_server.sock by default, or localhost TCP:
+    {"command": "submit", "spec": SPEC}  queue a run, the reply is followed by its events until it ends
+    {"command": "watch", "job": JOB}  the status of a run, followed by its events until it ends
+    {"command": "cancel", "job": JOB}  cancel a queued or running run
+    {"command": "jobs"}  the status of every run
+A spec may hold the seed, days, max_seconds, config overrides, stream_every days between streamed statistics, and
+plot. Each worker imports numpy, the world and matplotlib once and then runs one world after another.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import multiprocessing
+import os
+import traceback
+from collections import deque
+import config as cfg
+from constants import FOOD_NAME, BUG_NAME
+
+SPEC_FIELDS = ['seed', 'days', 'max_seconds', 'config', 'stream_every', 'plot']
+ENDED = ['finished', 'cancelled', 'failed']
+
+
+def _get(container, name):
+    return container[name] if isinstance(container, dict) else getattr(container, name)
+
+
+def _set(container, name, value):
+    if isinstance(container, dict):
+        container[name] = value
+    else:
+        setattr(container, name, value)
+
+
+def _setting_name(path):
+    return path[0] + ''.join('[%r]' % key for key in path[1:])
+
+
+def apply_config_overrides(overrides):
+    """
+    Replace settings of the config module in place. Nested dicts are merged key by key, so {'food': {'growth_rate': 5}}
+    only replaces the growth rate. The organism classes keep copies of some settings, these are updated too.
+    :param overrides: Dict of settings by name
+    :return: List of the (path, previous value) of each replaced setting, to put them back with restore_config
+    """
+    replaced = []
+
+    def merge(container, items, path):
+        for name, value in items.items():
+            if (name not in container) if isinstance(container, dict) else not hasattr(container, name):
+                raise KeyError('unknown setting %s' % _setting_name(path + [name]))
+
+            current = _get(container, name)
+            if isinstance(current, dict) and isinstance(value, dict):
+                merge(current, value, path + [name])
+            else:
+                replaced.append((path + [name], current))
+                _set(container, name, value)
+
+    try:
+        merge(cfg, overrides, [])
+    except KeyError:
+        restore_config(replaced)
+        raise
+    _update_organism_classes()
+    return replaced
+
+
+def restore_config(replaced):
+    """Put back the settings replaced by apply_config_overrides."""
+    for path, value in reversed(replaced):
+        container = cfg
+        for name in path[:-1]:
+            container = _get(container, name)
+        _set(container, path[-1], value)
+    _update_organism_classes()
+
+
+def _update_organism_classes():
+    from food import Food
+    from bug import Bug
+    for organism_class, settings in ((Food, cfg.food), (Bug, cfg.bug)):
+        organism_class.reproduction_cost = settings['reproduction_cost']
+        organism_class.maturity_age = settings['maturity_age']
+    Bug.mouth_size = cfg.bug['mouth_size']
+
+
+def config_lines(replaced):
+    """Return lines of Python setting the current values of replaced settings, for the copy of the config of a run."""
+    lines = []
+    for path, _ in replaced:
+        value = cfg
+        for name in path:
+            value = _get(value, name)
+        lines.append('%s = %r' % (_setting_name(path), value))
+    return lines
+
+
+def check_spec(spec):
+    """Raise ValueError if a spec cannot be run."""
+    if not isinstance(spec, dict):
+        raise ValueError('a spec must be a JSON object')
+    unknown = set(spec) - set(SPEC_FIELDS)
+    if unknown:
+        raise ValueError('unknown spec fields %s' % ', '.join(sorted(unknown)))
+
+    try:
+        replaced = apply_config_overrides(spec.get('config', {}))
+    except (KeyError, AttributeError) as error:
+        raise ValueError(error.args[0])
+    bounded = any(value is not None for value in [spec.get('days'), spec.get('max_seconds'), cfg.stop_days,
+                                                  cfg.stop_wall_clock])
+    restore_config(replaced)
+    if not bounded:
+        raise ValueError('a run needs days or max_seconds, it has no Enter key to end it')
+
+
+def run_job(job_id, spec, connection):
+    """
+    Run a world for a spec, sending its statistics every stream_every days and its end over a connection.
+    The connection is polled for a cancel before each day.
+    """
+    from simulation import run_day
+    from stop_policy import StopPolicy
+    from world import World
+    from world_recorder import WorldRecorder
+
+    replaced = apply_config_overrides(spec.get('config', {}))
+    try:
+        stream_every = spec.get('stream_every', 1)
+        end = {'event': 'finished'}
+
+        # Worlds print each day, keep it out of the worker's output
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            world = World(**dict(cfg.world['settings'], seed=spec['seed']))
+            world_recorder = WorldRecorder(world)
+            if replaced:
+                with open(os.path.join('data', world.seed, 'config.py'), 'a') as config_file:
+                    config_file.write('\n# Job %d\n' % job_id)
+                    for line in config_lines(replaced):
+                        config_file.write(line + '\n')
+
+            stop_policy = StopPolicy(spec.get('days', cfg.stop_days), spec.get('max_seconds', cfg.stop_wall_clock),
+                                     cfg.stop_on_extinction, cfg.steady_state_window, cfg.steady_state_tolerance)
+            while True:
+                world_recorder.generate_world_stats()
+                world_recorder.generate_world_data()
+                world_recorder.output_world_data()
+
+                stop_reason = stop_policy.check(world_recorder)
+                if world.time % stream_every == 0 or stop_reason is not None:
+                    connection.send({'event': 'day', 'job': job_id, 'time': world.time,
+                                     'stats': {name: {statistic: values[-1] for statistic, values
+                                                      in world_recorder.organism_data[name].items()}
+                                               for name in (FOOD_NAME, BUG_NAME)}})
+                if stop_reason is not None:
+                    end['reason'] = stop_reason
+                    break
+                if connection.poll() and connection.recv() == 'cancel':
+                    end = {'event': 'cancelled'}
+                    break
+
+                run_day(world)
+
+            world_recorder.output_world_stats()
+            if spec.get('plot'):
+                from world_viewer import WorldViewer
+                world_viewer = WorldViewer(world.seed)
+                world_viewer.plot_world_stats()
+                if cfg.world_data_format != 'none':
+                    world_viewer.plot_world_data()
+        connection.send(dict(end, job=job_id, seed=world.seed, time=world.time))
+    except Exception:
+        connection.send({'event': 'failed', 'job': job_id, 'error': traceback.format_exc()})
+    finally:
+        restore_config(replaced)
+
+
+def worker(connection):
+    """Run the jobs sent over a connection one after another, until it closes."""
+    # Pay for the imports once, rather than for each run
+    import matplotlib
+    matplotlib.use('Agg')
+    import world_viewer  # noqa: F401
+    import world_recorder  # noqa: F401
+    import simulation  # noqa: F401
+
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            return
+        if isinstance(message, dict):  # a cancel sent as its run ended is left to be read here, and ignored
+            run_job(message['job'], message['spec'], connection)
+
+
+class Job:
+    """
+    A class to hold a submitted run, its status and the queues of events of the clients watching it.
+    """
+
+    def __init__(self, job_id, spec):
+        """
+        Job Initialisation
+        :param job_id: The number of the job
+        :param spec: Dict of the run, see SPEC_FIELDS
+        """
+        self.id = job_id
+        self.spec = spec
+        self.status = 'queued'
+        self.time = None  # time of the latest statistics
+        self.stats = None
+        self.end = None  # the event the run ended with
+        self.connection = None  # connection to the worker running it
+        self.watchers = set()
+
+    def summary(self):
+        return {'job': self.id, 'status': self.status, 'seed': self.spec['seed'], 'time': self.time,
+                'stats': self.stats}
+
+    def publish(self, event):
+        for watcher in self.watchers:
+            watcher.put_nowait(event)
+
+
+class JobServer:
+    """
+    A class to queue runs onto a pool of warm worker processes, and stream their statistics to clients with asyncio.
+
+    Each worker is a process with a pipe to the server. The server reads the pipes from its event loop, so a day's
+    statistics reach the watching clients as soon as the day is done, and a cancel reaches a worker before its next
+    day. A worker that dies fails its run and is replaced.
+    """
+
+    def __init__(self, workers=None):
+        """
+        Job Server Initialisation
+        :param workers: The number of worker processes, config's job_server_workers or one per CPU by default
+        """
+        self.number_of_workers = workers or cfg.job_server_workers or os.cpu_count()
+        self.context = multiprocessing.get_context('spawn')  # forking a process running an event loop is unsafe
+        self.workers = []  # dicts of the process, connection and running job of each worker
+        self.jobs = {}
+        self.queue = deque()
+        self.clients = set()  # writers of the connected clients
+
+    def _start_worker(self, index):
+        connection, worker_connection = self.context.Pipe()
+        process = self.context.Process(target=worker, args=(worker_connection,), daemon=True)
+        process.start()
+        worker_connection.close()
+        self.workers[index] = {'process': process, 'connection': connection, 'job': None}
+        asyncio.get_running_loop().add_reader(connection.fileno(), self._receive, index)
+
+    def _receive(self, index):
+        slot = self.workers[index]
+        try:
+            event = slot['connection'].recv()
+        except (EOFError, OSError):
+            asyncio.get_running_loop().remove_reader(slot['connection'].fileno())
+            slot['connection'].close()
+            slot['process'].join()
+            if slot['job'] is not None:
+                self._end(slot['job'], {'event': 'failed', 'job': slot['job'].id, 'error': 'worker process exited '
+                                        'with code %s' % slot['process'].exitcode})
+            self._start_worker(index)
+            self._dispatch()
+            return
+
+        job = self.jobs[event['job']]
+        if event['event'] == 'day':
+            job.time, job.stats = event['time'], event['stats']
+            job.publish(event)
+        else:
+            slot['job'] = None
+            job.time = event.get('time', job.time)
+            self._end(job, event)
+            self._dispatch()
+
+    @staticmethod
+    def _end(job, event):
+        job.status, job.end, job.connection = event['event'], event, None
+        job.publish(event)
+
+    def _dispatch(self):
+        for slot in self.workers:
+            if slot['job'] is None and self.queue:
+                job = self.queue.popleft()
+                slot['job'], job.status, job.connection = job, 'running', slot['connection']
+                slot['connection'].send({'job': job.id, 'spec': job.spec})
+                job.publish({'event': 'started', 'job': job.id, 'seed': job.spec['seed']})
+
+    def submit(self, spec, watcher=None):
+        """
+        Queue a run.
+        :param spec: Dict of the run, see SPEC_FIELDS
+        :param watcher: A queue for the events of the run, added before it can start
+        :return: The job of the run
+        """
+        check_spec(spec)
+        job = Job(len(self.jobs) + 1, dict(spec))
+        if job.spec.get('seed') is None:
+            job.spec['seed'] = '%s_job%d' % (datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S'), job.id)
+        if watcher is not None:
+            job.watchers.add(watcher)
+
+        self.jobs[job.id] = job
+        self.queue.append(job)
+        self._dispatch()
+        return job
+
+    def cancel(self, job):
+        """Take a run off the queue, or ask its worker to stop it before its next day."""
+        if job.status == 'queued':
+            self.queue.remove(job)
+            self._end(job, {'event': 'cancelled', 'job': job.id})
+        elif job.status == 'running':
+            job.connection.send('cancel')
+
+    async def _handle(self, reader, writer):
+        self.clients.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    command = request['command']
+                    if command == 'submit':
+                        watcher = asyncio.Queue()
+                        job = self.submit(request['spec'], watcher)
+                        await self._stream(job, watcher, writer, {'event': 'queued', 'job': job.id,
+                                                                  'seed': job.spec['seed']})
+                    elif command == 'watch':
+                        job = self._job(request['job'])
+                        watcher = asyncio.Queue()
+                        job.watchers.add(watcher)
+                        await self._stream(job, watcher, writer, job.summary())
+                    elif command == 'cancel':
+                        job = self._job(request['job'])
+                        self.cancel(job)
+                        await self._send(writer, job.summary())
+                    elif command == 'jobs':
+                        await self._send(writer, {'jobs': [job.summary() for job in self.jobs.values()]})
+                    else:
+                        raise ValueError('unknown command %r' % command)
+                except (ValueError, KeyError, TypeError) as error:
+                    await self._send(writer, {'event': 'error', 'error': str(error)})
+        except ConnectionError:
+            pass  # the client went away, its runs carry on
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+
+    def _job(self, job_id):
+        if job_id not in self.jobs:
+            raise ValueError('no job %r' % job_id)
+        return self.jobs[job_id]
+
+    async def _stream(self, job, watcher, writer, first):
+        """Send a first message and then the events of a run until it ends."""
+        try:
+            await self._send(writer, first)
+            if job.end is not None:
+                await self._send(writer, job.end)
+                return
+            while True:
+                event = await watcher.get()
+                await self._send(writer, event)
+                if event['event'] in ENDED:
+                    return
+        finally:
+            job.watchers.discard(watcher)
+
+    @staticmethod
+    async def _send(writer, message):
+        writer.write(json.dumps(message, default=lambda value: value.item()).encode() + b'\n')
+        await writer.drain()
+
+    async def serve(self, socket_path=None, port=None):
+        """
+        Start the workers and serve clients until cancelled.
+        :param socket_path: The path of the Unix socket to listen on, config's job_server_socket by default
+        :param port: A localhost TCP port to listen on instead of a Unix socket
+        """
+        self.workers = [None] * self.number_of_workers
+        for index in range(self.number_of_workers):
+            self._start_worker(index)
+
+        if port is not None:
+            server = await asyncio.start_server(self._handle, '127.0.0.1', port)
+        else:
+            socket_path = socket_path if socket_path is not None else cfg.job_server_socket
+            directory = os.path.dirname(socket_path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            if os.path.exists(socket_path):
+                os.remove(socket_path)  # left by a server that did not shut down
+            server = await asyncio.start_unix_server(self._handle, socket_path)
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for writer in self.clients:
+                writer.close()
+            for slot in self.workers:
+                asyncio.get_running_loop().remove_reader(slot['connection'].fileno())
+                slot['connection'].close()
+                slot['process'].join(timeout=5)
+            if port is None and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+
+async def request(message, socket_path=None, port=None):
+    """
+    Send a request to a job server and yield its replies, up to the end of the run for submit and watch.
+    :param message: Dict of the request
+    :param socket_path: The path of the server's Unix socket, config's job_server_socket by default
+    :param port: The localhost TCP port of the server, instead of a Unix socket
+    """
+    if port is not None:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    else:
+        reader, writer = await asyncio.open_unix_connection(socket_path if socket_path is not None
+                                                            else cfg.job_server_socket)
+    try:
+        writer.write(json.dumps(message).encode() + b'\n')
+        await writer.drain()
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            reply = json.loads(line)
+            yield reply
+            if message['command'] not in ('submit', 'watch') or reply.get('event') in ENDED + ['error']:
+                return
+    finally:
+        writer.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve runs to warm worker processes, or talk to a server.')
+    parser.add_argument('command', choices=['serve', 'submit', 'watch', 'cancel', 'jobs'])
+    parser.add_argument('argument', nargs='?', help='the JSON spec of a run to submit, or a job number')
+    parser.add_argument('--socket', help='Unix socket of the server, %s by default' % cfg.job_server_socket)
+    parser.add_argument('--port', type=int, help='localhost TCP port of the server, instead of a Unix socket')
+    parser.add_argument('--workers', type=int, help='worker processes of the server')
+    arguments = parser.parse_args()
+
+    if arguments.command == 'serve':
+        try:
+            asyncio.run(JobServer(arguments.workers).serve(arguments.socket, arguments.port))
+        except KeyboardInterrupt:
+            pass
+    else:
+        if arguments.command == 'submit':
+            client_message = {'command': 'submit', 'spec': json.loads(arguments.argument or '{}')}
+        elif arguments.command in ('watch', 'cancel'):
+            client_message = {'command': arguments.command, 'job': int(arguments.argument)}
+        else:
+            client_message = {'command': 'jobs'}
+
+        async def print_replies():
+            async for reply in request(client_message, arguments.socket, arguments.port):
+                print(json.dumps(reply))
+
+        asyncio.run(print_replies())
@@ -0,0 +1,174 @@
+import numpy as np
+import sys
+from array import array
+from constants import FOOD_NAME, BUG_NAME
+from world_history import ORGANISM_CODES
+
+
+class LineageTracker:
+    """
+    A class to record the parent of every organism born in a world, in compact append-only arrays.
+
+    Organisms are given increasing integer ids as they spawn, so a parent always has a smaller id than its children
+    and the arrays stay sorted by id. Pruning keeps only the ancestors of the organisms alive, which bounds the memory
+    to the depth of the surviving lineages rather than the number of births.
+    """
+
+    def __init__(self, world=None):
+        """
+        Lineage Tracker Initialisation
+        :param world: The world to track, its current organisms become roots and its births are recorded from now on
+        """
+        self.world = world
+        self.next_uid = 0
+        self.uids = array('q')
+        self.parents = array('q')  # -1 for organisms that were dropped into the world
+        self.birth_days = array('l')
+        self.organisms = array('b')
+        self.tastes = array('h')
+        self.reproduction_thresholds = array('l')
+
+        if world is not None:
+            for name in (FOOD_NAME, BUG_NAME):
+                for organism in world.organism_lists[name]['alive']:
+                    self.record_birth(organism, world.time)
+            world.lineage = self
+
+    def __len__(self):
+        return len(self.uids)
+
+    def record_birth(self, organism, day):
+        organism.uid = self.next_uid
+        self.next_uid += 1
+
+        self.uids.append(organism.uid)
+        self.parents.append(organism.parent_uid if organism.parent_uid is not None else -1)
+        self.birth_days.append(day)
+        self.organisms.append(ORGANISM_CODES[organism.name])
+        self.tastes.append(organism.taste)
+        self.reproduction_thresholds.append(organism.reproduction_threshold)
+
+    def columns(self):
+        """Return the arrays as a dict of numpy arrays."""
+        return {name: np.frombuffer(column, dtype=column.typecode) if len(column) else
+                np.zeros(0, dtype=column.typecode) for name, column in self._arrays()}
+
+    def _arrays(self):
+        return [('uids', self.uids), ('parents', self.parents), ('birth_days', self.birth_days),
+                ('organisms', self.organisms), ('tastes', self.tastes),
+                ('reproduction_thresholds', self.reproduction_thresholds)]
+
+    def alive_uids(self):
+        return sorted(organism.uid for name in (FOOD_NAME, BUG_NAME)
+                      for organism in self.world.organism_lists[name]['alive'])
+
+    def ancestry(self, uids):
+        """Return a boolean mask over the records of some organisms and all of their ancestors."""
+        columns = self.columns()
+        parent_index = np.searchsorted(columns['uids'], columns['parents'])
+        parent_index[columns['parents'] < 0] = -1
+
+        keep = np.zeros(len(columns['uids']), dtype=bool)
+        frontier = np.searchsorted(columns['uids'], np.asarray(uids, dtype=np.int64))
+        while frontier.size:
+            keep[frontier] = True
+            frontier = parent_index[frontier]
+            frontier = np.unique(frontier[frontier >= 0])
+            frontier = frontier[~keep[frontier]]
+        return keep
+
+    def prune(self):
+        """Drop the records of organisms with no descendants alive, returns the number of records dropped."""
+        keep = self.ancestry(self.alive_uids())
+        dropped = len(keep) - int(keep.sum())
+        if dropped:
+            columns = self.columns()
+            for name, column in self._arrays():
+                kept = array(column.typecode, columns[name][keep].tobytes())
+                setattr(self, name, kept)
+        return dropped
+
+    def lineage(self, uid):
+        """
+        Follow an organism back through its ancestors.
+        :param uid: The id of the organism
+        :return: Dict of arrays of uids, birth_days, tastes and reproduction_thresholds from the root to the organism
+        """
+        columns = self.columns()
+        path, i = [], int(np.searchsorted(columns['uids'], uid))
+        while True:
+            path.append(i)
+            parent = columns['parents'][i]
+            if parent < 0:
+                break
+            i = int(np.searchsorted(columns['uids'], parent))
+
+        path = path[::-1]
+        return {name: columns[name][path] for name in ['uids', 'birth_days', 'tastes', 'reproduction_thresholds']}
+
+    def newick(self, uids, day=None):
+        """
+        Export the coalescent tree of some organisms in Newick format.
+        :param uids: The ids of the sampled organisms
+        :param day: The time the organisms are sampled at, the day of the latest birth by default
+        :return: The tree, leaves are labelled by id and branch lengths are in days
+        """
+        columns = self.columns()
+        day = day if day is not None else int(columns['birth_days'].max())
+        sampled = set(int(uid) for uid in uids)
+        records = np.flatnonzero(self.ancestry(sorted(sampled)))
+        uid_list = columns['uids'][records].tolist()
+        parent_list = columns['parents'][records].tolist()
+        birth_days = dict(zip(uid_list, columns['birth_days'][records].tolist()))
+        birth_days[-1] = int(columns['birth_days'].min()) if len(columns['birth_days']) else 0
+
+        child_counts = {}
+        for parent in parent_list:
+            child_counts[parent] = child_counts.get(parent, 0) + 1
+
+        # The tree keeps the sampled organisms and the ancestors where lineages split, chains of ancestors with a
+        # single child are collapsed so each node hangs from its nearest kept ancestor
+        nearest, tree_children, kept = {-1: -1}, {}, []
+        for uid, parent in zip(uid_list, parent_list):
+            nearest[uid] = parent if parent == -1 or parent in sampled or child_counts[parent] > 1 else nearest[parent]
+            if uid in sampled or child_counts.get(uid, 0) > 1:
+                tree_children.setdefault(nearest[uid], []).append(uid)
+                kept.append(uid)
+
+        # Ids increase from parent to child, so going through them backwards builds each subtree before its parent
+        subtrees = {}
+        for uid in reversed(kept):
+            branches = [subtrees.pop(child) for child in tree_children.get(uid, [])]
+            length = birth_days[uid] - birth_days[nearest[uid]]
+            if not branches:
+                subtrees[uid] = '%d:%d' % (uid, day - birth_days[nearest[uid]])
+            else:
+                if uid in sampled:
+                    # A sampled organism with sampled descendants is also a leaf of its own
+                    branches.append('%d:%d' % (uid, day - birth_days[uid]))
+                subtrees[uid] = '(%s)%d:%d' % (','.join(branches), uid, length)
+
+        return '(' + ','.join(subtrees[uid] for uid in tree_children.get(-1, [])) + ');'
+
+    def save(self, path):
+        """Write the records, and the ids alive now, to a .npz file."""
+        np.savez_compressed(path, alive=np.array(self.alive_uids(), dtype=np.int64), **self.columns())
+
+    @classmethod
+    def load(cls, path):
+        """Read records written by save, returns the tracker and the ids that were alive."""
+        lineage_tracker = cls()
+        with np.load(path) as data:
+            for name, column in lineage_tracker._arrays():
+                setattr(lineage_tracker, name, array(column.typecode, data[name].astype(column.typecode).tobytes()))
+            alive = data['alive']
+        lineage_tracker.next_uid = int(lineage_tracker.uids[-1]) + 1 if len(lineage_tracker) else 0
+        return lineage_tracker, alive
+
+
+if __name__ == '__main__':
+    # Print the coalescent tree of a sample of the organisms alive at the end of a run:
+    # python lineage.py data/<seed>/data_files/lineage.npz [sample size]
+    tracker, alive_uids = LineageTracker.load(sys.argv[1])
+    sample_size = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    print(tracker.newick(np.random.choice(alive_uids, min(sample_size, len(alive_uids)), replace=False)))
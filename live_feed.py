@@ -0,0 +1,152 @@
+import numpy as np
+import re
+import sys
+import time
+from multiprocessing import shared_memory, resource_tracker
+from constants import FOOD_NAME, BUG_NAME
+
+
+class LiveFeed:
+    """
+    A class to publish the world grid and daily statistics into shared memory for an external monitor.
+
+    The segment starts with a sequence counter that is odd while a frame is being written and even once it is
+    complete. The simulation never waits for a reader: a reader that sees the counter change while it is copying a
+    frame simply drops that frame.
+    """
+    header_names = ['sequence', 'rows', 'columns', 'stats']
+    stats_names = ['time', 'food_population', 'bug_population', 'food_energy', 'bug_energy',
+                   'food_average_reproduction_threshold', 'bug_average_reproduction_threshold']
+
+    def __init__(self, world, name=None):
+        """
+        Live Feed Initialisation
+        :param world: The world being published
+        :param name: The name of the shared memory segment, derived from the world seed by default
+        """
+        self.world = world
+        self.name = name if name is not None else self.segment_name(world.seed)
+        rows, columns = world.grid.shape
+
+        size = self.grid_offset() + rows * columns
+        try:
+            self.shared_memory = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a run that did not close its feed
+            stale = shared_memory.SharedMemory(name=self.name)
+            stale.close()
+            stale.unlink()
+            self.shared_memory = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+
+        self.header, self.stats, self.grid = self.views(self.shared_memory.buf, rows, columns)
+        self.header[:] = [0, rows, columns, len(self.stats_names)]
+        self.stats[:] = np.nan
+
+    @staticmethod
+    def segment_name(seed):
+        # Shared memory names are limited to around 30 characters on some platforms
+        return ('evo_comp_' + re.sub(r'[^0-9A-Za-z_]', '_', str(seed)))[:30]
+
+    @classmethod
+    def grid_offset(cls):
+        return 8 * (len(cls.header_names) + len(cls.stats_names))
+
+    @classmethod
+    def views(cls, buffer, rows, columns):
+        """Return the header, statistics and grid arrays sharing a segment buffer."""
+        header = np.ndarray((len(cls.header_names),), dtype=np.int64, buffer=buffer)
+        stats = np.ndarray((len(cls.stats_names),), dtype=np.float64, buffer=buffer, offset=8 * len(cls.header_names))
+        grid = np.ndarray((rows, columns), dtype=np.uint8, buffer=buffer, offset=cls.grid_offset())
+        return header, stats, grid
+
+    def publish(self, world_recorder=None):
+        """
+        Write the current world into the segment.
+        :param world_recorder: A recorder whose latest statistics are published alongside the populations
+        """
+        stats = [self.world.time, len(self.world.organism_lists[FOOD_NAME]['alive']),
+                 len(self.world.organism_lists[BUG_NAME]['alive']), np.nan, np.nan, np.nan, np.nan]
+
+        if world_recorder is not None:
+            for i, organism in enumerate(['food', 'bug']):
+                organism_data = world_recorder.organism_data[organism]
+                if organism_data['time'] and organism_data['time'][-1] == self.world.time:
+                    stats[3 + i] = organism_data['energy'][-1]
+                    stats[5 + i] = organism_data['average_reproduction_threshold'][-1]
+
+        self.header[0] += 1  # odd, frame is being written
+        self.stats[:] = stats
+        np.copyto(self.grid, self.world.grid, casting='unsafe')
+        self.header[0] += 1  # even, frame is complete
+
+    def close(self):
+        self.shared_memory.close()
+        self.shared_memory.unlink()
+
+
+class LiveMonitor:
+    """
+    A class to read frames published by a live feed from another process.
+    """
+
+    def __init__(self, seed=None, name=None):
+        """
+        Live Monitor Initialisation
+        :param seed: The seed of the world being watched
+        :param name: The name of the shared memory segment, overrides the seed
+        """
+        self.name = name if name is not None else LiveFeed.segment_name(seed)
+        self.shared_memory = shared_memory.SharedMemory(name=self.name)
+
+        # The segment belongs to the simulation, so stop this process unlinking it on exit
+        resource_tracker.unregister(self.shared_memory._name, 'shared_memory')
+
+        header = np.ndarray((len(LiveFeed.header_names),), dtype=np.int64, buffer=self.shared_memory.buf)
+        self.header, self.stats, self.grid = LiveFeed.views(self.shared_memory.buf, int(header[1]), int(header[2]))
+        self.last_sequence = None
+
+    def read(self):
+        """
+        Copy the latest complete frame.
+        :return: The sequence number, a dict of statistics and a copy of the grid, or None if there is no new frame
+        """
+        sequence = int(self.header[0])
+        if sequence % 2 or sequence == self.last_sequence:
+            return None
+
+        stats = self.stats.copy()
+        grid = self.grid.copy()
+
+        if int(self.header[0]) != sequence:
+            return None  # overwritten while copying, drop the frame
+
+        self.last_sequence = sequence
+        return sequence // 2, dict(zip(LiveFeed.stats_names, stats.tolist())), grid
+
+    def close(self):
+        self.shared_memory.close()
+
+
+if __name__ == '__main__':
+    # Watch a running simulation: python live_feed.py <seed> [--plot]
+
+    monitor = LiveMonitor(sys.argv[1])
+
+    if '--plot' in sys.argv:
+        from matplotlib import pyplot as plt
+
+        image = plt.imshow(monitor.grid.T, origin='lower', vmin=0, vmax=3, cmap='viridis', interpolation='nearest')
+        while plt.fignum_exists(image.figure.number):
+            frame = monitor.read()
+            if frame is not None:
+                image.set_data(frame[2].T)
+                image.axes.set_title('time=%d, plants: %d, bugs: %d' % (
+                    frame[1]['time'], frame[1]['food_population'], frame[1]['bug_population']))
+            plt.pause(0.1)
+    else:
+        while True:
+            frame = monitor.read()
+            if frame is not None:
+                sys.stdout.write('\r' + ', '.join('%s: %g' % item for item in frame[1].items()) + '   ')
+                sys.stdout.flush()
+            time.sleep(0.1)
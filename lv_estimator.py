@@ -0,0 +1,103 @@
+import numpy as np
+from collections import deque
+
+
+class LotkaVolterraEstimator:
+    """
+    A class to estimate competitive Lotka-Volterra parameters while the world runs.
+
+    The day to day change in population densities u = plants / capacity and v = bugs / capacity is regressed on the
+    discretised model
+        du = alpha * u * (1 - u) - beta * capacity * u * v
+        dv = delta * capacity * u * v - gamma * v
+    by least squares over a sliding window. The sums of the normal equations are updated as days enter and leave the
+    window, so each update is O(1).
+    """
+
+    def __init__(self, capacity, window=200):
+        """
+        Lotka-Volterra Estimator Initialisation
+        :param capacity: The carrying capacity (number of squares) of the world
+        :param window: The number of daily changes to fit over
+        """
+        self.capacity = capacity
+        self.window = window
+        self.samples = deque()
+        self.previous = None
+        self.updates_since_refresh = 0
+
+        # Normal equation sums for the plant (alpha, beta) and bug (delta, gamma) regressions
+        self.xtx = np.zeros((2, 2, 2))
+        self.xty = np.zeros((2, 2))
+        self.yty = np.zeros(2)
+
+    def update(self, time, plants, bugs):
+        """
+        Add the populations of a day.
+        :param time: The time of the populations, a gap since the last update starts a new difference
+        :param plants: The plant population
+        :param bugs: The bug population
+        """
+        u, v = plants / self.capacity, bugs / self.capacity
+
+        if self.previous is not None and self.previous[0] == time - 1:
+            previous_u, previous_v = self.previous[1:]
+            sample = (np.array([[previous_u * (1 - previous_u), -previous_u * previous_v],
+                                [previous_u * previous_v, -previous_v]]),
+                      np.array([u - previous_u, v - previous_v]))
+            self.samples.append(sample)
+            self._add(sample, 1)
+
+            if len(self.samples) > self.window:
+                self._add(self.samples.popleft(), -1)
+
+            # Recompute the sums now and then so rounding errors from removing samples cannot build up
+            self.updates_since_refresh += 1
+            if self.updates_since_refresh >= self.window:
+                self._refresh()
+
+        self.previous = (time, u, v)
+
+    def _add(self, sample, sign):
+        features, changes = sample
+        self.xtx += sign * features[:, :, None] * features[:, None, :]
+        self.xty += sign * features * changes[:, None]
+        self.yty += sign * changes * changes
+
+    def _refresh(self):
+        self.xtx[:], self.xty[:], self.yty[:] = 0, 0, 0
+        for sample in self.samples:
+            self._add(sample, 1)
+        self.updates_since_refresh = 0
+
+    def estimates(self):
+        """
+        Return the current parameter estimates.
+        :return: Dict of (estimate, standard error) for alpha, beta, delta and gamma, None until the fit is determined
+        """
+        n = len(self.samples)
+        if n < 3:
+            return None
+
+        estimates = {}
+        for i, names in enumerate([('alpha', 'beta'), ('delta', 'gamma')]):
+            if abs(np.linalg.det(self.xtx[i])) < 1e-300:
+                return None
+            xtx_inverse = np.linalg.inv(self.xtx[i])
+            theta = xtx_inverse.dot(self.xty[i])
+            residual_variance = max(self.yty[i] - theta.dot(self.xty[i]), 0) / (n - 2)
+            errors = np.sqrt(np.diag(xtx_inverse) * residual_variance)
+
+            # The interaction terms were fitted against densities, convert them back to per organism rates
+            scale = np.array([1, 1 / self.capacity]) if i == 0 else np.array([1 / self.capacity, 1])
+            for name, value, error in zip(names, theta * scale, errors * scale):
+                estimates[name] = (value, error)
+
+        return estimates
+
+    def settled(self, tolerance=0.05):
+        """Return True once every parameter is known to within a relative standard error of tolerance."""
+        estimates = self.estimates()
+        if estimates is None or len(self.samples) < self.window:
+            return False
+        return all(value != 0 and error / abs(value) <= tolerance for value, error in estimates.values())
@@ -1,98 +1,131 @@
+"""
+Run a world: python main.py [--seed SEED] [--rows ROWS] [--columns COLUMNS] [--days DAYS] [--output {csv,history,none}]
+                            [--record-every DAYS] [--record-policy {every,log,change}] [--stats-every DAYS]
+                            [--stats-policy {every,log,change}] [--max-seconds SECONDS] [--steady-window DAYS]
+                            [--headless]
+Settings not given on the command line are taken from config.py. The statistics and world data are plotted once the run
+ends, unless --headless is given; matplotlib is only imported when plotting.
+"""
+
+import argparse
+import os
 import config as cfg
-from constants import *
-from direction import Direction
 from kill_switch import KillSwitch
+from recording_policy import POLICIES
+from simulation import run_day
+from stop_policy import StopPolicy
 from world import World
 from world_recorder import WorldRecorder
-from world_viewer import WorldViewer
 
 
+parser = argparse.ArgumentParser(description='Run an evolving world of plants and bugs.')
+parser.add_argument('--seed', help='seed of the world, the seed in config.py by default')
+parser.add_argument('--rows', type=int, help='number of rows of the world')
+parser.add_argument('--columns', type=int, help='number of columns of the world')
+parser.add_argument('--days', type=int, help='number of days to run, until the Enter key is pressed by default')
+parser.add_argument('--output', choices=['csv', 'history', 'none'], help='how the world data is recorded')
+parser.add_argument('--record-every', type=int, help='days between recordings of the world data')
+parser.add_argument('--record-policy', choices=POLICIES, help='which days the world data is recorded on')
+parser.add_argument('--stats-every', type=int, help='days between written statistics')
+parser.add_argument('--stats-policy', choices=POLICIES, help='which days the statistics are written for')
+parser.add_argument('--max-seconds', type=float, help='wall-clock time to run for')
+parser.add_argument('--steady-window', type=int, help='days in each half of the window checked for a steady state')
+parser.add_argument('--headless', '--no-plot', action='store_true',
+                    help='do not plot the statistics and world data once the run ends')
+args = parser.parse_args()
+
+# Settings given on the command line replace those in config.py
+settings = {name: value for name, value in [('seed', args.seed), ('rows', args.rows), ('columns', args.columns)]
+            if value is not None}
+options = {name: value for name, value in [('world_data_format', args.output),
+                                           ('world_data_interval', args.record_every),
+                                           ('world_data_policy', args.record_policy),
+                                           ('stats_interval', args.stats_every), ('stats_policy', args.stats_policy),
+                                           ('stop_days', args.days), ('stop_wall_clock', args.max_seconds),
+                                           ('steady_state_window', args.steady_window)] if value is not None}
+cfg.world['settings'].update(settings)
+for name, value in options.items():
+    setattr(cfg, name, value)
+
 ##################################
 # --------Initialisation-------- #
 ##################################
 # Create a new world
 w = World(**cfg.world['settings'])
 
-# Make a kill switch
-KillSwitch.setup()
-
 # Set up analysis classes
 world_recorder = WorldRecorder(w)
-world_viewer = WorldViewer(w.seed)
+
+# Keep the command line settings with the copy of the config file
+if settings or options:
+    with open(os.path.join('data', w.seed, 'config.py'), 'a') as config_file:
+        config_file.write('\n# Command line\n')
+        if settings:
+            config_file.write("world['settings'].update(%s)\n" % ', '.join(
+                '%s=%r' % (name, settings[name]) for name in sorted(settings)))
+        for name in sorted(options):
+            config_file.write('%s = %r\n' % (name, options[name]))
+
+if not args.headless or cfg.save_world_view_every_day:
+    from world_viewer import WorldViewer
+    world_viewer = WorldViewer(w.seed)
+else:
+    world_viewer = None
+
+if cfg.live_feed:
+    from live_feed import LiveFeed
+    live_feed = LiveFeed(w)
+else:
+    live_feed = None
+
+if cfg.memory_report_interval:
+    from memory_report import MemoryMonitor
+    memory_monitor = MemoryMonitor(w, world_recorder, cfg.memory_report_interval, cfg.memory_report_method)
+else:
+    memory_monitor = None
+
+stop_policy = StopPolicy(cfg.stop_days, cfg.stop_wall_clock, cfg.stop_on_extinction, cfg.steady_state_window,
+                         cfg.steady_state_tolerance)
+
+# Make a kill switch if the run has no day or wall-clock budget
+if not stop_policy.bounded:
+    KillSwitch.setup()
+    print('Press Enter key to end simulation.\n')
 
 #######################
 # --------Run-------- #
 #######################
-print('Press Enter key to end simulation.\n')
-
 while KillSwitch.is_off():
 
     # Generate yesterday's data
     world_recorder.generate_world_stats()
+    if live_feed is not None:
+        live_feed.publish(world_recorder)
     world_recorder.generate_world_data()
+    if memory_monitor is not None:
+        memory_monitor.update()
     world_recorder.output_world_data()
     if cfg.save_world_view_every_day:
         world_viewer.view_world(w)
 
-    # Prepare today's work
-    alive_plants, alive_bugs = w.prepare_today()
-
-    # Food life cycle
-    plant_index = 0
-    while plant_index < len(alive_plants):
-        plant = alive_plants[plant_index]
-
-        # Should it die?
-        if plant.energy <= cfg.food['min_energy']:
-            w.kill(plant)
-            continue
-
-        plant.grow()
-
-        if plant.can_reproduce():
-            trial_direction = Direction.random()
-            if w.available(plant, trial_direction):
-                w.spawn(plant.reproduce(trial_direction))
-
-        plant_index += 1
-
-    # Bug life cycle
-    bug_index = 0
-    while bug_index < len(alive_bugs):
-        bug = alive_bugs[bug_index]
-
-        # Should it die?
-        if bug.energy <= cfg.bug['min_energy']:
-            w.kill(bug)
-            continue
-
-        bug.respire()
-
-        # Try move (if not newly born)
-        if bug.lifetime > 1 or w.time == 1:
-            trial_direction = Direction.random()
-
-            if w.available(bug, trial_direction):
-                w.grid[tuple(bug.position)] -= bug.value
-                bug.move(trial_direction)
-                w.grid[tuple(bug.position)] += bug.value
-
-        # Can it eat?
-        if w.grid[tuple(bug.position)] == FOOD_VAL + BUG_VAL:
-            plant_beneath = w.plant_position_dict[tuple(bug.position)]
-            if bug.try_eat(plant_beneath):
-                w.kill(plant_beneath)
+    stop_reason = stop_policy.check(world_recorder)
+    if stop_reason is not None:
+        print('\nstopping at time %d: %s' % (w.time, stop_reason))
+        break
 
-        if bug.can_reproduce():
-            trial_direction = Direction.random()
-            if w.available(bug, trial_direction):
-                w.spawn(bug.reproduce(trial_direction))
+    run_day(w)
 
-        bug_index += 1
+if live_feed is not None:
+    live_feed.close()
 
 ########################
 # --------Plot-------- #
 ########################
 world_recorder.output_world_stats()
-world_viewer.plot_world_stats()
-world_viewer.plot_world_data()
+if not args.headless:
+    world_viewer.plot_world_stats()
+    if cfg.world_data_format != 'none':
+        world_viewer.plot_world_data()
+if memory_monitor is not None:
+    memory_monitor.sample()
+    memory_monitor.report()
@@ -0,0 +1,514 @@
+"""
+Run a coarse-grained world far larger than an agent-level world can be:
+python mean_field.py ROWS COLUMNS [--block-size SIZE] [--days DAYS] [--record-every DAYS] [--seed SEED]
+The rates of the block update rules are fitted to agent-level worlds run with the same config settings the first time
+they are needed, and kept in data/mean_field_calibration.json until the settings change.
+"""
+
+import argparse
+import contextlib
+import csv
+import hashlib
+import io
+import json
+import os
+import random
+import numpy as np
+import config as cfg
+from constants import FOOD_NAME, BUG_NAME
+from direction import Direction
+from food import Food
+from bug import Bug
+from organism import Organism
+from gene_histograms import TASTE_BIN, TASTE_BINS
+from lv_estimator import LotkaVolterraEstimator
+from simulation import run_day
+from utility_methods import get_taste_difference
+from world import World
+
+ORGANISMS = {FOOD_NAME: Food, BUG_NAME: Bug}
+SETTINGS = {FOOD_NAME: cfg.food, BUG_NAME: cfg.bug}
+SPAWN_VALS = {FOOD_NAME: cfg.world['food_spawn_vals'], BUG_NAME: cfg.world['bug_spawn_vals']}
+CALIBRATION_VERSION = 1  # bump when calibrate changes what it fits, so saved rates are fitted again
+
+# Config settings the rates depend on, a change to any of them calibrates again
+CALIBRATED_SETTINGS = ['world', 'max_compatible_taste', 'offspring_energy_fraction', 'endangered_time',
+                       'food_endangered_threshold', 'bug_endangered_threshold', 'food', 'bug']
+
+
+def calibration_path():
+    return os.path.join('data', 'mean_field_calibration.json')
+
+
+def mean_field_path(seed):
+    return os.path.join('data', seed, 'data_files')
+
+
+def bin_tastes():
+    """Return the taste at the centre of each taste bin."""
+    return np.arange(TASTE_BINS) * TASTE_BIN + (TASTE_BIN - 1) / 2
+
+
+def compatibility_matrix():
+    """Return the chance a bug of each taste bin eats a plant of each taste bin on trying, as in Bug.try_eat."""
+    tastes = bin_tastes()
+    difference = get_taste_difference(tastes[:, None], tastes[None, :])
+    return np.clip((cfg.max_compatible_taste - difference) / cfg.max_compatible_taste, 0, 1)
+
+
+def mutation_kernel(settings):
+    """
+    Return the chance an offspring lands each number of taste bins away from its parent's, for a parent taste spread
+    evenly over its bin and a mutation drawn as in Organism.mutate.
+    """
+    if not settings['evolve_taste']:
+        return {0: 1.0}
+
+    limit = settings['taste_mutation_limit']
+    kernel = {}
+    for taste in range(TASTE_BIN):
+        for mutation in range(-limit, limit + 1):
+            shift = (taste + mutation) // TASTE_BIN
+            kernel[shift] = kernel.get(shift, 0) + 1 / (TASTE_BIN * (2 * limit + 1))
+    return kernel
+
+
+def average_taste(histogram):
+    """Return the average of the tastes of a taste bin histogram in polar co-ordinates, as get_taste_average does."""
+    radians = np.radians(bin_tastes())
+    return np.degrees(np.arctan2(histogram.dot(np.sin(radians)), histogram.dot(np.cos(radians)))) % 360
+
+
+def taste_histogram(organisms):
+    return np.bincount([organism.taste // TASTE_BIN for organism in organisms], minlength=TASTE_BINS)
+
+
+def calibrate(size=48, days=600, seeds=4, seed='mean_field'):
+    """
+    Fit the rates of the block update rules to agent-level worlds run with the current config settings.
+
+    The populations of every run are fitted together by a LotkaVolterraEstimator. Its interaction rates are per
+    organism, they are scaled back to the density rates a block uses. The fitted rates only give the net change of the
+    populations, while most organisms are born to replace others that ran out of energy, so the births beyond those of
+    the fit are kept as turnover rates, which set how fast tastes evolve. Plants run out of energy from bites and bugs
+    gain it from them, so these are kept with the average density of the other type they were measured at. The worlds'
+    plants and bugs are not all equally compatible, so the average chance of a bug eating a plant it tries is kept too,
+    and a block's rates are scaled by how compatible its own plants and bugs are relative to it.
+    :param size: The number of rows and columns of the agent-level worlds
+    :param days: The number of days to run each world for
+    :param seeds: The number of worlds to run
+    :param seed: The seed the seeds of the worlds are made from
+    :return: Dict of the density rates alpha, beta, delta and gamma, the turnover rates plant_turnover and
+    bug_turnover, the average bug density of plants and plant density of bugs, and the average compatibility
+    """
+    capacity = size * size
+    estimator = LotkaVolterraEstimator(capacity, window=seeds * days)
+    compatibility = compatibility_matrix()
+    compatibilities = []
+    births = {FOOD_NAME: 0, BUG_NAME: 0}
+    organism_days = {FOOD_NAME: 0, BUG_NAME: 0}
+    plant_weighted_days = {FOOD_NAME: 0, BUG_NAME: 0}  # organism days weighted by plant density
+    bug_weighted_days = {FOOD_NAME: 0, BUG_NAME: 0}  # organism days weighted by bug density
+
+    for run in range(seeds):
+        settings = dict(cfg.world['settings'], seed='%s-%d' % (seed, run), rows=size, columns=size,
+                        init_food=capacity // 4, init_bugs=max(capacity // 100, 1), fertile_lands=None,
+                        active_set_scheduling=False, packed_grid=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            world = World(**settings)
+            for day in range(days):
+                plants, bugs = world.organism_lists[FOOD_NAME]['alive'], world.organism_lists[BUG_NAME]['alive']
+                populations = {FOOD_NAME: len(plants), BUG_NAME: len(bugs)}
+                estimator.update(world.time, len(plants), len(bugs))
+                if day % 10 == 0 and plants and bugs:
+                    compatibilities.append(taste_histogram(plants).dot(compatibility).dot(taste_histogram(bugs)) /
+                                           (len(plants) * len(bugs)))
+                run_day(world)
+
+                for name, alive in ((FOOD_NAME, plants), (BUG_NAME, bugs)):
+                    births[name] += len(world.organism_lists[name]['alive']) - populations[name] + \
+                        len(world.organism_lists[name]['dead'][-1])
+                    organism_days[name] += populations[name]
+                    plant_weighted_days[name] += populations[name] * populations[FOOD_NAME] / capacity
+                    bug_weighted_days[name] += populations[name] * populations[BUG_NAME] / capacity
+
+    estimates = estimator.estimates()
+    if estimates is None or not compatibilities or not all(organism_days.values()):
+        raise ValueError('the calibration worlds died out before the rates could be fitted')
+
+    alpha, delta = estimates['alpha'][0], estimates['delta'][0] * capacity
+    fitted_births = {FOOD_NAME: alpha * (organism_days[FOOD_NAME] - plant_weighted_days[FOOD_NAME]),
+                     BUG_NAME: delta * plant_weighted_days[BUG_NAME]}
+    turnover = {name: max(births[name] - fitted_births[name], 0) / organism_days[name] for name in births}
+
+    return dict(alpha=alpha, beta=estimates['beta'][0] * capacity, delta=delta, gamma=estimates['gamma'][0],
+                plant_turnover=turnover[FOOD_NAME], bug_turnover=turnover[BUG_NAME],
+                bug_density=bug_weighted_days[FOOD_NAME] / organism_days[FOOD_NAME],
+                plant_density=plant_weighted_days[BUG_NAME] / organism_days[BUG_NAME],
+                compatibility=float(np.mean(compatibilities)))
+
+
+def calibrated_rates(path=None, **calibration):
+    """
+    Return the rates fitted to the current config settings, calibrating and saving them if they have not been yet.
+    :param path: The path of the saved rates, data/mean_field_calibration.json by default
+    :param calibration: Arguments of calibrate
+    """
+    path = path if path is not None else calibration_path()
+    settings = json.dumps({name: getattr(cfg, name) for name in CALIBRATED_SETTINGS}, sort_keys=True)
+    key = hashlib.sha1((settings + json.dumps(dict(calibration, version=CALIBRATION_VERSION),
+                                              sort_keys=True)).encode()).hexdigest()
+
+    if os.path.exists(path):
+        with open(path) as calibration_file:
+            saved = json.load(calibration_file)
+        if saved['key'] == key:
+            return saved['rates']
+
+    rates = calibrate(**calibration)
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(path, 'w') as calibration_file:
+        json.dump({'key': key, 'rates': rates}, calibration_file, indent=1)
+    return rates
+
+
+def _slices(offset, shape):
+    """Return the slices of the blocks that have a neighbour at an offset, and of those neighbours."""
+    source, target = [], []
+    for step, length in zip(offset, shape):
+        source.append(slice(max(-step, 0), length - max(step, 0)))
+        target.append(slice(max(step, 0), length - max(-step, 0)))
+    return tuple(source), tuple(target)
+
+
+class MeanFieldWorld:
+    """
+    A class to run a world as blocks of squares holding the number of plants and bugs of each taste bin and their
+    total energy, instead of as organisms.
+
+    Each day the counts of every block and taste bin change by random draws around the competitive Lotka-Volterra rates
+    of the agent-level worlds (see calibrate): plants are born into free squares and eaten by bugs, bugs are born from
+    the plants they eat and die at a constant rate. On top of those, plants are born at their turnover rate and bitten
+    to death in proportion to the bugs they are compatible with, and bugs are born from their bites in proportion to the
+    plants they are compatible with and die at their turnover rate. A plant is eaten, and a bug fed, in proportion to
+    how compatible its taste is with the other type in its block, and offspring mutate into neighbouring taste bins, so
+    tastes evolve as they do in the agent-level worlds. Bugs and offspring cross into neighbouring blocks as often as
+    the one square steps of Direction would take them over the edge of a block. Energy is book-kept alongside the counts
+    with the growth, respiration and reproduction costs of the config, organisms die with their minimum energy as they
+    do by running out of it, and it does not drive the counts.
+
+    A region of blocks can be refined into an agent-level World, run, and absorbed back.
+    """
+
+    def __init__(self, rows, columns, block_size=32, rates=None, seed=None, init_food=None, init_bugs=None):
+        """
+        Mean Field World Initialisation
+        :param rows: The number of rows of squares in the world
+        :param columns: The number of columns of squares in the world
+        :param block_size: The number of rows and columns of squares in each block
+        :param rates: Dict of rates as returned by calibrate, calibrated_rates() by default
+        :param seed: The random seed of the world
+        :param init_food: The initial number of food, at the density of the config's world settings by default
+        :param init_bugs: The initial number of bugs, at the density of the config's world settings by default
+        """
+        self.rows = rows
+        self.columns = columns
+        self.block_size = block_size
+        self.rates = rates if rates is not None else calibrated_rates()
+        self.seed = seed if seed is not None else cfg.world['settings']['seed']
+        self.rng = np.random.default_rng(int(hashlib.sha1(str(self.seed).encode()).hexdigest()[:16], 16))
+        self.time = 0
+
+        # Squares in each block, the blocks of the last row and column may be cut short by the edge of the world
+        block_rows = np.diff(np.minimum(np.arange(0, rows + block_size, block_size), rows))
+        block_columns = np.diff(np.minimum(np.arange(0, columns + block_size, block_size), columns))
+        self.squares = np.outer(block_rows[block_rows > 0], block_columns[block_columns > 0])
+        self.shape = self.squares.shape
+
+        self.compatibility = compatibility_matrix().astype(np.float32)
+        self.mutation_kernels = {name: mutation_kernel(SETTINGS[name]) for name in ORGANISMS}
+
+        # Chance of a step crossing into each neighbouring block, for a square spread evenly over a block
+        self.moves = {}
+        for direction in Direction.all_directions:
+            for cross_x in set([0, direction[0]]):
+                for cross_y in set([0, direction[1]]):
+                    chance = 1 / len(Direction.all_directions)
+                    for cross, step in ((cross_x, direction[0]), (cross_y, direction[1])):
+                        if step:
+                            chance *= 1 / block_size if cross else 1 - 1 / block_size
+                    if cross_x or cross_y:
+                        self.moves[(cross_x, cross_y)] = self.moves.get((cross_x, cross_y), 0) + chance
+
+        # Counts of each block and taste bin, and total energy of each block
+        self.counts = {name: np.zeros(self.shape + (TASTE_BINS,), dtype=np.int64) for name in ORGANISMS}
+        self.energy = {name: np.zeros(self.shape) for name in ORGANISMS}
+
+        scale = self.squares.sum() / (cfg.world['settings']['rows'] * cfg.world['settings']['columns'])
+        for name, number in ((FOOD_NAME, init_food), (BUG_NAME, init_bugs)):
+            number = int(round(cfg.world['settings']['init_%s' % ('food' if name == FOOD_NAME else 'bugs')]
+                               * scale)) if number is None else number
+            dropped = self.rng.multinomial(min(number, self.squares.sum()), (self.squares / self.squares.sum()).ravel())
+            spawned = np.zeros_like(self.counts[name])
+            spawned[..., SPAWN_VALS[name]['taste'] % 360 // TASTE_BIN] = dropped.reshape(self.shape)
+            self.counts[name] = self._mutate(name, spawned)
+            self.energy[name] = dropped.reshape(self.shape) * float(SPAWN_VALS[name]['energy'])
+
+    def populations(self):
+        """Return the number of plants and bugs of each block."""
+        return self.counts[FOOD_NAME].sum(-1), self.counts[BUG_NAME].sum(-1)
+
+    def densities(self):
+        """Return the number of plants and bugs of each block per square."""
+        return tuple(population / self.squares for population in self.populations())
+
+    def _binomial(self, counts, chance):
+        """Draw binomials of counts, only for the counts that are not zero, as most taste bins of a block are empty."""
+        drawn = np.zeros(counts.size, dtype=np.int64)
+        occupied = np.flatnonzero(counts)
+        chance = np.asarray(chance)
+        drawn[occupied] = self.rng.binomial(counts.ravel()[occupied], chance if chance.ndim == 0 else
+                                            np.broadcast_to(chance, counts.shape).ravel()[occupied])
+        return drawn.reshape(counts.shape)
+
+    def _mutate(self, name, offspring):
+        """Move each offspring into a taste bin drawn from the mutation kernel of its type."""
+        mutated = np.zeros_like(offspring)
+        remaining, left = offspring, 1.0
+        for shift, chance in sorted(self.mutation_kernels[name].items()):
+            shifted = self._binomial(remaining, min(chance / left, 1))
+            remaining, left = remaining - shifted, left - chance
+            mutated += np.roll(shifted, shift, axis=-1)
+        return mutated
+
+    def _spread(self, counts, energy):
+        """Move each organism into a neighbouring block with the chance of its step crossing there."""
+        mean_energy = (energy / np.maximum(counts.sum(-1), 1)).ravel()
+        counts, energy = counts.ravel().copy(), energy.ravel().copy()
+
+        # Few organisms cross a block edge in a day, so only the taste bins of a block with one leaving are followed
+        left = sum(self.moves.values())
+        remaining = self.rng.binomial(counts, left)
+        leaving = np.flatnonzero(remaining)
+        remaining, blocks = remaining[leaving], leaving // TASTE_BINS
+        block_x, block_y = np.divmod(blocks, self.shape[1])
+
+        for (step_x, step_y), chance in self.moves.items():
+            movers = self.rng.binomial(remaining, min(chance / left, 1))
+            remaining, left = remaining - movers, left - chance
+
+            # Steps off the edge of the world are blocked, those organisms stay
+            moved = (movers > 0) & (block_x + step_x >= 0) & (block_x + step_x < self.shape[0]) & \
+                (block_y + step_y >= 0) & (block_y + step_y < self.shape[1])
+            shift = step_x * self.shape[1] + step_y
+            counts[leaving[moved]] -= movers[moved]
+            counts[leaving[moved] + shift * TASTE_BINS] += movers[moved]
+            carried = np.bincount(blocks[moved], movers[moved] * mean_energy[blocks[moved]], minlength=energy.size)
+            energy -= carried
+            energy += np.roll(carried, shift)
+        return counts.reshape(self.shape + (TASTE_BINS,)), energy.reshape(self.shape)
+
+    def _crowd(self, name):
+        """Thin out blocks holding more organisms of a type than they have squares."""
+        population = self.counts[name].sum(-1)
+        crowded = population > self.squares
+        if crowded.any():
+            scale = np.where(crowded, self.squares / np.maximum(population, 1), 1)
+            self.counts[name] = np.floor(self.counts[name] * scale[..., None]).astype(np.int64)
+            self.energy[name] *= scale
+
+    def run_day(self):
+        """Run the plant and bug life cycles of one day of every block."""
+        self.time += 1
+        rates = self.rates
+
+        # Drop one of each endangered type on a random block, with the average taste of its type, as the world does
+        if self.time < cfg.endangered_time:
+            for name, threshold in ((FOOD_NAME, cfg.food_endangered_threshold),
+                                    (BUG_NAME, cfg.bug_endangered_threshold)):
+                histogram = self.counts[name].sum((0, 1))
+                if histogram.sum() < threshold:
+                    block = np.unravel_index(self.rng.choice(self.squares.size, p=self.squares.ravel() /
+                                                             self.squares.sum()), self.shape)
+                    taste = average_taste(histogram) if histogram.any() else SPAWN_VALS[name]['taste'] % 360
+                    self.counts[name][block + (int(taste) // TASTE_BIN,)] += 1
+                    self.energy[name][block] += SPAWN_VALS[name]['energy']
+
+        plants, bugs = self.counts[FOOD_NAME], self.counts[BUG_NAME]
+        plant_energy, bug_energy = self.energy[FOOD_NAME], self.energy[BUG_NAME]
+        squares = self.squares[..., None]
+        plant_population, bug_population = plants.sum(-1), bugs.sum(-1)
+
+        # Plants grow, then reproduce into the free squares of their block
+        plant_energy = np.minimum(plant_energy + cfg.food['growth_rate'] * plant_population,
+                                  SPAWN_VALS[FOOD_NAME]['energy_max'] * plant_population)
+        free = np.clip(1 - plant_population[..., None] / squares, 0, None)
+        plant_births = self.rng.poisson((rates['alpha'] * free + rates['plant_turnover']) * plants)
+        plant_offspring_energy = self._offspring_energy(FOOD_NAME, plant_births, plant_energy)
+        plant_energy -= plant_births.sum(-1) * cfg.food['reproduction_cost'] + plant_offspring_energy
+
+        # Bugs bite the plants beneath them they are compatible with, and finish off some
+        exposure = bugs.astype(np.float32).dot(self.compatibility) / squares
+        eaten = self._binomial(plants, np.clip(rates['beta'] * exposure / rates['compatibility'], 0, 1))
+        starved = self._binomial(plants - eaten, np.clip(rates['plant_turnover'] / rates['bug_density'] * exposure /
+                                                         rates['compatibility'], 0, 1))
+        appetite = plants.astype(np.float32).dot(self.compatibility) / squares
+        bites = (bugs * appetite).sum(-1) * np.minimum(Bug.mouth_size, plant_energy / np.maximum(plant_population, 1))
+        bites = np.minimum(bites, np.maximum(plant_energy, 0))
+        plant_energy -= bites
+
+        bug_births = self.rng.poisson((rates['delta'] + rates['bug_turnover'] / rates['plant_density']) * bugs *
+                                      appetite / rates['compatibility'])
+        bug_deaths = self._binomial(bugs, np.clip(rates['gamma'] + rates['bug_turnover'], 0, 1))
+        bug_energy = np.minimum(bug_energy + bites - cfg.bug['respiration_rate'] * bug_population,
+                                SPAWN_VALS[BUG_NAME]['energy_max'] * bug_population)
+        bug_energy -= bug_deaths.sum(-1) * np.clip(bug_energy / np.maximum(bug_population, 1), 0,
+                                                   cfg.bug['min_energy'])
+        survivors = bugs - bug_deaths
+        bug_offspring_energy = self._offspring_energy(BUG_NAME, bug_births, bug_energy)
+        bug_energy -= bug_births.sum(-1) * cfg.bug['reproduction_cost'] + bug_offspring_energy
+
+        # Offspring are born a step away from their parents, and every bug steps
+        plant_offspring, plant_offspring_energy = self._spread(self._mutate(FOOD_NAME, plant_births),
+                                                               plant_offspring_energy)
+        plant_energy = np.maximum(plant_energy, 0)
+        plant_energy -= (eaten + starved).sum(-1) * np.minimum(plant_energy / np.maximum(plant_population, 1),
+                                                               cfg.food['min_energy'])
+        self.counts[FOOD_NAME] = plants - eaten - starved + plant_offspring
+        self.energy[FOOD_NAME] = plant_energy + plant_offspring_energy
+        self.counts[BUG_NAME], self.energy[BUG_NAME] = self._spread(
+            survivors + self._mutate(BUG_NAME, bug_births), np.maximum(bug_energy, 0) + bug_offspring_energy)
+
+        for name in ORGANISMS:
+            self._crowd(name)
+
+    @staticmethod
+    def _offspring_energy(name, births, energy):
+        """
+        Return the energy the parents of a block give their offspring, as in Organism.reproduce. A parent reproduces
+        once its energy reaches its reproduction threshold, so it gives a fraction of the spawn reproduction threshold,
+        as the blocks do not keep reproduction thresholds, and no more than that fraction of the energy of the block.
+        """
+        return np.minimum(births.sum(-1) * SPAWN_VALS[name]['reproduction_threshold'], np.maximum(energy, 0)) * \
+            cfg.offspring_energy_fraction
+
+    def statistics(self):
+        """Return the population, energy and average taste of each organism type, in a dict by type."""
+        statistics = {}
+        for name in ORGANISMS:
+            histogram = self.counts[name].sum((0, 1))
+            statistics[name] = dict(population=int(histogram.sum()), energy=float(self.energy[name].sum()),
+                                    average_taste=float(average_taste(histogram)) if histogram.any() else np.nan)
+        return statistics
+
+    def _block_bounds(self, block_x, block_y):
+        return block_x * self.block_size, min((block_x + 1) * self.block_size, self.rows), \
+            block_y * self.block_size, min((block_y + 1) * self.block_size, self.columns)
+
+    def refine(self, start, end, seed=None):
+        """
+        Make an agent-level World of a region of blocks.
+
+        Each block's organisms are put on squares of the block drawn without replacement, with tastes drawn from their
+        taste bins, the average energy of their block, and the spawn reproduction threshold of their type, as the
+        blocks do not keep reproduction thresholds.
+        :param start: The [x, y] of the first block of the region
+        :param end: The [x, y] of the block after the last of the region
+        :param seed: The random seed of the world, made from the mean field world's by default
+        :return: The world, its square [0, 0] is the first square of the start block
+        """
+        origin_x, _, origin_y, _ = self._block_bounds(*start)
+        _, end_x, _, end_y = self._block_bounds(end[0] - 1, end[1] - 1)
+        seed = seed if seed is not None else '%s-refined-%d-%d-%d' % (self.seed, self.time, start[0], start[1])
+        with contextlib.redirect_stdout(io.StringIO()):
+            world = World(end_x - origin_x, end_y - origin_y, seed=seed, time=self.time)
+        rng = np.random.default_rng(random.getrandbits(64))
+
+        for name, organism_class in ORGANISMS.items():
+            organisms = []
+            for block_x in range(start[0], end[0]):
+                for block_y in range(start[1], end[1]):
+                    counts = self.counts[name][block_x, block_y]
+                    number = int(counts.sum())
+                    if not number:
+                        continue
+
+                    min_x, max_x, min_y, max_y = self._block_bounds(block_x, block_y)
+                    chosen = rng.choice((max_x - min_x) * (max_y - min_y), number, replace=False)
+                    xs = (min_x - origin_x + chosen // (max_y - min_y)).tolist()
+                    ys = (min_y - origin_y + chosen % (max_y - min_y)).tolist()
+                    tastes = (np.repeat(np.arange(TASTE_BINS), counts) * TASTE_BIN +
+                              rng.integers(0, TASTE_BIN, number)).tolist()
+                    energy = int(round(self.energy[name][block_x, block_y] / number))
+
+                    for x, y, taste in zip(xs, ys, tastes):
+                        organism = organism_class.__new__(organism_class)
+                        Organism.__init__(organism, [x, y], energy, SPAWN_VALS[name]['reproduction_threshold'],
+                                          SPAWN_VALS[name]['energy_max'], taste)
+                        organisms.append(organism)
+            world.spawn_all(organisms)
+
+        world.update_available_spawn_squares()
+        return world
+
+    def absorb(self, world, start):
+        """
+        Replace the blocks of a region with the organisms of an agent-level World, such as one made by refine.
+        :param world: The world, its squares must cover whole blocks from the start block on or reach the world's edge
+        :param start: The [x, y] of the first block the world covers
+        """
+        origin_x, _, origin_y, _ = self._block_bounds(*start)
+        end = [start[0] + -(-world.rows // self.block_size), start[1] + -(-world.columns // self.block_size)]
+        region = (slice(start[0], end[0]), slice(start[1], end[1]))
+
+        for name in ORGANISMS:
+            self.counts[name][region] = 0
+            self.energy[name][region] = 0
+            alive = world.organism_lists[name]['alive']
+            if not alive:
+                continue
+            positions = np.array([organism.position for organism in alive])
+            block_xs = (origin_x + positions[:, 0]) // self.block_size
+            block_ys = (origin_y + positions[:, 1]) // self.block_size
+            tastes = np.array([organism.taste for organism in alive]) // TASTE_BIN
+            np.add.at(self.counts[name], (block_xs, block_ys, tastes), 1)
+            np.add.at(self.energy[name], (block_xs, block_ys), [organism.energy for organism in alive])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a coarse-grained world of blocks of squares.')
+    parser.add_argument('rows', type=int)
+    parser.add_argument('columns', type=int)
+    parser.add_argument('--block-size', type=int, default=32, help='rows and columns of squares in each block')
+    parser.add_argument('--days', type=int, default=1000)
+    parser.add_argument('--record-every', type=int, default=10, help='days between recorded statistics and maps')
+    parser.add_argument('--seed', default=None)
+    arguments = parser.parse_args()
+
+    mean_field_world = MeanFieldWorld(arguments.rows, arguments.columns, arguments.block_size, seed=arguments.seed)
+    directory = mean_field_path(mean_field_world.seed)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    times, maps = [], []
+    with open(os.path.join(directory, 'mean_field_data.csv'), 'w', newline='') as data_file:
+        writer = csv.writer(data_file)
+        writer.writerow(['time'] + ['%s_%s' % (name, statistic) for name in ORGANISMS
+                                    for statistic in ('population', 'energy', 'average_taste')])
+        for day in range(arguments.days + 1):
+            if day % arguments.record_every == 0 or day == arguments.days:
+                statistics = mean_field_world.statistics()
+                writer.writerow([mean_field_world.time] + [statistics[name][statistic] for name in ORGANISMS
+                                                           for statistic in ('population', 'energy', 'average_taste')])
+                print('time: {}, plants: {}, bugs: {}'.format(mean_field_world.time,
+                                                              statistics[FOOD_NAME]['population'],
+                                                              statistics[BUG_NAME]['population']))
+                times.append(mean_field_world.time)
+                maps.append(np.stack(mean_field_world.densities()).astype(np.float32))
+            if day < arguments.days:
+                mean_field_world.run_day()
+
+    # Density maps of the recorded days, [day][plants or bugs][block x][block y]
+    np.savez_compressed(os.path.join(directory, 'mean_field_maps.npz'), time=np.array(times), densities=np.stack(maps))
@@ -0,0 +1,168 @@
+import numpy as np
+import os
+import sys
+import types
+import resource
+import tracemalloc
+from constants import FOOD_NAME, BUG_NAME
+
+
+def deep_size(obj, seen):
+    """Return the bytes held by an object and everything it refers to that is not already in seen."""
+    size, stack = 0, [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, (type, types.ModuleType, types.FunctionType, types.MethodType)):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+
+        if isinstance(obj, np.ndarray):
+            if obj.base is not None and not isinstance(obj.base, (bytes, bytearray)):
+                stack.append(obj.base)
+            elif obj.base is not None:
+                size += sys.getsizeof(obj.base)
+                seen.add(id(obj.base))
+        elif isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif not isinstance(obj, (str, bytes, bytearray, int, float, bool)) and hasattr(obj, '__dict__'):
+            stack.append(obj.__dict__)
+    return size
+
+
+def resident_bytes():
+    """Return the resident set size of the process, or the peak where the current size cannot be read."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except (IOError, OSError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class MemoryMonitor:
+    """
+    A class to sample the memory of a run every few days and attribute it to the structures of the world and recorder.
+
+    Structures are measured by walking the objects they refer to, each object counted once per sample in the order
+    the structures are listed. The process total is the resident set size, or the memory traced by tracemalloc which
+    also attributes matplotlib allocations but slows the run down.
+    """
+
+    def __init__(self, world, world_recorder=None, interval=100, method='rss',
+                 growth_tolerance=0.1, growth_samples=10):
+        """
+        Memory Monitor Initialisation
+        :param world: The world being measured
+        :param world_recorder: The recorder of the world
+        :param interval: The number of days between samples
+        :param method: 'rss' or 'tracemalloc'
+        :param growth_tolerance: The relative growth over the latest samples above which a structure is flagged
+        :param growth_samples: The number of latest samples a structure must grow over to be flagged
+        """
+        self.world = world
+        self.world_recorder = world_recorder
+        self.interval = interval
+        self.method = method
+        self.growth_tolerance = growth_tolerance
+        self.growth_samples = growth_samples
+        self.samples = []
+
+        if method == 'tracemalloc' and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        self.path = os.path.join('data', world.seed, 'data_files')
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        self.columns = ['time', 'total', 'organisms', 'bytes_per_organism'] + list(self.structures()) + ['matplotlib']
+        with open(os.path.join(self.path, 'memory_data.csv'), 'w') as memory_file:
+            memory_file.write(','.join(self.columns) + '\n')
+
+    def structures(self):
+        """Return a dict of the structures to measure, by name."""
+        world, world_recorder = self.world, self.world_recorder
+        structures = {
+            'alive_food': world.organism_lists[FOOD_NAME]['alive'],
+            'alive_bugs': world.organism_lists[BUG_NAME]['alive'],
+            'dead_windows': [world.organism_lists[name]['dead'] for name in (FOOD_NAME, BUG_NAME)],
+            'grid': world.grid,
+            'id_grids': [world.id_grids, world.slots, world.free_slots],
+            'spawnable_squares': [world.fertile_squares, world.spawnable_squares],
+            'organism_data': world_recorder.organism_data if world_recorder is not None else None,
+            'world_data': world_recorder.world_data if world_recorder is not None else None,
+            'lineage': world.lineage,
+            'gene_histograms': world.gene_histograms,
+            'history_events': world.history.events if world.history is not None else None}
+        return structures
+
+    def update(self):
+        """Take a sample if one is due at the current time."""
+        if self.world.time % self.interval == 0:
+            self.sample()
+
+    def sample(self):
+        """Measure each structure and the process, and append them to the memory data file."""
+        seen = set()
+        sizes = {name: deep_size(structure, seen) if structure is not None else 0
+                 for name, structure in self.structures().items()}
+        organisms = sum(len(self.world.organism_lists[name]['alive']) for name in (FOOD_NAME, BUG_NAME))
+
+        if self.method == 'tracemalloc':
+            total = tracemalloc.get_traced_memory()[0]
+            if 'matplotlib' in sys.modules:
+                sizes['matplotlib'] = sum(statistic.size for statistic in
+                                          tracemalloc.take_snapshot().statistics('filename')
+                                          if 'matplotlib' in statistic.traceback[0].filename)
+        else:
+            total = resident_bytes()
+        sizes.setdefault('matplotlib', 0)
+
+        row = {'time': self.world.time, 'total': total, 'organisms': organisms,
+               'bytes_per_organism': (sizes['alive_food'] + sizes['alive_bugs']) / organisms if organisms else 0}
+        row.update(sizes)
+        self.samples.append(row)
+
+        with open(os.path.join(self.path, 'memory_data.csv'), 'a') as memory_file:
+            memory_file.write(','.join('%r' % row[column] for column in self.columns) + '\n')
+
+    def growing(self):
+        """
+        Return the structures that grew in every one of the latest samples by more than the growth tolerance in total.
+        Structures that follow the populations rise and fall with them, so steady growth points to a leak.
+        """
+        if len(self.samples) < self.growth_samples:
+            return []
+
+        latest = self.samples[-self.growth_samples:]
+        flagged = []
+        for name in self.columns[4:] + ['total']:
+            values = [sample.get(name, 0) for sample in latest]
+            if all(later >= earlier for earlier, later in zip(values, values[1:])) and \
+                    values[-1] > (1 + self.growth_tolerance) * max(values[0], 1):
+                flagged.append(name)
+        return flagged
+
+    def report(self):
+        """Write a summary of the samples next to the statistics files, and return the structures flagged as growing."""
+        if not self.samples:
+            return []
+
+        flagged = self.growing()
+        last = self.samples[-1]
+        with open(os.path.join(self.path, 'memory_report.txt'), 'w') as report_file:
+            report_file.write('memory report for %s, %d samples every %d days (%s)\n\n' % (
+                self.world.seed, len(self.samples), self.interval, self.method))
+            report_file.write('%-20s %14s %14s %14s\n' % ('structure', 'last bytes', 'mean bytes', 'peak bytes'))
+            for name in self.columns[4:] + ['total']:
+                values = [sample.get(name, 0) for sample in self.samples]
+                report_file.write('%-20s %14d %14d %14d%s\n' % (
+                    name, last.get(name, 0), np.mean(values), max(values), '  GROWING' if name in flagged else ''))
+            report_file.write('\nbytes per alive organism: %.0f (%d alive)\n' % (
+                last['bytes_per_organism'], last['organisms']))
+
+        if flagged:
+            print('memory growing over the last %d samples: %s' % (self.growth_samples, ', '.join(flagged)))
+        return flagged
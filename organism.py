@@ -7,8 +7,14 @@ class Organism:
     """
     The parent class for all organisms living in the world.
     """
+    name = None  # also the name of the organism's settings in config
     reproduction_cost = None
     maturity_age = None
+    dormant_since = None  # time from which the world stopped scheduling the organism
+    logged_energy = 0  # energy last written to a world history
+    slot = None  # index of the organism in the world's slots of its type while it is alive
+    uid = None  # id given by a lineage tracker
+    parent_uid = None
 
     def __init__(self, position, energy, reproduction_threshold, energy_max, taste):
         """
@@ -36,6 +42,45 @@ class Organism:
     def mutate(current_val, max_mutation_rate):
         return current_val + randint(-max_mutation_rate, max_mutation_rate)
 
+    @staticmethod
+    def mutate_all(current_val, max_mutation_rate, number, rng):
+        """Return an array of a number of mutations of a value, drawn with a numpy random generator."""
+        return current_val + rng.integers(-max_mutation_rate, max_mutation_rate, number, endpoint=True)
+
+    @classmethod
+    def mutated_genes(cls, number, reproduction_threshold, taste, rng):
+        """Return arrays of the genes of a number of new organisms, mutated as the __init__ of the subclass does."""
+        settings = getattr(cfg, cls.name)
+
+        new_rep_threshes = cls.mutate_all(reproduction_threshold, settings['reproduction_threshold_mutation_limit'],
+                                          number, rng) if settings['evolve_reproduction_threshold'] \
+            else cls.unevolved_reproduction_thresholds(number, reproduction_threshold, rng)
+
+        new_tastes = cls.mutate_all(taste, settings['taste_mutation_limit'], number, rng) if settings['evolve_taste'] \
+            else np.full(number, taste)
+
+        return new_rep_threshes, new_tastes
+
+    @classmethod
+    def unevolved_reproduction_thresholds(cls, number, reproduction_threshold, rng):
+        """Return the reproduction thresholds of a number of new organisms when the threshold does not evolve."""
+        return np.full(number, reproduction_threshold)
+
+    @classmethod
+    def create_all(cls, positions, energy, reproduction_threshold, energy_max, taste, rng):
+        """
+        Return new organisms with genes mutated as __init__ does, drawn for all of them at once.
+        :param positions: The positions of the organisms
+        :param rng: The numpy random generator the mutations are drawn with
+        """
+        reproduction_thresholds, tastes = cls.mutated_genes(len(positions), reproduction_threshold, taste, rng)
+        organisms = []
+        for position, new_rep_thresh, new_taste in zip(positions, reproduction_thresholds.tolist(), tastes.tolist()):
+            organism = cls.__new__(cls)
+            Organism.__init__(organism, position, energy, new_rep_thresh, energy_max, new_taste)
+            organisms.append(organism)
+        return organisms
+
     def can_reproduce(self):
         return self.energy >= self.reproduction_threshold and self.lifetime > self.maturity_age
 
@@ -55,4 +100,6 @@ class Organism:
             self.energy = 0
 
         # Create new object
-        return self.__class__(new_position, new_energy, new_reproduction_threshold, new_energy_max, new_taste)
+        offspring = self.__class__(new_position, new_energy, new_reproduction_threshold, new_energy_max, new_taste)
+        offspring.parent_uid = self.uid
+        return offspring
@@ -0,0 +1,55 @@
+import numpy as np
+from constants import FOOD_VAL, BUG_VAL
+
+
+class PackedGrid:
+    """
+    A class to hold the world grid as two bit-packed occupancy planes, one for food and one for bugs.
+
+    Squares are read and written through grid[x, y] with the same values as the array grid (EMPTY_SQUARE_VAL, FOOD_VAL,
+    BUG_VAL or FOOD_VAL + BUG_VAL), so the world can use either. Each square takes 2 bits instead of 8 for a uint8 grid.
+    """
+
+    def __init__(self, rows, columns):
+        """
+        Packed Grid Initialisation
+        :param rows: The number of rows in the grid
+        :param columns: The number of columns in the grid
+        """
+        self.shape = (rows, columns)
+        self.row_bytes = (columns + 7) // 8
+        self.food = bytearray(rows * self.row_bytes)
+        self.bugs = bytearray(rows * self.row_bytes)
+
+    def __getitem__(self, position):
+        x, y = position
+        i, bit = x * self.row_bytes + (y >> 3), 1 << (y & 7)
+        return (FOOD_VAL if self.food[i] & bit else 0) + (BUG_VAL if self.bugs[i] & bit else 0)
+
+    item = __getitem__
+
+    def __setitem__(self, position, value):
+        x, y = position
+        i, bit = x * self.row_bytes + (y >> 3), 1 << (y & 7)
+        for plane, plane_value in [(self.food, FOOD_VAL), (self.bugs, BUG_VAL)]:
+            if value & plane_value:
+                plane[i] |= bit
+            else:
+                plane[i] &= ~bit & 0xff
+
+    def plane(self, organism_value):
+        """Return the occupancy of one organism type as a boolean array."""
+        packed = np.frombuffer(self.food if organism_value == FOOD_VAL else self.bugs, dtype=np.uint8)
+        return np.unpackbits(packed.reshape(self.shape[0], self.row_bytes), axis=1, count=self.shape[1],
+                             bitorder='little').astype(bool)
+
+    def to_array(self):
+        """Return the grid as a uint8 array."""
+        return (self.plane(FOOD_VAL) * np.uint8(FOOD_VAL)) + (self.plane(BUG_VAL) * np.uint8(BUG_VAL))
+
+    def __array__(self, dtype=None, copy=None):
+        return self.to_array() if dtype is None else self.to_array().astype(dtype)
+
+    @property
+    def nbytes(self):
+        return len(self.food) + len(self.bugs)
@@ -0,0 +1,67 @@
+import math
+
+POLICIES = ['every', 'log', 'change']
+
+
+class RecordingPolicy:
+    """
+    A class to decide which days of a run are recorded: every few days, log-spaced days, or the days on which the
+    world changed.
+
+    Log-spaced recording keeps the early days, when the populations settle, at full resolution and thins out the long
+    tail, so a run of 10^5 days is held in a few hundred recordings. Change-triggered recording compares a signal of
+    the world, such as the populations and average genes, with its value on the last recorded day and records once
+    any part has moved by more than the threshold, relative to its size.
+    """
+
+    def __init__(self, policy='every', interval=1, days_per_decade=20, threshold=0.1, max_gap=None):
+        """
+        Recording Policy Initialisation
+        :param policy: 'every' for every interval days, 'log' for log-spaced days, or 'change' for days the signal moved
+        :param interval: The number of days between recordings for 'every'
+        :param days_per_decade: The number of recordings for each tenfold increase in time for 'log'
+        :param threshold: The relative change in any part of the signal since the last recording for 'change'
+        :param max_gap: The most days between recordings for 'change', None for no limit
+        """
+        if policy not in POLICIES:
+            raise ValueError('recording policy must be one of %s, not %r' % (', '.join(POLICIES), policy))
+
+        self.policy = policy
+        self.interval = interval
+        self.days_per_decade = days_per_decade
+        self.threshold = threshold
+        self.max_gap = max_gap
+        self.last_time = None
+        self.last_signal = None
+        self.decided_time, self.decision = None, None
+
+    def _log_bucket(self, time):
+        return math.floor(self.days_per_decade * math.log10(time + 1))
+
+    def due(self, time, signal=None):
+        """
+        Decide whether a day is recorded, a day asked about more than once gets the same answer.
+        :param time: The time of the day
+        :param signal: For 'change', the list of values watched for changes or a function returning it
+        :return: True if the day is recorded
+        """
+        if time == self.decided_time:
+            return self.decision
+
+        if self.policy == 'every':
+            decision = time % self.interval == 0
+        elif self.policy == 'log':
+            decision = self.last_time is None or self._log_bucket(time) != self._log_bucket(self.last_time)
+        else:
+            signal = list(signal() if callable(signal) else signal)
+            decision = self.last_signal is None or \
+                (self.max_gap is not None and time - self.last_time >= self.max_gap) or \
+                any(abs(value - last_value) > self.threshold * max(abs(last_value), 1)
+                    for value, last_value in zip(signal, self.last_signal))
+            if decision:
+                self.last_signal = signal
+
+        if decision:
+            self.last_time = time
+        self.decided_time, self.decision = time, decision
+        return decision
@@ -0,0 +1,73 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+RENDER_VERSION = 1  # bump when the plotting code changes how an image looks, so every image is drawn again
+
+
+def manifest_path(seed):
+    return os.path.join('data', seed, 'render_manifest.jsonl')
+
+
+class RenderManifest:
+    """
+    A class to remember the inputs and render settings each output image was drawn from, so only missing or stale
+    images are drawn again.
+
+    An image's key is a hash of the data it was drawn from, the render settings and RENDER_VERSION. The manifest is a
+    log with a line appended for each image drawn, later lines replacing earlier ones for the same image, so drawing a
+    day costs one small write however many images the run has.
+    """
+
+    def __init__(self, seed, settings):
+        """
+        Render Manifest Initialisation
+        :param seed: The seed of the run whose images are tracked
+        :param settings: Dict of the settings the images are drawn with
+        """
+        self.path = manifest_path(seed)
+        self.settings = json.dumps(dict(settings, render_version=RENDER_VERSION), sort_keys=True)
+        self.keys = {}
+
+        lines = 0
+        if os.path.exists(self.path):
+            with open(self.path) as manifest_file:
+                for line in manifest_file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by an interrupted write
+                    self.keys[entry['output']] = entry['key']
+                    lines += 1
+
+        # Rewrite the log without replaced lines once they outnumber the images
+        if lines > 2 * len(self.keys) + 100:
+            with open(self.path + '.tmp', 'w') as manifest_file:
+                for output, key in self.keys.items():
+                    manifest_file.write(json.dumps({'output': output, 'key': key}) + '\n')
+            os.replace(self.path + '.tmp', self.path)
+
+    def key(self, *inputs):
+        """Return the key of an image drawn from some inputs, which may be arrays, strings or numbers."""
+        digest = hashlib.sha1(self.settings.encode())
+        for item in inputs:
+            if isinstance(item, np.ndarray):
+                digest.update(('%s%s' % (item.dtype.str, item.shape)).encode())
+                digest.update(np.ascontiguousarray(item).tobytes())
+            elif isinstance(item, bytes):
+                digest.update(item)
+            else:
+                digest.update(repr(item).encode())
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def stale(self, output, key):
+        """Return True if an image is missing or was drawn from other inputs or settings."""
+        return self.keys.get(output) != key or not os.path.exists(output)
+
+    def rendered(self, output, key):
+        """Record that an image has been drawn."""
+        self.keys[output] = key
+        with open(self.path, 'a') as manifest_file:
+            manifest_file.write(json.dumps({'output': output, 'key': key}) + '\n')
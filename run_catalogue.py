@@ -0,0 +1,117 @@
+"""
+Query the catalogue of runs: python run_catalogue.py "SQL" [DATABASE]
+e.g. python run_catalogue.py "SELECT seed, food_growth_rate, MAX(population) FROM runs JOIN stats USING (run_id)
+                               WHERE organism = 'bug' GROUP BY run_id"
+"""
+
+import datetime
+import os
+import sqlite3
+import sys
+import types
+
+STATS_COLUMNS = ['time', 'energy', 'population', 'deaths', 'average_deaths', 'average_alive_lifetime',
+                 'average_lifespan', 'average_reproduction_threshold']
+
+
+def catalogue_path():
+    return os.path.join('data', 'runs.sqlite')
+
+
+def config_columns(config):
+    """
+    Flatten the settings of a config module into a dict of column names and values, nested dicts are joined with
+    underscores (food['growth_rate'] becomes food_growth_rate) and values that are not numbers or strings are kept
+    as their repr.
+    """
+    columns = {}
+
+    def add(name, value):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                add('%s_%s' % (name, key), item)
+        elif value is None or isinstance(value, (bool, int, float, str)):
+            columns[name] = value
+        else:
+            columns[name] = repr(value)
+
+    for name, value in vars(config).items():
+        if not name.startswith('_') and not isinstance(value, (types.ModuleType, types.FunctionType, type)):
+            add(name, value)
+    return columns
+
+
+class RunCatalogue:
+    """
+    A class to store the config and daily statistics of runs in one SQLite database, so runs can be compared with SQL.
+
+    Each run is a row of the runs table with a column for every config setting, columns are added as new settings
+    appear. The statistics table holds a row for each organism type and recorded day of each run, indexed by run and
+    time. The database is in WAL mode so runs can write to it while it is read.
+    """
+
+    def __init__(self, path=None):
+        """
+        Run Catalogue Initialisation
+        :param path: The path of the database, data/runs.sqlite by default
+        """
+        self.path = path if path is not None else catalogue_path()
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.connection = sqlite3.connect(self.path, timeout=60)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS runs (run_id INTEGER PRIMARY KEY, started TEXT, '
+                                    'finished TEXT, days INTEGER)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS stats (run_id INTEGER, organism TEXT, %s)'
+                                    % ', '.join('%s REAL' % column for column in STATS_COLUMNS))
+            self.connection.execute('CREATE INDEX IF NOT EXISTS stats_run_time ON stats (run_id, organism, time)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS stats_time ON stats (time)')
+
+    def add_run(self, columns):
+        """
+        Add a run, returns its id.
+        :param columns: Dict of the metadata of the run by column name, such as its seed and config settings
+        """
+        with self.connection:
+            existing = set(row[1] for row in self.connection.execute('PRAGMA table_info(runs)'))
+            for name in columns:
+                if name not in existing:
+                    self.connection.execute('ALTER TABLE runs ADD COLUMN "%s"' % name)
+
+            names = list(columns)
+            cursor = self.connection.execute(
+                'INSERT INTO runs (started, %s) VALUES (?, %s)' % (', '.join('"%s"' % name for name in names),
+                                                                   ', '.join('?' * len(names))),
+                [datetime.datetime.now().isoformat(' ', 'seconds')] + [columns[name] for name in names])
+        return cursor.lastrowid
+
+    def add_stats(self, rows):
+        """Insert rows of (run_id, organism) followed by the values of STATS_COLUMNS in one transaction."""
+        with self.connection:
+            self.connection.executemany('INSERT INTO stats VALUES (%s)' % ', '.join('?' * (len(STATS_COLUMNS) + 2)),
+                                        rows)
+
+    def finish_run(self, run_id, days):
+        with self.connection:
+            self.connection.execute('UPDATE runs SET finished = ?, days = ? WHERE run_id = ?',
+                                    (datetime.datetime.now().isoformat(' ', 'seconds'), days, run_id))
+
+    def query(self, sql, parameters=()):
+        """Return the column names and rows of a query."""
+        cursor = self.connection.execute(sql, parameters)
+        return [description[0] for description in cursor.description], cursor.fetchall()
+
+    def close(self):
+        self.connection.close()
+
+
+if __name__ == '__main__':
+    run_catalogue = RunCatalogue(sys.argv[2] if len(sys.argv) > 2 else None)
+    names, results = run_catalogue.query(sys.argv[1])
+    print('\t'.join(names))
+    for result in results:
+        print('\t'.join(str(value) for value in result))
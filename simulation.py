@@ -0,0 +1,67 @@
+import config as cfg
+from constants import *
+from direction import Direction
+
+
+def run_day(w):
+    """Run the food and bug life cycles of one day of a world."""
+
+    # Prepare today's work
+    alive_plants, alive_bugs = w.prepare_today()
+
+    # Food life cycle
+    plant_index = 0
+    while plant_index < len(alive_plants):
+        plant = alive_plants[plant_index]
+
+        # Should it die?
+        if plant.energy <= cfg.food['min_energy']:
+            w.kill(plant)
+            continue
+
+        plant.grow()
+
+        if plant.can_reproduce() and w.has_space(plant):
+            trial_direction = Direction.random()
+            if w.available(plant, trial_direction):
+                w.spawn(plant.reproduce(trial_direction))
+
+        # Set aside if it can't change until something nearby does
+        if w.active_set_scheduling and w.settle(plant):
+            continue
+
+        plant_index += 1
+
+    # Bug life cycle
+    bug_index = 0
+    while bug_index < len(alive_bugs):
+        bug = alive_bugs[bug_index]
+
+        # Should it die?
+        if bug.energy <= cfg.bug['min_energy']:
+            w.kill(bug)
+            continue
+
+        bug.respire()
+
+        # Try move (if not newly born)
+        if (bug.lifetime > 1 or w.time == 1) and w.has_space(bug):
+            trial_direction = Direction.random()
+
+            if w.available(bug, trial_direction):
+                w.move(bug, trial_direction)
+
+        # Can it eat?
+        plant_beneath = w.organism_at(FOOD_NAME, bug.position.tolist())
+        if plant_beneath is not None:
+            if bug.try_eat(plant_beneath):
+                w.kill(plant_beneath)
+            else:
+                w.wake(plant_beneath)
+
+        if bug.can_reproduce() and w.has_space(bug):
+            trial_direction = Direction.random()
+            if w.available(bug, trial_direction):
+                w.spawn(bug.reproduce(trial_direction))
+
+        bug_index += 1
@@ -0,0 +1,117 @@
+import time
+from collections import deque
+import config as cfg
+
+
+class StopPolicy:
+    """
+    A class to decide each day whether a run should end: a day budget, a wall-clock budget, extinction, or a steady
+    state of the population and gene statistics.
+
+    A series is steady once the means and standard deviations of the two halves of its latest 2 * window days agree
+    to within tolerance of its level. Comparing halves rather than bounding the variance lets oscillating populations
+    count as steady as long as their cycles no longer change. The window sums are updated as days enter and leave, so
+    each check is O(1).
+    """
+
+    def __init__(self, days=None, wall_clock=None, extinction=True, steady_state_window=None,
+                 steady_state_tolerance=0.05, series=None):
+        """
+        Stop Policy Initialisation
+        :param days: The number of days to run
+        :param wall_clock: The number of seconds to run
+        :param extinction: Set to True to stop once plants or bugs have died out after the endangered time
+        :param steady_state_window: The number of days in each half of the steady state window, None to not check
+        :param steady_state_tolerance: The largest change in mean or standard deviation, relative to the level
+        :param series: List of (organism, statistic) recorder series checked for a steady state
+        """
+        self.days = days
+        self.wall_clock = wall_clock
+        self.extinction = extinction
+        self.window = steady_state_window
+        self.tolerance = steady_state_tolerance
+        self.series = series if series is not None else [('food', 'population'), ('bug', 'population'),
+                                                         ('food', 'average_reproduction_threshold'),
+                                                         ('bug', 'average_reproduction_threshold')]
+        self.start_time = time.monotonic()
+
+        # The latest values of each series, and [count, sum, sum of squares] of the older and newer halves
+        self.values = [deque() for _ in self.series]
+        self.sums = [[[0, 0., 0.], [0, 0., 0.]] for _ in self.series]
+        self.updates_since_refresh = 0
+
+    @property
+    def bounded(self):
+        """Return True if the run is certain to end without a kill switch."""
+        return self.days is not None or self.wall_clock is not None
+
+    def check(self, world_recorder):
+        """
+        Add the latest statistics of the recorder and decide whether to stop.
+        :param world_recorder: A recorder whose statistics have just been generated for the current time
+        :return: The reason to stop, or None to carry on
+        """
+        world = world_recorder.world
+
+        if self.window is not None:
+            for i, (organism, statistic) in enumerate(self.series):
+                self._add(i, world_recorder.organism_data[organism][statistic][-1])
+
+            self.updates_since_refresh += 1
+            if self.updates_since_refresh >= 2 * self.window:
+                self._refresh()
+
+        if self.days is not None and world.time >= self.days:
+            return 'day budget of %d days reached' % self.days
+        if self.wall_clock is not None and time.monotonic() - self.start_time >= self.wall_clock:
+            return 'wall-clock budget of %g seconds reached' % self.wall_clock
+        if self.extinction and world.time > cfg.endangered_time:
+            for organism in ['food', 'bug']:
+                if not world.organism_lists[organism]['alive']:
+                    return '%s extinct' % organism
+        if self.window is not None and self.steady():
+            return 'steady state over %d days' % (2 * self.window)
+        return None
+
+    def _add(self, i, value):
+        values, (older, newer) = self.values[i], self.sums[i]
+        values.append(value)
+        self._move(newer, value, 1)
+
+        # The value leaving the newer half joins the older half, and the value leaving the window is dropped
+        if len(values) > self.window:
+            self._move(newer, values[-self.window - 1], -1)
+            self._move(older, values[-self.window - 1], 1)
+        if len(values) > 2 * self.window:
+            self._move(older, values.popleft(), -1)
+
+    @staticmethod
+    def _move(half, value, sign):
+        half[0] += sign
+        half[1] += sign * value
+        half[2] += sign * value * value
+
+    def _refresh(self):
+        # Recompute the sums now and then so rounding errors from removing values cannot build up
+        for values, sums in zip(self.values, self.sums):
+            values = list(values)
+            for half, half_values in zip(sums, [values[:-self.window], values[-self.window:]]):
+                half[:] = [len(half_values), sum(half_values), sum(value * value for value in half_values)]
+        self.updates_since_refresh = 0
+
+    def steady(self):
+        """Return True once every series has the same mean and spread in both halves of the window."""
+        for values, sums in zip(self.values, self.sums):
+            if len(values) < 2 * self.window:
+                return False
+
+            means, deviations = [], []
+            for count, total, total_square in sums:
+                means.append(total / count)
+                deviations.append(max(total_square / count - means[-1] ** 2, 0) ** 0.5)
+
+            level = max(abs(means[0]), abs(means[1]), 1)
+            if abs(means[1] - means[0]) > self.tolerance * level or \
+                    abs(deviations[1] - deviations[0]) > self.tolerance * level:
+                return False
+        return True
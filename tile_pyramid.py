@@ -0,0 +1,391 @@
+"""
+Cut the recorded days of a run into map tiles and view them in a browser:
+python tile_pyramid.py SEED [--days DAYS] [--start START] [--full-resolution] [--serve [PORT]]
+The world size and colours are taken from config.py, copy the config.py of the run to view it as it was run.
+Open data/<seed>/tiles/index.html, or with --serve browse to http://localhost:PORT/ to draw zoomed tiles on demand.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import struct
+import threading
+import zlib
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import config as cfg
+from constants import FOOD_NAME, BUG_NAME
+from world_index import day_reader
+
+TILE_SIZE = 256  # pixels along each side of a tile
+SQUARE_PIXELS = 8  # pixels along each side of a square at the deepest zoom level
+
+
+def tiles_path(seed):
+    return os.path.join('data', seed, 'tiles')
+
+
+def png_bytes(image):
+    """Encode an array of RGB rows as a PNG file."""
+    height, width = image.shape[:2]
+    raw = np.zeros((height, 1 + 3 * width), dtype=np.uint8)  # each row starts with filter type 0
+    raw[:, 1:] = image.reshape(height, 3 * width)
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)) +
+            chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)) + chunk(b'IEND', b''))
+
+
+def hls_to_rgb(hue, luminosity, saturation):
+    """Convert arrays of colours from HLS to RGB, as colorsys.hls_to_rgb does for single colours."""
+    m2 = np.where(luminosity <= 0.5, luminosity * (1 + saturation), luminosity + saturation - luminosity * saturation)
+    m1 = 2 * luminosity - m2
+
+    def value(h):
+        h = h % 1.0
+        return np.select([h < 1 / 6, h < 0.5, h < 2 / 3],
+                         [m1 + (m2 - m1) * h * 6, m2, m1 + (m2 - m1) * (2 / 3 - h) * 6], m1)
+
+    return np.stack([value(hue + 1 / 3), value(hue), value(hue - 1 / 3)], axis=-1)
+
+
+def halve(image):
+    """Return an image at half the resolution, each pixel the mean of the up to 4 pixels it covers."""
+    height, width = image.shape[:2]
+    sums = np.zeros(((height + 1) // 2 * 2, (width + 1) // 2 * 2, 3), dtype=np.float32)
+    counts = np.zeros(sums.shape[:2], dtype=np.float32)
+    sums[:height, :width], counts[:height, :width] = image, 1
+    sums = sums.reshape(sums.shape[0] // 2, 2, sums.shape[1] // 2, 2, 3).sum(axis=(1, 3))
+    counts = counts.reshape(counts.shape[0] // 2, 2, counts.shape[1] // 2, 2).sum(axis=(1, 3))
+    return sums / counts[:, :, None]
+
+
+class TilePyramid:
+    """
+    A class to draw the recorded days of a run as pyramids of map tiles, for zooming and panning around large worlds.
+
+    Each zoom level doubles the resolution of the one before. At the base level a square is one pixel, levels below it
+    average the colours of the squares they cover and levels above it draw plants as coloured squares and bugs as dots
+    sized by energy, as the world view does, up to SQUARE_PIXELS pixels a square. The base level and the levels below
+    it are drawn for each day, the levels above it are drawn for a tile when it is first asked for.
+    """
+
+    def __init__(self, seed, tile_size=TILE_SIZE, square_pixels=SQUARE_PIXELS):
+        """
+        Tile Pyramid Initialisation
+        :param seed: The seed of the run to draw
+        :param tile_size: The number of pixels along each side of a tile
+        :param square_pixels: The number of pixels along each side of a square at the deepest level, a power of 2
+        """
+        self.seed = seed
+        self.path = tiles_path(seed)
+        self.tile_size = tile_size
+        self.square_pixels = square_pixels
+        self.size_x, self.size_y = cfg.world['settings']['rows'], cfg.world['settings']['columns']
+        self.base_level = max(int(np.ceil(np.log2(max(self.size_x, self.size_y) / tile_size))), 0)
+        self.max_level = self.base_level + int(np.log2(square_pixels))
+        self.days, self.read_day = day_reader(seed)
+        self.settings = {'tile_size': tile_size, 'square_pixels': square_pixels, 'size_x': self.size_x,
+                         'size_y': self.size_y, 'food_taste': cfg.food['evolve_taste'],
+                         'bug_taste': cfg.bug['evolve_taste']}
+        self._layers = None  # (day, layers) of the latest day drawn
+        self._lock = threading.Lock()
+
+    def level_size(self, level):
+        """Return the width and height in pixels of the world at a zoom level."""
+        scale = 2.0 ** (level - self.base_level)
+        return int(np.ceil(self.size_x * scale)), int(np.ceil(self.size_y * scale))
+
+    def tile_path(self, day, level, tile_x, tile_y):
+        return os.path.join(self.path, str(day), str(level), '%d_%d.png' % (tile_x, tile_y))
+
+    def layers(self, day, names=None, values=None):
+        """
+        Return the colours of a day's squares: the background colour of each square, the radius of the bug on it in
+        squares (0 for none) and the colour of the bug, each indexed [x, y].
+        """
+        if self._layers is not None and self._layers[0] == day:
+            return self._layers[1]
+        if names is None:
+            names, values = self.read_day(day)
+        values = np.asarray(values, dtype=float).reshape(-1, 5)
+
+        background = np.ones((self.size_x, self.size_y, 3), dtype=np.float32)
+        food = values[names == FOOD_NAME]
+        if len(food):
+            hue = food[:, 4] / 360 if self.settings['food_taste'] else np.full(len(food), 0.33)
+            luminosity = np.where(food[:, 2] > 20, 0.9 - food[:, 2] * 0.004, 0.82)  # luminosity depends on energy
+            background[food[:, 0].astype(int), food[:, 1].astype(int)] = hls_to_rgb(hue, luminosity, 1)
+
+        bug_radius = np.zeros((self.size_x, self.size_y), dtype=np.float32)
+        bug_colour = np.zeros((self.size_x, self.size_y, 3), dtype=np.float32)
+        bugs = values[names == BUG_NAME]
+        if len(bugs):
+            x, y = bugs[:, 0].astype(int), bugs[:, 1].astype(int)
+            bug_radius[x, y] = np.clip(bugs[:, 2] * 0.01, 0.3, 1.0) / 2  # size of bug depends on energy
+            bug_colour[x, y] = hls_to_rgb(bugs[:, 4] / 360, 0.5, 1) if self.settings['bug_taste'] else (1, 0, 0)
+
+        self._layers = (day, (background, bug_radius, bug_colour))
+        return self._layers[1]
+
+    def _draw(self, layers, level, left, top, width, height):
+        """Draw a window of the world at a level at or above the base level as an array of RGB rows."""
+        background, bug_radius, bug_colour = layers
+        square_pixels = 2 ** (level - self.base_level)
+        columns, rows = np.arange(left, left + width), np.arange(top, top + height)
+
+        # Pixel rows run down from the top of the world, so y runs up from the bottom as in the world view
+        x, y = columns // square_pixels, self.size_y - 1 - rows // square_pixels
+        offset_x = (columns % square_pixels + 0.5) / square_pixels - 0.5
+        offset_y = (rows % square_pixels + 0.5) / square_pixels - 0.5
+        distance = np.hypot(offset_x[None, :], offset_y[:, None])
+
+        radius = bug_radius[x[None, :], y[:, None]]
+        image = background[x[None, :], y[:, None]]
+        bug = (radius > 0) & (distance <= radius)
+        if self.settings['bug_taste']:  # black outline with coloured dot in centre
+            image[bug] = 0
+            dot = bug & (distance <= radius / 1.5)
+        else:
+            dot = bug
+        image[dot] = bug_colour[x[None, :], y[:, None]][dot]
+        return image
+
+    def _write(self, path, image):
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path + '.tmp', 'wb') as tile_file:
+            tile_file.write(png_bytes(np.round(image * 255).astype(np.uint8)))
+        os.replace(path + '.tmp', path)
+
+    def _write_level(self, day, level, image):
+        """Cut an image of the whole world at a level into tiles."""
+        for tile_y in range(0, image.shape[0], self.tile_size):
+            for tile_x in range(0, image.shape[1], self.tile_size):
+                self._write(self.tile_path(day, level, tile_x // self.tile_size, tile_y // self.tile_size),
+                            image[tile_y:tile_y + self.tile_size, tile_x:tile_x + self.tile_size])
+
+    def build_day(self, day, full_resolution=False):
+        """
+        Draw the base level and the levels below it for a day, unless they are up to date.
+        :param full_resolution: Set to True to also draw every tile of the levels above the base level
+        :return: True if the day was drawn
+        """
+        names, values = self.read_day(day)
+        key = hashlib.sha1(json.dumps(self.settings, sort_keys=True).encode() + names.astype(str).tobytes() +
+                           np.ascontiguousarray(values, dtype=float).tobytes()).hexdigest()
+        day_path = os.path.join(self.path, str(day))
+        key_path = os.path.join(day_path, 'key')
+
+        up_to_date = False
+        if os.path.exists(key_path):
+            with open(key_path) as key_file:
+                up_to_date = key_file.read() == key
+            if not up_to_date:
+                shutil.rmtree(day_path)  # tiles drawn on demand from the old data are stale too
+
+        if not up_to_date:
+            image = self._draw(self.layers(day, names, values), self.base_level, 0, 0, self.size_x, self.size_y)
+            for level in range(self.base_level, -1, -1):
+                self._write_level(day, level, image)
+                image = halve(image)
+            with open(key_path, 'w') as key_file:
+                key_file.write(key)
+
+        if full_resolution:
+            for level in range(self.base_level + 1, self.max_level + 1):
+                width, height = self.level_size(level)
+                for tile_y in range((height + self.tile_size - 1) // self.tile_size):
+                    for tile_x in range((width + self.tile_size - 1) // self.tile_size):
+                        self.tile(day, level, tile_x, tile_y)
+        return not up_to_date
+
+    def tile(self, day, level, tile_x, tile_y):
+        """Return the path of a tile, drawing it first if it has not been drawn."""
+        path = self.tile_path(day, level, tile_x, tile_y)
+        if os.path.exists(path):
+            return path
+        if level <= self.base_level:
+            self.build_day(day)
+            return path
+
+        width, height = self.level_size(level)
+        left, top = tile_x * self.tile_size, tile_y * self.tile_size
+        if day not in self.days or not 0 <= left < width or not 0 <= top < height:
+            raise KeyError('no tile %d/%d/%d_%d' % (day, level, tile_x, tile_y))
+        self._write(path, self._draw(self.layers(day), level, left, top, min(self.tile_size, width - left),
+                                     min(self.tile_size, height - top)))
+        return path
+
+    def build(self, days=None, start=0, full_resolution=False):
+        """
+        Draw the tiles of a range of recorded days and write the HTML viewer, skipping days that are up to date.
+        :param days: Number of days from the start time to draw
+        :param start: Start time
+        :param full_resolution: Set to True to also draw every tile of the zoomed levels, for viewing without a server
+        :return: The number of days drawn
+        """
+        build_days = [day for day in self.days if day >= start and (days is None or day < start + days)]
+        drawn = sum(self.build_day(day, full_resolution) for day in build_days)
+        self.write_viewer([day for day in self.days if os.path.exists(os.path.join(self.path, str(day), 'key'))])
+        return drawn
+
+    def write_viewer(self, days):
+        """Write the HTML viewer of the drawn days."""
+        pyramid = {'days': days, 'tile_size': self.tile_size, 'base_level': self.base_level,
+                   'max_level': self.max_level, 'sizes': [self.level_size(level) for level in
+                                                          range(self.max_level + 1)]}
+        with open(os.path.join(self.path, 'index.html'), 'w') as viewer_file:
+            viewer_file.write(VIEWER_HTML.replace('PYRAMID', json.dumps(pyramid)))
+
+    def serve(self, port=8000):
+        """Serve the viewer and tiles over HTTP, drawing zoomed tiles as they are asked for."""
+        pyramid, tile_pattern = self, re.compile(r'^/(\d+)/(\d+)/(\d+)_(\d+)\.png$')
+
+        class TileHandler(SimpleHTTPRequestHandler):
+            def do_GET(self):
+                match = tile_pattern.match(self.path)
+                if match is not None:
+                    try:
+                        with pyramid._lock:
+                            pyramid.tile(*[int(group) for group in match.groups()])
+                    except KeyError:
+                        pass  # answered with a 404 for the missing file
+                SimpleHTTPRequestHandler.do_GET(self)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('localhost', port), partial(TileHandler, directory=self.path))
+        print('serving tiles of %s at http://localhost:%d/' % (self.seed, port))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+
+
+VIEWER_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>World tiles</title>
+<style>
+  body { margin: 0; overflow: hidden; font-family: sans-serif; }
+  #map { position: absolute; inset: 0; background: #ddd; cursor: grab; }
+  #map img { position: absolute; image-rendering: pixelated; user-select: none; -webkit-user-drag: none; }
+  #bar { position: absolute; left: 0; right: 0; bottom: 0; padding: 8px; background: rgba(255, 255, 255, 0.85); }
+  #day { width: 60%; vertical-align: middle; }
+</style>
+</head>
+<body>
+<div id="map"></div>
+<div id="bar">
+  <input id="day" type="range" min="0" value="0"> <span id="label"></span>
+  <span> - scroll to zoom, drag to pan, arrow keys change day</span>
+</div>
+<script>
+var pyramid = PYRAMID;
+var map = document.getElementById('map'), slider = document.getElementById('day');
+var level = 0, scale = 1, centre = [0.5, 0.5], dayIndex = pyramid.days.length - 1;
+slider.max = pyramid.days.length - 1;
+
+function fit() {
+  // Start at the deepest level that fits the window, scaled to fill it, each level then doubles the size on screen
+  level = 0;
+  while (level < pyramid.max_level && pyramid.sizes[level + 1][0] <= map.clientWidth &&
+         pyramid.sizes[level + 1][1] <= map.clientHeight) level++;
+  scale = Math.min(map.clientWidth / pyramid.sizes[level][0], map.clientHeight / pyramid.sizes[level][1]);
+}
+
+function addTiles(tileLevel, day, fallback) {
+  // Each level is drawn at the screen size of the current zoom, tiles of a coarser level are stretched under it
+  var size = pyramid.sizes[tileLevel], factor = scale * pyramid.sizes[level][0] / size[0];
+  var originX = map.clientWidth / 2 - centre[0] * size[0] * factor;
+  var originY = map.clientHeight / 2 - centre[1] * size[1] * factor;
+  var step = pyramid.tile_size * factor;
+  var first = [Math.max(0, Math.floor(-originX / step)), Math.max(0, Math.floor(-originY / step))];
+  var last = [Math.min(Math.ceil(size[0] / pyramid.tile_size), Math.ceil((map.clientWidth - originX) / step)),
+              Math.min(Math.ceil(size[1] / pyramid.tile_size), Math.ceil((map.clientHeight - originY) / step))];
+  for (var ty = first[1]; ty < last[1]; ty++) {
+    for (var tx = first[0]; tx < last[0]; tx++) {
+      var img = document.createElement('img');
+      img.style.left = (originX + tx * step) + 'px';
+      img.style.top = (originY + ty * step) + 'px';
+      img.style.width = Math.min(step, (size[0] - tx * pyramid.tile_size) * factor) + 'px';
+      img.style.height = Math.min(step, (size[1] - ty * pyramid.tile_size) * factor) + 'px';
+      img.onerror = function () { this.remove(); };
+      img.src = day + '/' + tileLevel + '/' + tx + '_' + ty + '.png';
+      map.appendChild(img);
+    }
+  }
+}
+
+function draw() {
+  var day = pyramid.days[dayIndex];
+  slider.value = dayIndex;
+  document.getElementById('label').textContent = 'time=' + day + ', zoom level ' + level;
+  map.innerHTML = '';
+  if (level > pyramid.base_level) addTiles(pyramid.base_level, day);
+  addTiles(level, day);
+}
+
+map.addEventListener('wheel', function (event) {
+  event.preventDefault();
+  var next = Math.max(0, Math.min(pyramid.max_level, level + (event.deltaY < 0 ? 1 : -1)));
+  if (next === level) return;
+  // Keep the point under the cursor in place
+  var size = pyramid.sizes[level];
+  var pointX = centre[0] + (event.clientX - map.clientWidth / 2) / (size[0] * scale);
+  var pointY = centre[1] + (event.clientY - map.clientHeight / 2) / (size[1] * scale);
+  var ratio = next > level ? 0.5 : 2;
+  centre = [pointX - (pointX - centre[0]) * ratio, pointY - (pointY - centre[1]) * ratio];
+  level = next;
+  draw();
+}, {passive: false});
+
+var drag = null;
+map.addEventListener('mousedown', function (event) { drag = [event.clientX, event.clientY]; });
+window.addEventListener('mouseup', function () { drag = null; });
+window.addEventListener('mousemove', function (event) {
+  if (!drag) return;
+  var size = pyramid.sizes[level];
+  centre = [centre[0] - (event.clientX - drag[0]) / (size[0] * scale),
+            centre[1] - (event.clientY - drag[1]) / (size[1] * scale)];
+  drag = [event.clientX, event.clientY];
+  draw();
+});
+window.addEventListener('keydown', function (event) {
+  if (event.key === 'ArrowRight') dayIndex = Math.min(dayIndex + 1, pyramid.days.length - 1);
+  else if (event.key === 'ArrowLeft') dayIndex = Math.max(dayIndex - 1, 0);
+  else return;
+  draw();
+});
+slider.addEventListener('input', function () { dayIndex = +slider.value; draw(); });
+window.addEventListener('resize', function () { centre = [0.5, 0.5]; fit(); draw(); });
+fit();
+draw();
+</script>
+</body>
+</html>
+"""
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Draw the recorded days of a run as map tiles.')
+    parser.add_argument('seed')
+    parser.add_argument('--days', type=int, help='number of days from the start time to draw')
+    parser.add_argument('--start', type=int, default=0, help='start time')
+    parser.add_argument('--full-resolution', action='store_true', help='draw every zoomed tile now')
+    parser.add_argument('--serve', type=int, nargs='?', const=8000, help='serve the tiles on a port')
+    args = parser.parse_args()
+
+    tile_pyramid = TilePyramid(args.seed)
+    print('%d days drawn' % tile_pyramid.build(args.days, args.start, args.full_resolution))
+    if args.serve is not None:
+        tile_pyramid.serve(args.serve)
@@ -1,9 +1,38 @@
 import unittest
+import asyncio
+import os
+import sys
+import subprocess
+import shutil
+import tempfile
+import colorsys
 import config as cfg
 from constants import *
 from utility_methods import *
+from lv_estimator import LotkaVolterraEstimator
 from world import World
 from world_recorder import WorldRecorder
+from food import Food
+from bug import Bug
+from world_history import HistoryWriter, HistoryReader
+from world_index import IndexWriter, WorldIndex
+from stop_policy import StopPolicy
+from packed_grid import PackedGrid
+from gene_histograms import GeneHistograms
+from lineage import LineageTracker
+from memory_report import MemoryMonitor
+from validation import run_engine, compare, STATISTICS
+from recording_policy import RecordingPolicy
+from run_catalogue import RunCatalogue
+from render_manifest import RenderManifest
+from tile_pyramid import TilePyramid, hls_to_rgb
+from world_viewer import WorldViewer
+from world_archive import WorldArchive
+from mean_field import MeanFieldWorld
+from live_feed import LiveFeed
+from job_server import JobServer, request, apply_config_overrides, restore_config, config_lines, check_spec
+from branching import branch
+from simulation import run_day
 
 
 class DummyBug:
@@ -23,6 +52,19 @@ class DummyFood:
         self.position = position
 
 
+class TemporaryDataTestCase(unittest.TestCase):
+    """
+    A class to run tests in a temporary directory, so the runs, images and sockets they write to data are removed.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.py'), directory.name)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(directory.name)
+
+
 class WorldTests(unittest.TestCase):
     def test_grid_variable(self):
         world0 = World(rows=1, columns=1)
@@ -41,6 +83,32 @@ class WorldTests(unittest.TestCase):
         self.assertEqual(len(world2.organism_lists[FOOD_NAME]['alive']), 1)
         self.assertEqual(len(world2.organism_lists[BUG_NAME]['alive']), 0)
 
+    def test_packed_grid(self):
+        world = World(rows=3, columns=10, packed_grid=True)
+        plant, bug = Food([2, 9], 20, 30, 100, 180), Bug([2, 9], 50, 60, 200, 90)
+        world.spawn(plant)
+        world.spawn(bug)
+        self.assertEqual(world.grid[2, 9], FOOD_VAL + BUG_VAL)
+        self.assertFalse(world.available(bug, [0, 0]))
+
+        world.kill(plant)
+        self.assertEqual(world.grid.to_array().tolist(), [[0] * 10, [0] * 10, [0] * 9 + [BUG_VAL]])
+        self.assertEqual(world.grid.nbytes, 12)
+
+    def test_bulk_drop(self):
+        for packed_grid in (False, True):
+            world = World(rows=10, columns=10, seed='bulk', init_food=150, packed_grid=packed_grid)
+            plants = world.organism_lists[FOOD_NAME]['alive']
+            self.assertEqual(len(plants), 100)
+            self.assertEqual(world.spawnable_squares, [])
+            self.assertEqual(len(set(tuple(plant.position) for plant in plants)), 100)
+            for plant in plants:
+                self.assertIs(world.organism_at(FOOD_NAME, plant.position.tolist()), plant)
+                self.assertEqual(world.grid[tuple(plant.position)], FOOD_VAL)
+                self.assertLessEqual(abs(plant.reproduction_threshold - 30), 5)
+                self.assertLessEqual(get_taste_difference(plant.taste, 180), 5)
+        self.assertIsInstance(world.grid, PackedGrid)
+
 
 class OrganismTests(unittest.TestCase):
     def setUp(self):
@@ -105,25 +173,617 @@ class WorldRecorderTests(unittest.TestCase):
         average_dead_lifetime = average_lifetime(self.dead_dummy_bug_list[-10:])
         self.assertEqual(average_dead_lifetime, 60)
 
+    def test_stats_flushed_in_chunks(self):
+        flush_interval, cfg.stats_flush_interval = cfg.stats_flush_interval, 2
+        try:
+            for _ in range(3):
+                self.my_world_recorder.generate_world_stats()
+                self.my_world_recorder.world.time += 1
+
+            with open(self.my_world_recorder.world_stats_path('bug')) as bug_file:
+                self.assertEqual(len(bug_file.readlines()), 2)
+            self.assertEqual(self.my_world_recorder.organism_data['bug']['time'], [2])
+
+            self.my_world_recorder.output_world_stats()
+            with open(self.my_world_recorder.world_stats_path('bug')) as bug_file:
+                self.assertEqual([line.split(',')[0] for line in bug_file], ['0', '1', '2'])
+        finally:
+            cfg.stats_flush_interval = flush_interval
+
+
+class RecordingPolicyTests(unittest.TestCase):
+    def test_policies(self):
+        every = RecordingPolicy('every', interval=3)
+        self.assertEqual([time for time in range(10) if every.due(time)], [0, 3, 6, 9])
+
+        log = RecordingPolicy('log', days_per_decade=4)
+        log_days = [time for time in range(10000) if log.due(time)]
+        self.assertEqual(log_days[:4], [0, 1, 3, 5])
+        self.assertEqual(len(log_days), 17)
+
+        change = RecordingPolicy('change', threshold=0.1, max_gap=5)
+        populations = [100, 105, 109, 111, 100, 100, 100, 100, 100, 100, 0]
+        self.assertEqual([time for time, population in enumerate(populations) if change.due(time, [population])],
+                         [0, 3, 8, 10])
+        self.assertTrue(change.due(10, lambda: [1000]))
+
+    def test_stats_written_on_days_due(self):
+        stats_interval, cfg.stats_interval = cfg.stats_interval, 4
+        try:
+            world_recorder = WorldRecorder(World(rows=3, columns=3, seed='unit_test'))
+            for _ in range(10):
+                world_recorder.generate_world_stats()
+                world_recorder.world.time += 1
+            self.assertEqual(len(world_recorder.organism_data['food']['time']), 10)
+
+            world_recorder.output_world_stats()
+            with open(world_recorder.world_stats_path('food')) as food_file:
+                self.assertEqual([line.split(',')[0] for line in food_file], ['0', '4', '8', '9'])
+        finally:
+            cfg.stats_interval = stats_interval
+
+
+class RunCatalogueTests(unittest.TestCase):
+    def test_runs_and_stats(self):
+        run_catalogue = RunCatalogue(':memory:')
+        first = run_catalogue.add_run({'seed': 'a', 'food_growth_rate': 10})
+        second = run_catalogue.add_run({'seed': 'b', 'food_growth_rate': 5, 'packed_grid': True})
+        run_catalogue.add_stats([(first, 'bug', time, 0, 10 * time, 0, 0, 0, 0, 70) for time in range(3)] +
+                                [(second, 'bug', time, 0, 20 * time, 0, 0, 0, 0, 70) for time in range(3)])
+        run_catalogue.finish_run(second, 2)
+
+        names, rows = run_catalogue.query('SELECT seed, packed_grid, days, MAX(population) FROM runs JOIN stats '
+                                          'USING (run_id) GROUP BY run_id ORDER BY food_growth_rate')
+        self.assertEqual(names, ['seed', 'packed_grid', 'days', 'MAX(population)'])
+        self.assertEqual(rows, [('b', 1, 2, 40.0), ('a', None, None, 20.0)])
+
+
+class RenderManifestTests(TemporaryDataTestCase):
+    def test_stale_outputs(self):
+        seed = 'render_test'
+        if not os.path.exists(os.path.join('data', seed)):
+            os.makedirs(os.path.join('data', seed))
+        output = os.path.join('data', seed, 'image.png')
+        open(output, 'w').close()
+
+        render_manifest = RenderManifest(seed, {'fig_size': 20})
+        key = render_manifest.key('world', 5, np.array([1, 2, 3]))
+        self.assertTrue(render_manifest.stale(output, key))
+        render_manifest.rendered(output, key)
+        self.assertFalse(render_manifest.stale(output, key))
+        self.assertTrue(render_manifest.stale(output, render_manifest.key('world', 5, np.array([1, 2, 4]))))
+
+        self.assertFalse(RenderManifest(seed, {'fig_size': 20}).stale(output, key))
+        resized = RenderManifest(seed, {'fig_size': 10})
+        self.assertTrue(resized.stale(output, resized.key('world', 5, np.array([1, 2, 3]))))
+
+        os.remove(output)
+        self.assertTrue(render_manifest.stale(output, key))
+
+
+class TilePyramidTests(TemporaryDataTestCase):
+    def test_tiles(self):
+        settings = dict(cfg.world['settings'])
+        cfg.world['settings'].update(rows=5, columns=3)
+        try:
+            world = World(rows=5, columns=3, seed='tile_test')
+            world.spawn(Food([1, 0], 40, 30, 100, 120))
+            world.spawn(Bug([4, 2], 100, 60, 100, 90))
+            world_recorder = WorldRecorder(world)
+            world_recorder.generate_world_data()
+            world_recorder.output_world_data()
+
+            tile_pyramid = TilePyramid('tile_test', tile_size=4, square_pixels=2)
+            self.assertEqual((tile_pyramid.base_level, tile_pyramid.max_level), (1, 2))
+            self.assertEqual(tile_pyramid.build(), 1)
+            self.assertEqual(tile_pyramid.build(), 0)
+            self.assertTrue(os.path.exists(tile_pyramid.tile_path(0, 1, 1, 0)))
+            self.assertTrue(os.path.exists(tile_pyramid.tile_path(0, 0, 0, 0)))
+
+            image = tile_pyramid._draw(tile_pyramid.layers(0), 1, 0, 0, 5, 3)
+            plant = world.organism_lists[FOOD_NAME]['alive'][0]
+            self.assertTrue(np.allclose(image[2, 1], colorsys.hls_to_rgb(plant.taste / 360, 0.9 - 40 * 0.004, 1)))
+            bug = world.organism_lists[BUG_NAME]['alive'][0]
+            self.assertTrue(np.allclose(image[0, 4], colorsys.hls_to_rgb(bug.taste / 360, 0.5, 1)))
+            self.assertEqual(image[1, 1].tolist(), [1, 1, 1])
+
+            zoomed = tile_pyramid._draw(tile_pyramid.layers(0), 2, 8, 0, 2, 2)
+            self.assertEqual(zoomed.tolist(), [[[0, 0, 0]] * 2] * 2)  # a bug outline covers the whole square
+            self.assertTrue(os.path.exists(tile_pyramid.tile(0, 2, 2, 1)))
+        finally:
+            cfg.world['settings'] = settings
+
+
+class WorldArchiveTests(TemporaryDataTestCase):
+    def test_write_then_read(self):
+        world = World(rows=6, columns=6, seed='archive_test', init_food=8, init_bugs=3)
+        world_recorder = WorldRecorder(world)
+        world_viewer = WorldViewer('archive_test')
+        recorded = {}
+        for _ in range(3):
+            world_recorder.generate_world_data()
+            world_recorder.output_world_data()
+            recorded[world.time] = world_viewer.read_day_data(world.time)
+            run_day(world)
+
+        world_archive = WorldArchive.convert('archive_test', remove_csv=True)
+        self.assertEqual(world_archive.days.tolist(), sorted(recorded))
+        self.assertNotIn(5, world_archive)
+        self.assertRaises(KeyError, world_archive.read_day, 5)
+        self.assertEqual(os.listdir(os.path.join('data', 'archive_test', 'data_files', 'world_data')), [])
+
+        world_viewer = WorldViewer('archive_test')
+        for day, (names, values) in recorded.items():
+            for archive_names, archive_values in (world_archive.read_day(day), world_viewer.read_day_data(day)):
+                self.assertEqual(archive_names.tolist(), names.tolist())
+                self.assertEqual(archive_values.tolist(), values.tolist())
+
+
+class WorldViewerTests(unittest.TestCase):
+    def test_gene_frequencies(self):
+        for rep_thresh, taste in (([0, 3, 3, 50, 100], [0, 5, 6, 180, 359]), ([1, 99, 131, 131], [359, 0, 12, 350]),
+                                  ([], [])):
+
+            # Frequencies as the reproduction threshold and taste plots counted them looping over each organism
+            max_rep_thresh = max(rep_thresh) if rep_thresh else 0
+            rep_dict = {j: 0 for j in range(max(101, max_rep_thresh + 1))}
+            z = [[0 for _ in range(51 if max_rep_thresh <= 100 else int(max_rep_thresh / 2) + 1)] for _ in range(61)]
+            for threshold, angle in zip(rep_thresh, taste):
+                rep_dict[threshold] += 1 / len(rep_thresh)
+                z[int(angle / 6)][int(threshold / 2)] += 1 / len(rep_thresh)
+
+            rep_counts, heat_map, x_edges, y_edges, x_max = WorldViewer.gene_frequencies(
+                *WorldViewer.count_genes(np.array(rep_thresh, dtype=int), np.array(taste, dtype=int)))
+            self.assertTrue(np.allclose(rep_counts, list(rep_dict.values())))
+            self.assertTrue(np.allclose(heat_map, z))
+            self.assertEqual((len(x_edges), len(y_edges), x_max), (len(z[0]) + 1, 62, max(100, max_rep_thresh)))
+
 
 class SimpleWorldTests(unittest.TestCase):
     def setUp(self):
         self.tiny_world = World(rows=1, columns=2)
 
-    def test_simple_dictionary(self):
+    def test_id_grid(self):
         food1 = DummyFood([0, 0])
         food2 = DummyFood([0, 1])
 
         self.tiny_world.spawn(food1)
         self.tiny_world.spawn(food2)
 
-        self.assertEqual(self.tiny_world.plant_position_dict, {(0, 0): food1, (0, 1): food2})
+        self.assertEqual(self.tiny_world.id_grids[FOOD_NAME].tolist(), [[0, 1]])
+        self.assertIs(self.tiny_world.organism_at(FOOD_NAME, [0, 1]), food2)
+        self.assertEqual(self.tiny_world.neighbours(FOOD_NAME, [0, 0]), [food2])
 
         self.tiny_world.kill(food1)
-        self.assertEqual(self.tiny_world.plant_position_dict, {(0, 1): food2})
+        self.assertEqual(self.tiny_world.id_grids[FOOD_NAME].tolist(), [[-1, 1]])
+        self.assertIsNone(self.tiny_world.organism_at(FOOD_NAME, [0, 0]))
+
+        # The freed slot is reused
+        food3 = DummyFood([0, 0])
+        self.tiny_world.spawn(food3)
+        self.assertEqual(self.tiny_world.id_grids[FOOD_NAME].tolist(), [[0, 1]])
 
         self.tiny_world.kill(food2)
-        self.assertFalse(self.tiny_world.plant_position_dict)
+        self.tiny_world.kill(food3)
+        self.assertEqual(self.tiny_world.id_grids[FOOD_NAME].tolist(), [[-1, -1]])
+        self.assertIsNone(self.tiny_world.organism_at(BUG_NAME, [0, 0]))
+
+
+class ActiveSetTests(unittest.TestCase):
+    def setUp(self):
+        self.world = World(rows=3, columns=3, active_set_scheduling=True)
+
+    def test_free_neighbours(self):
+        self.assertEqual(self.world.free_neighbours[FOOD_NAME][1, 1], len(self.world.neighbour_offsets))
+        self.assertEqual(self.world.free_neighbours[FOOD_NAME][0, 0], 3)
+
+        plant = Food([1, 1], 20, 30, 100, 180)
+        self.world.spawn(plant)
+        self.assertEqual(self.world.free_neighbours[FOOD_NAME][0, 0], 2)
+        self.assertEqual(self.world.free_neighbours[BUG_NAME][0, 0], 3)
+
+        self.world.kill(plant)
+        self.assertEqual(self.world.free_neighbours[FOOD_NAME][0, 0], 3)
+
+    def test_settle_and_wake(self):
+        plant = Food([0, 0], 100, 200, 100, 180)  # can never reach its reproduction threshold
+        plant.lifetime = 5
+        self.world.spawn(plant)
+
+        self.assertTrue(self.world.settle(plant))
+        self.assertNotIn(plant, self.world.organism_lists[FOOD_NAME]['active'])
+
+        self.world.time += 3
+        self.world.sync_dormant()
+        self.assertEqual(plant.lifetime, 8)
+
+        self.world.wake(plant)
+        self.world.prepare_today()
+        self.assertIn(plant, self.world.organism_lists[FOOD_NAME]['active'])
+        self.assertIsNone(plant.dormant_since)
+
+    def test_pending_lifetime(self):
+        plants = [Food([x, 0], 100, 200, 100, 180) for x in range(3)]
+        for plant in plants:
+            plant.lifetime = 5
+            self.world.spawn(plant)
+            self.world.settle(plant)
+            self.world.time += 1
+
+        # Each plant is owed the days since it was set aside, without being caught up
+        self.assertEqual(self.world.pending_lifetime(), 3 + 2 + 1)
+        self.assertEqual([plant.lifetime for plant in plants], [5, 5, 5])
+
+        self.world.wake(plants[0])
+        self.world.kill(plants[1])
+        self.assertEqual(plants[1].lifetime, 7)
+        self.assertEqual(self.world.pending_lifetime(), 3 + 1)
+
+        self.world.sync_dormant()
+        self.assertEqual(self.world.pending_lifetime(), 0)
+        self.assertEqual([plants[0].lifetime, plants[2].lifetime], [8, 6])
+
+
+class WorldHistoryTests(unittest.TestCase):
+    def test_replay_matches_world(self):
+        world = World(rows=4, columns=4, seed='unit_test')
+        history = HistoryWriter(world, keyframe_interval=2)
+        plant, bug = Food([0, 0], 20, 30, 100, 180), Bug([1, 1], 50, 60, 200, 90)
+        world.spawn(plant)
+        world.spawn(bug)
+
+        expected = []
+        for day in range(4):
+            world.time = day
+            if day == 1:
+                world.move(bug, [1, 0])
+                plant.energy += 5
+            elif day == 2:
+                world.kill(plant)
+            elif day == 3:
+                world.spawn(Food([3, 2], 10, 40, 100, 270))
+            history.end_day()
+            expected.append(sorted((o.name, o.position.tolist(), o.energy) for o in
+                                   world.organism_lists[FOOD_NAME]['alive'] + world.organism_lists[BUG_NAME]['alive']))
+        history.close()
+
+        reader = HistoryReader('unit_test')
+        for day in [3, 0, 1, 2]:
+            names, values = reader.read_day(day)
+            self.assertEqual(sorted((name, row[:2].astype(int).tolist(), row[2]) for name, row in zip(names, values)),
+                             expected[day])
+
+
+class RecordedFilesTests(TemporaryDataTestCase):
+    def test_files_closed_at_end_of_run(self):
+        replaced = apply_config_overrides({'world_data_format': 'history', 'gene_histograms': True})
+        self.addCleanup(restore_config, replaced)
+        world = World(rows=6, columns=6, seed='closed_test', init_food=8, init_bugs=3)
+        world_recorder = WorldRecorder(world)
+        for _ in range(3):
+            world_recorder.generate_world_stats()
+            world_recorder.output_world_data()
+            run_day(world)
+        world_recorder.output_world_stats()
+
+        self.assertTrue(world_recorder.world_history.history_file.closed)
+        self.assertTrue(world_recorder.world_history.index_file.closed)
+        self.assertIsNone(world.history)
+        self.assertTrue(world_recorder.histogram_writer.histograms_file.closed)
+        self.assertTrue(world_recorder.histogram_writer.index_file.closed)
+
+
+class WorldIndexTests(TemporaryDataTestCase):
+    def test_region_query(self):
+        index_writer = IndexWriter('unit_test', chunk_days=2, tile_size=2)
+        for day in range(5):
+            index_writer.add_day(day, np.array([FOOD_NAME, BUG_NAME, BUG_NAME]),
+                                 np.array([[0, 0, 10, 30, 180], [day, 1, 50, 70, 90], [3, 3, 40, 70, 100]]))
+        index_writer.close()
+
+        world_index = WorldIndex('unit_test')
+        names, rows = world_index.rows(x_range=[1, 4], y_range=[0, 2], days=[1, 4])
+        self.assertEqual(names.tolist(), [BUG_NAME] * 3)
+        self.assertEqual(rows[:, :3].tolist(), [[1, 1, 1], [2, 2, 1], [3, 3, 1]])
+
+        days, counts = world_index.counts(days=[2, 5], organism=BUG_NAME)
+        self.assertEqual((days.tolist(), counts.tolist()), ([2, 3, 4], [2, 2, 2]))
+
+        days, tastes = world_index.aggregate('taste', x_range=[0, 1])
+        self.assertTrue(np.allclose(tastes, [135, 180, 180, 180, 180]))
+
+    def test_taste_mean_wraps(self):
+        index_writer = IndexWriter('unit_test_taste', chunk_days=2, tile_size=2)
+        index_writer.add_day(0, np.array([BUG_NAME, BUG_NAME]), np.array([[0, 0, 50, 70, 350], [1, 1, 50, 70, 20]]))
+        index_writer.add_day(1, np.array([BUG_NAME, BUG_NAME]), np.array([[0, 0, 50, 70, 340], [1, 1, 50, 70, 350]]))
+        index_writer.close()
+
+        days, tastes = WorldIndex('unit_test_taste').aggregate('taste', x_range=[0, 2], days=[0, 3])
+        self.assertEqual(days.tolist(), [0, 1])
+        self.assertTrue(np.allclose(tastes, [5, 345]))
+
+
+class StopPolicyTests(unittest.TestCase):
+    def setUp(self):
+        self.world_recorder = WorldRecorder(World(rows=3, columns=3, seed='unit_test'))
+
+    def run_policy(self, stop_policy, populations):
+        for time, population in enumerate(populations):
+            self.world_recorder.world.time = time
+            self.world_recorder.organism_data['food']['population'].append(population)
+            reason = stop_policy.check(self.world_recorder)
+            if reason is not None:
+                return time, reason
+
+    def test_steady_state(self):
+        oscillating = [100 + 20 * (time % 4 < 2) for time in range(40)]
+        stop_policy = StopPolicy(extinction=False, steady_state_window=8, series=[('food', 'population')])
+        self.assertEqual(self.run_policy(stop_policy, oscillating), (15, 'steady state over 16 days'))
+
+        growing = [100 + 5 * time for time in range(40)]
+        stop_policy = StopPolicy(days=30, extinction=False, steady_state_window=8, series=[('food', 'population')])
+        self.assertEqual(self.run_policy(stop_policy, growing), (30, 'day budget of 30 days reached'))
+
+    def test_extinction(self):
+        self.world_recorder.world.time = cfg.endangered_time + 1
+        self.assertEqual(StopPolicy().check(self.world_recorder), 'food extinct')
+
+
+class GeneHistogramsTests(unittest.TestCase):
+    def test_spawn_and_kill_counts(self):
+        world = World(rows=3, columns=3)
+        first_plant = Food([0, 0], 20, 30, 100, 180)
+        world.spawn(first_plant)
+        gene_histograms = GeneHistograms(world)
+
+        plant, bug = Food([1, 1], 20, 60, 100, 350), Bug([1, 1], 50, 60, 200, 90)  # genes mutate at birth
+        world.spawn(plant)
+        world.spawn(bug)
+        taste, reproduction_threshold, joint = gene_histograms.arrays(FOOD_NAME)
+        self.assertEqual((taste[first_plant.taste], taste[plant.taste], taste.sum()), (1, 1, 2))
+        self.assertEqual(len(reproduction_threshold), plant.reproduction_threshold + 1)
+        self.assertEqual(reproduction_threshold[[first_plant.reproduction_threshold, -1]].tolist(), [1, 1])
+        self.assertEqual(joint[plant.reproduction_threshold // 2, plant.taste // 6], 1)
+
+        world.kill(plant)
+        taste, reproduction_threshold, joint = gene_histograms.arrays(FOOD_NAME)
+        self.assertEqual((taste.sum(), reproduction_threshold.sum(), joint.sum()), (1, 1, 1))
+        self.assertEqual(gene_histograms.arrays(BUG_NAME)[0][bug.taste], 1)
+
+
+class LineageTrackerTests(unittest.TestCase):
+    def test_prune_and_newick(self):
+        world = World(rows=1, columns=5)
+        root = Food([0, 0], 20, 30, 100, 180)
+        world.spawn(root)
+        lineage_tracker = LineageTracker(world)
+
+        world.time = 1
+        child = root.reproduce([0, 1])
+        world.spawn(child)
+        world.time = 2
+        grandchild = child.reproduce([0, 1])
+        world.spawn(grandchild)
+        dropped = Food([0, 3], 20, 30, 100, 180)
+        world.spawn(dropped)
+        world.time = 3
+        world.spawn(root.reproduce([0, 4]))
+        world.kill(grandchild)
+        world.kill(dropped)
+
+        self.assertEqual(lineage_tracker.columns()['parents'].tolist(), [-1, 0, 1, -1, 0])
+        self.assertEqual(lineage_tracker.prune(), 2)
+        self.assertEqual(lineage_tracker.columns()['uids'].tolist(), [0, 1, 4])
+        self.assertEqual(lineage_tracker.lineage(4)['uids'].tolist(), [0, 4])
+        self.assertEqual(lineage_tracker.newick([1, 4], day=5), '((1:5,4:5)0:0);')
+        self.assertEqual(lineage_tracker.newick([0, 4], day=5), '((4:5,0:5)0:0);')
+
+
+class MemoryMonitorTests(unittest.TestCase):
+    def test_growth_flagged(self):
+        world = World(rows=10, columns=10, seed='memory_test')
+        memory_monitor = MemoryMonitor(world, interval=1, growth_samples=5)
+        for x in range(10):
+            world.spawn(Food([x, 0], 20, 30, 100, 180))
+            world.organism_lists[FOOD_NAME]['dead'][-1].append(Food([x, 1], 20, 30, 100, 180))
+            world.time = x
+            memory_monitor.update()
+
+        sizes = [sample['alive_food'] for sample in memory_monitor.samples]
+        self.assertTrue(all(later > earlier for earlier, later in zip(sizes, sizes[1:])))
+        self.assertAlmostEqual(memory_monitor.samples[-1]['bytes_per_organism'],
+                               (sizes[-1] + memory_monitor.samples[-1]['alive_bugs']) / 10)
+        self.assertIn('dead_windows', memory_monitor.report())
+        self.assertNotIn('grid', memory_monitor.report())
+
+
+class ValidationTests(unittest.TestCase):
+    def test_identical_engines_pass(self):
+        samples = run_engine('reference', 'validation_test', 8, 10, [5, 10])
+        self.assertEqual(samples.shape, (2, 2 * len(STATISTICS)))
+        self.assertTrue((samples == run_engine('packed_grid', 'validation_test', 8, 10, [5, 10])).all())
+
+        results = compare('packed_grid', seeds=3, days=10, size=8, checkpoints=2, processes=1)
+        self.assertEqual(len(results), 2 * 2 * len(STATISTICS))
+        self.assertTrue(all(result['passed'] for result in results))
+
+
+class LiveFeedTests(unittest.TestCase):
+    def test_publish_and_read(self):
+        world = World(rows=4, columns=6, seed='live_feed_test')
+        world.spawn(Food([1, 2], 40, 30, 100, 120))
+        live_feed = LiveFeed(world)
+        self.addCleanup(live_feed.close)
+        world.time = 7
+        live_feed.publish()
+
+        # Watch the feed from another process, as python live_feed.py does
+        monitor = subprocess.run([sys.executable, '-c', 'from live_feed import LiveMonitor\n'
+                                  'live_monitor = LiveMonitor("live_feed_test")\n'
+                                  'sequence, stats, grid = live_monitor.read()\n'
+                                  'print(sequence, stats["time"], stats["food_population"], grid.tolist())\n'
+                                  'print(live_monitor.read())\n'
+                                  'live_monitor.close()'],
+                                 cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True)
+        self.assertEqual(monitor.stdout.splitlines(), ['1 7.0 1.0 %s' % world.grid.tolist(), 'None'], monitor.stderr)
+
+
+class LotkaVolterraFittingTests(unittest.TestCase):
+    def test_fit_synthetic_data(self):
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data_analysis'))
+        self.addCleanup(sys.path.pop, 0)
+        import lv_fitting
+
+        parameters = (0.2, 5e-05, 7e-05, 0.2)
+        data = np.array(lv_fitting.integrate(parameters, (4000.0, 1000.0), 150))
+        for fitted in (lv_fitting.fit(data, starts=4), lv_fitting.fit(data, fixed={'alpha': 0.2, 'gamma': 0.2},
+                                                                      starts=2)):
+            for name, value in zip(lv_fitting.PARAMETERS, parameters):
+                self.assertAlmostEqual(fitted[name] / value, 1, delta=1e-3, msg=name)
+
+
+class LotkaVolterraEstimatorTests(unittest.TestCase):
+    def test_recovers_parameters(self):
+        alpha, beta, delta, gamma = 0.2, 5e-05, 7e-05, 0.21
+        estimator = LotkaVolterraEstimator(capacity=10000, window=50)
+        x, y = 3000.0, 1000.0
+        for time in range(100):
+            estimator.update(time, x, y)
+            x, y = x + alpha * x * (1 - x / 10000) - beta * x * y, y + delta * x * y - gamma * y
+
+        estimates = estimator.estimates()
+        for name, value in zip(['alpha', 'beta', 'delta', 'gamma'], [alpha, beta, delta, gamma]):
+            self.assertAlmostEqual(estimates[name][0] / value, 1, places=6)
+        self.assertTrue(estimator.settled())
+
+    def test_gap_starts_new_difference(self):
+        estimator = LotkaVolterraEstimator(capacity=100)
+        estimator.update(0, 10, 10)
+        estimator.update(5, 20, 20)
+        self.assertEqual(len(estimator.samples), 0)
+        self.assertIsNone(estimator.estimates())
+
+
+class MeanFieldWorldTests(unittest.TestCase):
+    def setUp(self):
+        self.rates = dict(alpha=0.02, beta=0.01, delta=0.03, gamma=0.02, plant_turnover=0.2, bug_turnover=0.05,
+                          bug_density=0.5, plant_density=0.6, compatibility=0.5)
+
+    def test_movement_keeps_counts(self):
+        mean_field_world = MeanFieldWorld(36, 40, 8, rates=dict(self.rates, alpha=0, beta=0, delta=0, gamma=0,
+                                                                plant_turnover=0, bug_turnover=0),
+                                          seed='mean_field_test', init_food=400, init_bugs=300)
+        self.assertEqual(mean_field_world.shape, (5, 5))
+        self.assertEqual(mean_field_world.squares.sum(), 36 * 40)
+        bugs = mean_field_world.counts[BUG_NAME].copy()
+        for _ in range(5):
+            mean_field_world.run_day()
+        self.assertTrue((mean_field_world.counts[BUG_NAME].sum((0, 1)) == bugs.sum((0, 1))).all())
+        self.assertFalse((mean_field_world.counts[BUG_NAME] == bugs).all())
+        self.assertEqual(mean_field_world.statistics()[FOOD_NAME]['population'], 400)
+
+    def test_refine_and_absorb(self):
+        mean_field_world = MeanFieldWorld(36, 40, 8, rates=self.rates, seed='mean_field_test', init_food=600,
+                                          init_bugs=200)
+        for _ in range(10):
+            mean_field_world.run_day()
+        counts = {name: mean_field_world.counts[name].copy() for name in (FOOD_NAME, BUG_NAME)}
+
+        world = mean_field_world.refine([3, 1], [5, 4])
+        self.assertEqual((world.rows, world.columns), (12, 24))
+        self.assertEqual(len(world.organism_lists[BUG_NAME]['alive']), counts[BUG_NAME][3:5, 1:4].sum())
+        self.assertEqual(world.grid.sum(), FOOD_VAL * counts[FOOD_NAME][3:5, 1:4].sum() +
+                         BUG_VAL * counts[BUG_NAME][3:5, 1:4].sum())
+
+        mean_field_world.absorb(world, [3, 1])
+        for name in (FOOD_NAME, BUG_NAME):
+            self.assertTrue((mean_field_world.counts[name] == counts[name]).all())
+
+    def test_refined_region_runs(self):
+        mean_field_world = MeanFieldWorld(36, 40, 8, rates=self.rates, seed='mean_field_test', init_food=600,
+                                          init_bugs=200)
+        counts = {name: mean_field_world.counts[name].copy() for name in (FOOD_NAME, BUG_NAME)}
+
+        world = mean_field_world.refine([4, 0], [5, 5])  # the last row of blocks, cut short by the world's edge
+        self.assertEqual((world.rows, world.columns), (4, 40))
+        for _ in range(20):
+            run_day(world)
+        positions = np.array([organism.position for name in (FOOD_NAME, BUG_NAME)
+                              for organism in world.organism_lists[name]['alive']])
+        self.assertTrue((positions < [4, 40]).all() and (positions[:, 1] >= 8).any())
+
+        mean_field_world.absorb(world, [4, 0])
+        for name in (FOOD_NAME, BUG_NAME):
+            self.assertEqual(mean_field_world.counts[name][4].sum(), len(world.organism_lists[name]['alive']))
+            self.assertTrue((mean_field_world.counts[name][:4] == counts[name][:4]).all())
+
+
+class JobServerTests(TemporaryDataTestCase):
+    def test_config_overrides(self):
+        growth_rate, mouth_size, stop_days = cfg.food['growth_rate'], Bug.mouth_size, cfg.stop_days
+        replaced = apply_config_overrides({'food': {'growth_rate': 3}, 'bug': {'mouth_size': 7}, 'stop_days': 5})
+        self.assertEqual((cfg.food['growth_rate'], Bug.mouth_size, cfg.stop_days), (3, 7, 5))
+        self.assertEqual(config_lines(replaced), ["food['growth_rate'] = 3", "bug['mouth_size'] = 7", 'stop_days = 5'])
+
+        restore_config(replaced)
+        self.assertEqual((cfg.food['growth_rate'], Bug.mouth_size, cfg.stop_days), (growth_rate, mouth_size, stop_days))
+        with self.assertRaises(KeyError):
+            apply_config_overrides({'stop_days': 5, 'food': {'growth_rat': 3}})
+        self.assertEqual(cfg.stop_days, stop_days)
+        self.assertRaises(ValueError, check_spec, {'seed': 'job_server_test'})
+
+    def test_submit_and_cancel(self):
+        socket_path = os.path.join('data', 'job_server_test.sock')
+        spec = dict(seed='job_server_test', config={'world': {'settings': {'rows': 8, 'columns': 8, 'init_food': 10,
+                                                                            'init_bugs': 2}}})
+
+        async def replies(message):
+            return [reply async for reply in request(message, socket_path)]
+
+        async def run():
+            server = asyncio.ensure_future(JobServer(workers=1).serve(socket_path))
+            while not os.path.exists(socket_path):
+                await asyncio.sleep(0.01)
+
+            finished = await replies({'command': 'submit', 'spec': dict(spec, days=3)})
+            running = asyncio.ensure_future(replies({'command': 'submit', 'spec': dict(spec, days=10 ** 6)}))
+            queued = asyncio.ensure_future(replies({'command': 'submit', 'spec': dict(spec, days=3)}))
+            while len((await replies({'command': 'jobs'}))[0]['jobs']) < 3:
+                await asyncio.sleep(0.01)
+            for job in (3, 2):
+                await replies({'command': 'cancel', 'job': job})
+            results = finished, await running, await queued
+            server.cancel()
+            return results
+
+        finished, running, queued = asyncio.run(run())
+        self.assertEqual([reply['event'] for reply in finished], ['queued', 'started'] + ['day'] * 4 + ['finished'])
+        self.assertEqual(finished[-2]['stats'][FOOD_NAME]['time'], 3)
+        self.assertEqual(running[-1]['event'], 'cancelled')
+        self.assertEqual([reply['event'] for reply in queued], ['queued', 'cancelled'])
+        self.assertFalse(os.path.exists(socket_path))
+
+
+class BranchingTests(TemporaryDataTestCase):
+    def test_branches_share_burn_in(self):
+        world = World(rows=12, columns=12, seed='branch_test', init_food=40, init_bugs=6)
+        for _ in range(20):
+            run_day(world)
+        branches = {'same': {}, 'also_same': {}, 'reseeded': {'seed': 'other'},
+                    'barren': {'config': {'food': {'growth_rate': 0}}}}
+
+        forked = branch(world, branches, days=10, processes=2, method='fork')
+        self.assertEqual(list(forked), list(branches))
+        self.assertTrue(np.array_equal(forked['same'], forked['also_same'], equal_nan=True))
+        self.assertFalse(np.array_equal(forked['same'], forked['reseeded'], equal_nan=True))
+        self.assertFalse(np.array_equal(forked['same'], forked['barren'], equal_nan=True))
+        snapshot = branch(world, branches, days=10, processes=1, method='snapshot')
+        self.assertEqual(list(snapshot), list(branches))
+        for name in branches:
+            self.assertTrue(np.array_equal(snapshot[name], forked[name], equal_nan=True), name)
+        self.assertEqual((world.time, world.seed), (20, 'branch_test'))
+        self.assertTrue(os.path.isfile(os.path.join('data', 'branch_test_barren', 'config.py')))
+        self.assertRaises(ValueError, branch, world, branches, 10, method='spawn')
 
 
 if __name__ == '__main__':
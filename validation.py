@@ -0,0 +1,136 @@
+"""
+Check that a candidate engine produces worlds statistically equivalent to the reference loop:
+python validation.py CANDIDATE [--seeds SEEDS] [--days DAYS] [--size SIZE] [--alpha ALPHA] [--processes PROCESSES]
+A faster engine draws its random numbers in a different order, so runs cannot be compared day by day. Instead each
+engine is run over the same seeds, and the spread of each statistic across the seeds is compared at checkpoint days.
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+from multiprocessing import Pool
+import numpy as np
+import config as cfg
+from constants import FOOD_NAME, BUG_NAME
+from simulation import run_day
+from utility_methods import sum_list_energy, average_lifetime, average_rep_thresh, get_taste_average
+from world import World
+
+# Engines run a world for one day, each with the settings of the worlds it runs
+ENGINES = {'reference': (run_day, {}),
+           'active_set_scheduling': (run_day, {'active_set_scheduling': True}),
+           'packed_grid': (run_day, {'packed_grid': True})}
+
+STATISTICS = ['population', 'energy', 'deaths', 'average_alive_lifetime', 'average_lifespan',
+              'average_reproduction_threshold', 'average_taste']
+
+
+def world_statistics(world):
+    """Return the statistics of each organism type of a world, as a list in the order of STATISTICS."""
+    world.sync_dormant()
+    values = []
+    for name in (FOOD_NAME, BUG_NAME):
+        alive, dead = world.organism_lists[name]['alive'], world.organism_lists[name]['dead']
+        values += [len(alive), sum_list_energy(alive), len(dead[-1]), average_lifetime([alive]),
+                   average_lifetime(dead[-10:]), average_rep_thresh([alive]),
+                   get_taste_average([organism.taste for organism in alive]) if alive else np.nan]
+    return values
+
+
+def run_engine(engine, seed, size, days, checkpoints):
+    """
+    Run a world with an engine and take its statistics at the checkpoint days.
+    :return: Array of shape (checkpoints, 2 * len(STATISTICS)), food statistics then bug statistics
+    """
+    step, world_settings = ENGINES[engine]
+    settings = dict(cfg.world['settings'], seed=seed, rows=size, columns=size, init_food=size * size // 4,
+                    init_bugs=max(size * size // 100, 1), **world_settings)
+
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        world = World(**settings)
+        for day in range(days + 1):
+            if day in checkpoints:
+                samples.append(world_statistics(world))
+            if day < days:
+                step(world)
+    return np.array(samples, dtype=float)
+
+
+def _run(arguments):
+    return run_engine(*arguments)
+
+
+def compare(candidate, reference='reference', seeds=20, days=300, size=24, checkpoints=6, alpha=0.01,
+            processes=None):
+    """
+    Compare the statistics of a candidate engine with the reference over many seeds with two-sample
+    Kolmogorov-Smirnov tests.
+    :param candidate: The name of the engine being checked, a key of ENGINES
+    :param reference: The name of the engine it is checked against
+    :param seeds: The number of seeds each engine is run with
+    :param days: The number of days of each run
+    :param size: The rows and columns of each world
+    :param checkpoints: The number of days, evenly spaced over the run, the statistics are compared at
+    :param alpha: The chance of failing a statistic at a checkpoint for an equivalent engine is at most alpha divided
+    by the number of tests, so of failing the whole comparison at most alpha
+    :param processes: The number of worker processes, the number of CPUs by default
+    :return: List of dicts of organism, statistic, day, reference_mean, candidate_mean, p_value and passed
+    """
+    from scipy.stats import ks_2samp
+
+    checkpoint_days = sorted(set(np.linspace(days // checkpoints, days, checkpoints).astype(int).tolist()))
+    jobs = [(engine, 'validation_%d' % seed, size, days, checkpoint_days)
+            for engine in (reference, candidate) for seed in range(seeds)]
+    with Pool(processes) as pool:
+        runs = np.array(pool.map(_run, jobs))
+    reference_runs, candidate_runs = runs[:seeds], runs[seeds:]
+
+    results = []
+    for i, day in enumerate(checkpoint_days):
+        for j, (name, statistic) in enumerate([(name, statistic) for name in (FOOD_NAME, BUG_NAME)
+                                               for statistic in STATISTICS]):
+            reference_values, candidate_values = reference_runs[:, i, j], candidate_runs[:, i, j]
+            reference_values = reference_values[~np.isnan(reference_values)]
+            candidate_values = candidate_values[~np.isnan(candidate_values)]
+            if len(reference_values) and len(candidate_values):
+                p_value = ks_2samp(reference_values, candidate_values).pvalue
+            else:
+                p_value = 1.0 if len(reference_values) == len(candidate_values) else 0.0
+            results.append({'organism': name, 'statistic': statistic, 'day': day,
+                            'reference_mean': np.mean(reference_values) if len(reference_values) else np.nan,
+                            'candidate_mean': np.mean(candidate_values) if len(candidate_values) else np.nan,
+                            'p_value': p_value})
+
+    for result in results:
+        result['passed'] = result['p_value'] >= alpha / len(results)
+    return results
+
+
+def print_report(candidate, results):
+    print('%-8s %-32s %6s %14s %14s %9s' % ('organism', 'statistic', 'day', 'reference', candidate[:14], 'p'))
+    for result in results:
+        print('%-8s %-32s %6d %14.2f %14.2f %9.4f%s' % (
+            result['organism'], result['statistic'], result['day'], result['reference_mean'],
+            result['candidate_mean'], result['p_value'], '' if result['passed'] else '  FAIL'))
+    failed = sum(not result['passed'] for result in results)
+    print('\n%s: %s, %d of %d tests failed' % (candidate, 'FAIL' if failed else 'PASS', failed, len(results)))
+    return not failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare a candidate engine with the reference loop.')
+    parser.add_argument('candidate', choices=sorted(ENGINES))
+    parser.add_argument('--reference', default='reference', choices=sorted(ENGINES))
+    parser.add_argument('--seeds', type=int, default=20, help='number of seeds each engine is run with')
+    parser.add_argument('--days', type=int, default=300, help='number of days of each run')
+    parser.add_argument('--size', type=int, default=24, help='rows and columns of each world')
+    parser.add_argument('--checkpoints', type=int, default=6, help='number of days the statistics are compared at')
+    parser.add_argument('--alpha', type=float, default=0.01, help='chance of failing an equivalent engine')
+    parser.add_argument('--processes', type=int, help='number of worker processes, the number of CPUs by default')
+    args = parser.parse_args()
+
+    sys.exit(0 if print_report(args.candidate, compare(
+        args.candidate, args.reference, args.seeds, args.days, args.size, args.checkpoints, args.alpha,
+        args.processes)) else 1)
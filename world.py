@@ -1,11 +1,14 @@
 import numpy as np
 import datetime
 import random
+from itertools import compress
 import config as cfg
 from constants import *
 from utility_methods import get_taste_average
+from direction import Direction
 from bug import Bug
 from food import Food
+from packed_grid import PackedGrid
 
 
 class World:
@@ -13,7 +16,8 @@ class World:
     A class to create the environment inhabited by organisms.
     """
 
-    def __init__(self, rows, columns, seed=None, fertile_lands=None, time=0, init_food=0, init_bugs=0):
+    def __init__(self, rows, columns, seed=None, fertile_lands=None, time=0, init_food=0, init_bugs=0,
+                 active_set_scheduling=False, packed_grid=False):
         """
         World Initialisation
         :param rows: The number of rows in the world
@@ -23,6 +27,9 @@ class World:
         :param time: The time the world has existed for
         :param init_food: The initial number of food in the world
         :param init_bugs: The initial number of bugs in the world
+        :param active_set_scheduling: Set to True to set aside plants that cannot change state until something
+        nearby does, and to skip moves and reproduction with no free neighbouring square
+        :param packed_grid: Set to True to hold the grid as bit-packed food and bug planes instead of a uint8 array
         """
         self.columns = columns
         self.rows = rows
@@ -32,12 +39,29 @@ class World:
 
         # Initiate a dict to store lists of food and bugs
         self.organism_lists = {FOOD_NAME: {'alive': [], 'dead': [[]]}, BUG_NAME: {'alive': [], 'dead': [[]]}}
-        self.plant_position_dict = None
-        self.grid = np.zeros(shape=(rows, columns), dtype=np.int)
+        self.grid = PackedGrid(rows, columns) if packed_grid else np.zeros(shape=(rows, columns), dtype=np.uint8)
         self.fertile_squares = self.get_fertile_squares(fertile_lands)
         self.spawnable_squares = list(self.fertile_squares)
 
-        self.plant_position_dict = {}
+        # Each square of an id grid holds the slot of the organism of that type on it, or -1 if there is none
+        self.id_grids = {name: np.full((rows, columns), -1, dtype=np.int32) for name in (FOOD_NAME, BUG_NAME)}
+        self.slots = {FOOD_NAME: [], BUG_NAME: []}  # organism in each slot, None if the slot is free
+        self.free_slots = {FOOD_NAME: [], BUG_NAME: []}
+        self.history = None  # a history writer logging spawns, kills and moves
+        self.gene_histograms = None  # gene histograms counting spawns and kills
+        self.lineage = None  # a lineage tracker recording the parent of each spawn
+
+        # Free neighbouring squares of each square for each organism type, and the plants not in the active list
+        self.active_set_scheduling = active_set_scheduling
+        self.neighbour_offsets = sorted(set(Direction.all_directions))
+        self._neighbour_offsets_array = np.array(self.neighbour_offsets)
+        self.free_neighbours = None
+        self.dormant_plants = set()
+        self.woken_plants = {}  # ordered, woken plants rejoin the active list the next day
+        self.dormant_since_sum = 0  # sum of the times the set aside and woken plants were last caught up to
+        if active_set_scheduling:
+            self._setup_free_neighbours()
+            self.organism_lists[FOOD_NAME]['active'] = []
 
         # Populate the world
         self.drop_food(init_food, **cfg.world['food_spawn_vals'])
@@ -52,31 +76,42 @@ class World:
         # Display yesterday's data
         print("time: {}, plants: {}, bugs: {}".format(self.time, len(alive_plants), len(alive_bugs)))
 
+        if self.active_set_scheduling:
+            # Plants woken yesterday rejoin the active list
+            for plant in self.woken_plants:
+                self._catch_up(plant, self.time)
+                self.dormant_since_sum -= plant.dormant_since
+                plant.dormant_since = None
+                self.organism_lists[FOOD_NAME]['active'].append(plant)
+            self.woken_plants.clear()
+
         # It's a new day!
         self.time += 1
-        self.update_available_spawn_squares()
+        if not self.active_set_scheduling or self.time < cfg.endangered_time:
+            self.update_available_spawn_squares()
 
         # if self.time == 200:
         #     self.spawn(Bug([int(self.rows/2), int(self.columns/2)], taste=180, **cfg.world['bug_spawn_vals']))
 
-        # If there is still food, find their taste average, else don't update my average
-
-        food_taste_average = get_taste_average([i.taste for i in alive_plants]) if alive_plants else \
-            cfg.world['food_spawn_vals']['taste']
-        bug_taste_average = get_taste_average([i.taste for i in alive_bugs]) if alive_bugs else \
-            cfg.world['bug_spawn_vals']['taste']
+        if self.time < cfg.endangered_time:
+            # If there is still food, find their taste average, else don't update my average
+            food_taste_average = get_taste_average([i.taste for i in alive_plants]) if alive_plants else \
+                cfg.world['food_spawn_vals']['taste']
+            bug_taste_average = get_taste_average([i.taste for i in alive_bugs]) if alive_bugs else \
+                cfg.world['bug_spawn_vals']['taste']
 
-        food_spawn_vals, bug_spawn_vals = [dict((k, v) for k, v in cfg.world[organism].items() if k is not 'taste') for
-                                           organism in ['food_spawn_vals', 'bug_spawn_vals']]
+            food_spawn_vals, bug_spawn_vals = [dict((k, v) for k, v in cfg.world[organism].items() if k != 'taste')
+                                               for organism in ['food_spawn_vals', 'bug_spawn_vals']]
 
-        if self.time < cfg.endangered_time:
             # Drop balls on them (if endangered)
             if len(alive_plants) < cfg.food_endangered_threshold:
                 self.drop_food(1, **food_spawn_vals, taste=food_taste_average)
             if len(alive_bugs) < cfg.bug_endangered_threshold:
                 self.drop_bug(1, **bug_spawn_vals, taste=bug_taste_average)
 
-        # Shuffle the order alive food & bug lists
+        # Shuffle the order alive food & bug lists, only active plants take a turn when they are scheduled
+        if self.active_set_scheduling:
+            alive_plants = self.organism_lists[FOOD_NAME]['active']
         random.shuffle(alive_plants)
         random.shuffle(alive_bugs)
 
@@ -95,7 +130,7 @@ class World:
 
         if fertile_lands is None:
             # Make the whole world fertile
-            squares = [[x, y] for x in range(self.columns) for y in range(self.rows)]
+            squares = [[x, y] for x in range(self.rows) for y in range(self.columns)]
         else:
             squares = []
             for i in fertile_lands:
@@ -104,18 +139,137 @@ class World:
 
         return squares
 
+    def _setup_free_neighbours(self):
+        """
+        Count the free neighbouring squares of each square for each organism type.
+
+        The counts are kept in flat bytearrays with a border of one square, so that updating the neighbours of a
+        square is a few plain list operations with no bounds checks. free_neighbours holds numpy views of them.
+        """
+        size_x, size_y = self.grid.shape
+        self._padded_width = size_y + 2
+        self._flat_offsets = [dx * self._padded_width + dy for dx, dy in self.neighbour_offsets]
+
+        counts = np.zeros(self.grid.shape, dtype=np.uint8)
+        for dx, dy in self.neighbour_offsets:
+            counts[max(0, -dx):size_x - max(0, dx), max(0, -dy):size_y - max(0, dy)] += 1
+
+        self._free_counts, self.free_neighbours = {}, {}
+        for name in (FOOD_NAME, BUG_NAME):
+            padded = np.full((size_x + 2, size_y + 2), 64, dtype=np.uint8)  # the border never under or overflows
+            padded[1:-1, 1:-1] = counts
+            self._free_counts[name] = bytearray(padded.tobytes())
+            self.free_neighbours[name] = np.frombuffer(self._free_counts[name], dtype=np.uint8).reshape(
+                padded.shape)[1:-1, 1:-1]
+
+    def _update_free_neighbours(self, organism, change):
+        """Update the free neighbour count of the squares next to an organism that arrived (-1) or left (+1)."""
+        x, y = organism.position.tolist()
+        square = (x + 1) * self._padded_width + y + 1
+        counts = self._free_counts[organism.name]
+        for offset in self._flat_offsets:
+            counts[square - offset] += change
+
+        # A plant next to a square that was just freed may be able to reproduce again
+        if change > 0 and organism.name == FOOD_NAME and self.dormant_plants:
+            size_x, size_y = self.grid.shape
+            id_grid, slots = self.id_grids[FOOD_NAME], self.slots[FOOD_NAME]
+            for dx, dy in self.neighbour_offsets:
+                if 0 <= x - dx < size_x and 0 <= y - dy < size_y:
+                    slot = id_grid.item(x - dx, y - dy)
+                    if slot >= 0:
+                        self.wake(slots[slot])
+
+    def organism_at(self, name, position):
+        """Return the organism of a type on a square, or None if there is none."""
+        x, y = position
+        slot = self.id_grids[name].item(x, y)
+        return self.slots[name][slot] if slot >= 0 else None
+
+    def neighbours(self, name, position, offsets=None):
+        """
+        Return the organisms of a type next to a square.
+        :param name: FOOD_NAME or BUG_NAME
+        :param position: The square to look around
+        :param offsets: Array of (dx, dy) offsets of the squares to look at, the neighbouring squares by default
+        :return: List of organisms
+        """
+        squares = np.asarray(position) + (self._neighbour_offsets_array if offsets is None else np.asarray(offsets))
+        squares = squares[np.all((squares >= 0) & (squares < self.grid.shape), axis=1)]
+        slots = self.id_grids[name][squares[:, 0], squares[:, 1]]
+        return [self.slots[name][slot] for slot in slots[slots >= 0].tolist()]
+
+    def _take_slot(self, organism):
+        free_slots, slots = self.free_slots[organism.name], self.slots[organism.name]
+        if free_slots:
+            organism.slot = free_slots.pop()
+            slots[organism.slot] = organism
+        else:
+            organism.slot = len(slots)
+            slots.append(organism)
+
+    def _release_slot(self, organism):
+        self.slots[organism.name][organism.slot] = None
+        self.free_slots[organism.name].append(organism.slot)
+        organism.slot = None
+
+    def has_space(self, organism):
+        """Return False if the organism certainly has no neighbouring square to move or reproduce into."""
+        if not self.active_set_scheduling:
+            return True
+        x, y = organism.position.tolist()
+        return self._free_counts[organism.name][(x + 1) * self._padded_width + y + 1] > 0
+
+    def settle(self, plant):
+        """Set aside a plant that cannot change state until something nearby changes, returns True if it was."""
+        if plant.energy < plant.energy_max or plant.energy <= cfg.food['min_energy'] or \
+                plant.lifetime <= plant.maturity_age:
+            return False
+        if plant.energy >= plant.reproduction_threshold and self.has_space(plant):
+            return False
+
+        plant.dormant_since = self.time
+        self.dormant_since_sum += self.time
+        self.dormant_plants.add(plant)
+        self.organism_lists[FOOD_NAME]['active'].remove(plant)
+        return True
+
+    def wake(self, plant):
+        """Return a set aside plant to the active list from the next day."""
+        if plant in self.dormant_plants:
+            self.dormant_plants.remove(plant)
+            self.woken_plants[plant] = None
+
+    def _catch_up(self, plant, time):
+        """Advance the lifetime of a set aside plant to a time, as if it had taken its turns."""
+        plant.lifetime += time - plant.dormant_since
+        self.dormant_since_sum += time - plant.dormant_since
+        plant.dormant_since = time
+
+    def pending_lifetime(self):
+        """Return the lifetime the set aside and woken plants have yet to be caught up by, without walking them."""
+        return (len(self.dormant_plants) + len(self.woken_plants)) * self.time - self.dormant_since_sum
+
+    def sync_dormant(self):
+        """Bring the lifetimes of set aside plants up to date, call before reading the alive lists."""
+        for plant in self.dormant_plants:
+            self._catch_up(plant, self.time)
+        for plant in self.woken_plants:
+            self._catch_up(plant, self.time)
+
     def available(self, organism, direction):
         return not self._collide(organism.position + direction, organism.value)
 
     def _collide(self, position, organism_value):
         """Check if position is out of bounds and for disallowed collisions."""
 
-        # Collide with wall
-        if position[0] < 0 or position[0] >= self.columns or position[1] < 0 or position[1] >= self.rows:
+        # Collide with wall, positions are [x, y] indices into the grid of rows by columns
+        if position[0] < 0 or position[0] >= self.rows or position[1] < 0 or position[1] >= self.columns:
             return True
 
-        # Collide with organism of the same type
-        if self.grid[tuple(position)] == organism_value or self.grid[tuple(position)] == FOOD_VAL + BUG_VAL:
+        # Collide with organism of the same type, squares are read with item() as comparing uint8 scalars is slow
+        square_value = self.grid.item(tuple(position))
+        if square_value == organism_value or square_value == FOOD_VAL + BUG_VAL:
             return True
 
         return False
@@ -127,38 +281,132 @@ class World:
         i = 0
         while i < len(self.spawnable_squares):
             current_square = tuple(self.spawnable_squares[i])
-            if self.grid[current_square] != EMPTY_SQUARE_VAL:
+            if self.grid.item(current_square) != EMPTY_SQUARE_VAL:
                 del self.spawnable_squares[i]
                 continue
             i += 1
 
     def kill(self, organism):
-        self.grid[tuple(organism.position)] -= organism.value
+        position = tuple(organism.position)
+        self.grid[position] = self.grid.item(position) - organism.value
+        self.id_grids[organism.name][position] = -1
+        self._release_slot(organism)
         self.organism_lists[organism.name]['dead'][-1].append(organism)
         self.organism_lists[organism.name]['alive'].remove(organism)
-        if organism.name == FOOD_NAME:
-            del self.plant_position_dict[tuple(organism.position)]
+        if self.history is not None:
+            self.history.record_kill(organism)
+        if self.gene_histograms is not None:
+            self.gene_histograms.remove(organism)
+
+        if self.active_set_scheduling:
+            self._update_free_neighbours(organism, 1)
+            if organism.name == FOOD_NAME:
+                if organism.dormant_since is not None:
+                    self._catch_up(organism, self.time)
+                    self.dormant_since_sum -= organism.dormant_since
+                    self.dormant_plants.discard(organism)
+                    self.woken_plants.pop(organism, None)
+                else:
+                    self.organism_lists[FOOD_NAME]['active'].remove(organism)
 
     def spawn(self, organism):
-        self.grid[tuple(organism.position)] += organism.value
+        position = tuple(organism.position)
+        self.grid[position] = self.grid.item(position) + organism.value
+        self._take_slot(organism)
+        self.id_grids[organism.name][position] = organism.slot
         self.organism_lists[organism.name]['alive'].append(organism)
-        if organism.name == FOOD_NAME:
-            self.plant_position_dict[tuple(organism.position)] = organism
+        if self.history is not None:
+            self.history.record_spawn(organism)
+        if self.gene_histograms is not None:
+            self.gene_histograms.add(organism)
+        if self.lineage is not None:
+            self.lineage.record_birth(organism, self.time)
+
+        if self.active_set_scheduling:
+            self._update_free_neighbours(organism, -1)
+            if organism.name == FOOD_NAME:
+                self.organism_lists[FOOD_NAME]['active'].append(organism)
+
+    def move(self, organism, direction):
+        old_position = organism.position.tolist()
+        position = tuple(organism.position)
+        self.grid[position] = self.grid.item(position) - organism.value
+        self.id_grids[organism.name][position] = -1
+        if self.active_set_scheduling:
+            self._update_free_neighbours(organism, 1)
+
+        organism.move(direction)
+
+        position = tuple(organism.position)
+        self.grid[position] = self.grid.item(position) + organism.value
+        self.id_grids[organism.name][position] = organism.slot
+        if self.active_set_scheduling:
+            self._update_free_neighbours(organism, -1)
+        if self.history is not None:
+            self.history.record_move(organism, old_position)
+
+    def spawn_all(self, organisms):
+        """Spawn organisms of one type on distinct squares free of that type, writing the grids in one go."""
+        if not organisms:
+            return
+
+        name, value = organisms[0].name, organisms[0].value
+        for organism in organisms:
+            self._take_slot(organism)
+
+        xs, ys = np.array([organism.position for organism in organisms]).T
+        if isinstance(self.grid, np.ndarray):
+            self.grid[xs, ys] += value
+        else:
+            for position in zip(xs.tolist(), ys.tolist()):
+                self.grid[position] = self.grid.item(position) + value
+        self.id_grids[name][xs, ys] = [organism.slot for organism in organisms]
+        self.organism_lists[name]['alive'].extend(organisms)
+
+        for organism in organisms:
+            if self.history is not None:
+                self.history.record_spawn(organism)
+            if self.gene_histograms is not None:
+                self.gene_histograms.add(organism)
+            if self.lineage is not None:
+                self.lineage.record_birth(organism, self.time)
+            if self.active_set_scheduling:
+                self._update_free_neighbours(organism, -1)
+
+        if self.active_set_scheduling and name == FOOD_NAME:
+            self.organism_lists[FOOD_NAME]['active'].extend(organisms)
+
+    def drop_organisms(self, organism_class, number, energy, reproduction_threshold, energy_max, taste):
+        """
+        Spawn organisms on spawnable squares chosen without replacement, as many as there are squares for.
+        Their squares, and the mutations of their genes, are drawn in one go from a generator seeded by the world's
+        random state.
+        """
+        number = min(number, len(self.spawnable_squares))
+        if number <= 0:
+            return []
+
+        rng = np.random.default_rng(random.getrandbits(64))
+        chosen = rng.choice(len(self.spawnable_squares), number, replace=False).tolist()
+        positions = [self.spawnable_squares[i] for i in chosen]
+
+        # Take the chosen squares out of the spawnable squares, deleting a few or rebuilding the list for many
+        if number < 100:
+            for i in sorted(chosen, reverse=True):
+                del self.spawnable_squares[i]
+        else:
+            keep = np.ones(len(self.spawnable_squares), dtype=bool)
+            keep[chosen] = False
+            self.spawnable_squares = list(compress(self.spawnable_squares, keep.tolist()))
+
+        organisms = organism_class.create_all(positions, energy, reproduction_threshold, energy_max, taste, rng)
+        self.spawn_all(organisms)
+        return organisms
 
     def drop_food(self, number, energy=20, reproduction_threshold=30, energy_max=100, taste=180):
         """Spawn food on fertile land and check spawn square is available."""
-        for _ in range(number):
-            try:
-                spawn_position = self.spawnable_squares.pop(random.randint(0, len(self.spawnable_squares) - 1))
-                self.spawn(Food(spawn_position, energy, reproduction_threshold, energy_max, taste))
-            except ValueError:
-                break
+        return self.drop_organisms(Food, number, energy, reproduction_threshold, energy_max, taste)
 
     def drop_bug(self, number, energy=30, reproduction_threshold=70, energy_max=100, taste=180):
         """Spawn bugs on fertile land and check spawn square is available."""
-        for _ in range(number):
-            try:
-                spawn_position = self.spawnable_squares.pop(random.randint(0, len(self.spawnable_squares) - 1))
-                self.spawn(Bug(spawn_position, energy, reproduction_threshold, energy_max, taste))
-            except ValueError:
-                break
+        return self.drop_organisms(Bug, number, energy, reproduction_threshold, energy_max, taste)
@@ -0,0 +1,138 @@
+import numpy as np
+import os
+import sys
+import json
+import fnmatch
+from constants import FOOD_NAME, BUG_NAME
+
+
+class WorldArchive:
+    """
+    A class to consolidate the per-day world data CSV files of a run into a single memory-mappable store.
+    """
+    columns = ['x', 'y', 'energy', 'reproduction_threshold', 'taste']
+    dtype = np.int32
+
+    def __init__(self, seed):
+        """
+        World Archive Initialisation
+        :param seed: The seed of the run to read
+        """
+        self.seed = seed
+        self.path = self.store_path(seed)
+
+        with open(os.path.join(self.path, 'store.json')) as store_file:
+            self.metadata = json.load(store_file)
+
+        self.categories = np.array(self.metadata['categories'], dtype=str)
+        self.days = np.load(os.path.join(self.path, 'days.npy'))
+        self.offsets = np.load(os.path.join(self.path, 'offsets.npy'))
+
+        # Rows are only paged in from disk when a day is read
+        self._values = None
+        self._organisms = None
+
+    @staticmethod
+    def store_path(seed):
+        return os.path.join('data', seed, 'data_files', 'world_store')
+
+    @classmethod
+    def exists(cls, seed):
+        return os.path.exists(os.path.join(cls.store_path(seed), 'store.json'))
+
+    @property
+    def values(self):
+        if self._values is None:
+            self._values = np.memmap(os.path.join(self.path, 'values.bin'), dtype=self.dtype, mode='r',
+                                     shape=(self.metadata['rows'], len(self.columns))) \
+                if self.metadata['rows'] else np.zeros((0, len(self.columns)), dtype=self.dtype)
+        return self._values
+
+    @property
+    def organisms(self):
+        if self._organisms is None:
+            self._organisms = np.memmap(os.path.join(self.path, 'organisms.bin'), dtype=np.uint8, mode='r',
+                                        shape=(self.metadata['rows'],)) \
+                if self.metadata['rows'] else np.zeros(0, dtype=np.uint8)
+        return self._organisms
+
+    def __contains__(self, day):
+        i = np.searchsorted(self.days, day)
+        return i < len(self.days) and self.days[i] == day
+
+    def day_slice(self, day):
+        """Return the slice of rows holding a day."""
+        i = np.searchsorted(self.days, day)
+        if i == len(self.days) or self.days[i] != day:
+            raise KeyError('day %r is not in the archive of %s' % (day, self.seed))
+        return slice(int(self.offsets[i]), int(self.offsets[i + 1]))
+
+    def read_day(self, day):
+        """
+        Read the organisms alive at a time.
+        :param day: The time to read
+        :return: An array of organism names and an array of [x, y, energy, reproduction_threshold, taste] rows
+        """
+        rows = self.day_slice(day)
+        return self.categories[self.organisms[rows]], np.asarray(self.values[rows], dtype=float)
+
+    @classmethod
+    def convert(cls, seed, remove_csv=False):
+        """
+        Consolidate the world data CSV files of a run into a store, this only needs to be done once per run.
+        :param seed: The seed of the run to convert
+        :param remove_csv: Set to True to delete the CSV files once they have been converted
+        :return: The archive of the run
+        """
+        csv_path = os.path.join('data', seed, 'data_files', 'world_data')
+        days = sorted(int(name[:-len('.csv')]) for name in fnmatch.filter(os.listdir(csv_path), '*.csv'))
+
+        path = cls.store_path(seed)
+        if not os.path.exists(path):
+            os.makedirs(path)
+        elif os.path.exists(os.path.join(path, 'store.json')):
+            os.remove(os.path.join(path, 'store.json'))
+
+        categories = [FOOD_NAME, BUG_NAME]
+        category_codes = {name: code for code, name in enumerate(categories)}
+        offsets = [0]
+
+        with open(os.path.join(path, 'values.bin'), 'wb') as values_file, \
+                open(os.path.join(path, 'organisms.bin'), 'wb') as organisms_file:
+            for day in days:
+                sys.stdout.write('\r' + 'archiving world data, time: %r' % day + '/%r' % days[-1] + '...')
+                sys.stdout.flush()
+
+                with open(os.path.join(csv_path, '%r.csv' % day)) as world_file:
+                    rows = [line.split(',') for line in world_file.read().splitlines() if line]
+
+                names = [row[0].strip("'") for row in rows]
+                for name in names:
+                    if name not in category_codes:
+                        category_codes[name] = len(categories)
+                        categories.append(name)
+
+                np.array([category_codes[name] for name in names], dtype=np.uint8).tofile(organisms_file)
+                np.array([row[1:len(cls.columns) + 1] for row in rows], dtype=float).reshape(
+                    -1, len(cls.columns)).astype(cls.dtype).tofile(values_file)
+                offsets.append(offsets[-1] + len(rows))
+
+        np.save(os.path.join(path, 'days.npy'), np.array(days, dtype=np.int64))
+        np.save(os.path.join(path, 'offsets.npy'), np.array(offsets, dtype=np.int64))
+
+        # The metadata is written last so a half-written store is never mistaken for a complete one
+        with open(os.path.join(path, 'store.json'), 'w') as store_file:
+            json.dump({'categories': categories, 'columns': cls.columns, 'rows': offsets[-1]}, store_file)
+
+        if remove_csv:
+            for day in days:
+                os.remove(os.path.join(csv_path, '%r.csv' % day))
+
+        print('\narchived %d days (%d rows) of %s' % (len(days), offsets[-1], seed))
+
+        return cls(seed)
+
+
+if __name__ == '__main__':
+    for archive_seed in sys.argv[1:]:
+        WorldArchive.convert(archive_seed)
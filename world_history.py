@@ -0,0 +1,211 @@
+import numpy as np
+import os
+import zlib
+from constants import FOOD_NAME, BUG_NAME
+
+ORGANISM_CODES = {FOOD_NAME: 0, BUG_NAME: 1}
+ORGANISM_NAMES = np.array([FOOD_NAME, BUG_NAME])
+
+# Event kinds, organisms are identified by their type and square since a square holds at most one of each type
+SPAWN, KILL, MOVE = range(3)
+
+# Blocks are stored as a separately compressed stream per column, which compresses far better than rows, and each
+# column is narrowed to the smallest integer type that holds it
+NARROW_DTYPES = [np.dtype(dtype) for dtype in ['i1', 'u1', '<i2', '<u2', '<i4', '<i8']]
+index_dtype = np.dtype([('day', '<i8'), ('keyframe', 'u1'), ('offset', '<i8'), ('length', '<i8')])
+
+
+def history_path(seed):
+    return os.path.join('data', seed, 'data_files', 'world_history')
+
+
+def pack_columns(columns):
+    """Compress a list of integer columns into one block."""
+    header, streams = [len(columns)], []
+    for column in columns:
+        column = np.asarray(column, dtype=np.int64)
+        low, high = (int(column.min()), int(column.max())) if column.size else (0, 0)
+        code = next(i for i, dtype in enumerate(NARROW_DTYPES)
+                    if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max)
+        streams.append(zlib.compress(column.astype(NARROW_DTYPES[code]).tobytes(), 9))
+        header += [code, len(streams[-1])]
+    return np.array(header, dtype='<i8').tobytes() + b''.join(streams)
+
+
+def unpack_columns(block):
+    """Return the list of columns compressed into a block."""
+    count = int(np.frombuffer(block, dtype='<i8', count=1)[0])
+    header = np.frombuffer(block, dtype='<i8', count=1 + 2 * count)[1:].reshape(count, 2).tolist()
+
+    columns, offset = [], 8 * (1 + 2 * count)
+    for code, length in header:
+        columns.append(np.frombuffer(zlib.decompress(block[offset:offset + length]), dtype=NARROW_DTYPES[code]))
+        offset += length
+    return columns
+
+
+class HistoryWriter:
+    """
+    A class to record the world as a log of daily spawn, kill, move and energy change events with periodic keyframes.
+    """
+
+    def __init__(self, world, keyframe_interval=100):
+        """
+        History Writer Initialisation
+        :param world: The world being recorded, its spawn, kill and move calls are logged from now on
+        :param keyframe_interval: The number of days between full copies of the world
+        """
+        self.world = world
+        self.keyframe_interval = keyframe_interval
+        self.last_keyframe = None
+        self.events = []
+
+        path = history_path(world.seed)
+        if not os.path.exists(path):
+            os.makedirs(path)
+        self.history_file = open(os.path.join(path, 'history.bin'), 'wb')
+        self.index_file = open(os.path.join(path, 'index.bin'), 'wb')
+
+        world.history = self
+
+    def record_spawn(self, organism):
+        x, y = organism.position.tolist()
+        self.events.append((SPAWN, ORGANISM_CODES[organism.name], x, y, organism.energy,
+                            organism.reproduction_threshold, organism.taste))
+        organism.logged_energy = organism.energy
+
+    def record_kill(self, organism):
+        x, y = organism.position.tolist()
+        self.events.append((KILL, ORGANISM_CODES[organism.name], x, y, 0, 0, 0))
+
+    def record_move(self, organism, old_position):
+        x, y = organism.position.tolist()
+        self.events.append((MOVE, ORGANISM_CODES[organism.name], old_position[0], old_position[1],
+                            x - old_position[0], y - old_position[1], 0))
+
+    def end_day(self):
+        """Write the events of the day, or a keyframe if one is due."""
+
+        rows = []
+        for name in [FOOD_NAME, BUG_NAME]:
+            code = ORGANISM_CODES[name]
+            for organism in self.world.organism_lists[name]['alive']:
+                x, y = organism.position.tolist()
+                rows.append((code, x, y, organism.energy, organism.energy - organism.logged_energy,
+                             organism.reproduction_threshold, organism.taste))
+                organism.logged_energy = organism.energy
+        rows = np.array(rows, dtype=np.int64).reshape(-1, 7)
+
+        if self.last_keyframe is None or self.world.time - self.last_keyframe >= self.keyframe_interval:
+            # organism, x, y, energy, reproduction_threshold, taste
+            self._write_block(pack_columns([rows[:, i] for i in [0, 1, 2, 3, 5, 6]]), keyframe=True)
+            self.last_keyframe = self.world.time
+
+        else:
+            # The kind, organism and square of every event in the order they happened, then the genes of the spawned
+            # organisms and the directions of the moves
+            events = np.array(self.events, dtype=np.int64).reshape(-1, 7)
+            spawns, moves = events[events[:, 0] == SPAWN], events[events[:, 0] == MOVE]
+            columns = [events[:, 0], events[:, 1], events[:, 2], events[:, 3],
+                       spawns[:, 4], spawns[:, 5], spawns[:, 6], moves[:, 4], moves[:, 5]]
+
+            # Energy changes are stored for every organism in (organism, x, y) order, so they need no positions
+            columns.append(rows[np.lexsort((rows[:, 2], rows[:, 1], rows[:, 0])), 4])
+            self._write_block(pack_columns(columns), keyframe=False)
+
+        del self.events[:]
+
+    def _write_block(self, block, keyframe):
+        np.array([(self.world.time, keyframe, self.history_file.tell(), len(block))],
+                 dtype=index_dtype).tofile(self.index_file)
+        self.history_file.write(block)
+
+        # Hand each day to the operating system so a crash only loses the day in progress
+        self.history_file.flush()
+        self.index_file.flush()
+
+    def close(self):
+        self.history_file.close()
+        self.index_file.close()
+        self.world.history = None
+
+
+class HistoryReader:
+    """
+    A class to rebuild any recorded day of a world history by replaying events from the nearest keyframe.
+    """
+
+    def __init__(self, seed):
+        """
+        History Reader Initialisation
+        :param seed: The seed of the run to read
+        """
+        path = history_path(seed)
+        self.index = np.fromfile(os.path.join(path, 'index.bin'), dtype=index_dtype)
+        self.days = self.index['day']
+        self.keyframe_days = self.days[self.index['keyframe'] == 1]
+        self.history_file = open(os.path.join(path, 'history.bin'), 'rb')
+
+        # The last rebuilt day, so reading days in order only replays one day at a time
+        self._state = None
+        self._state_day = None
+
+    @staticmethod
+    def exists(seed):
+        return os.path.exists(os.path.join(history_path(seed), 'index.bin'))
+
+    def __contains__(self, day):
+        i = np.searchsorted(self.days, day)
+        return i < len(self.days) and self.days[i] == day
+
+    def _read_block(self, i):
+        self.history_file.seek(int(self.index['offset'][i]))
+        block = self.history_file.read(int(self.index['length'][i]))
+        return [column.tolist() for column in unpack_columns(block)]
+
+    def state(self, day):
+        """
+        Rebuild the world at a time.
+        :param day: The time to rebuild
+        :return: Dict of [energy, reproduction_threshold, taste] keyed by (organism code, x, y)
+        """
+        if day not in self:
+            raise KeyError('day %r is not in the history' % day)
+
+        keyframe_day = self.keyframe_days[np.searchsorted(self.keyframe_days, day, side='right') - 1]
+        if self._state_day is not None and keyframe_day <= self._state_day <= day:
+            state, start = self._state, np.searchsorted(self.days, self._state_day) + 1
+        else:
+            start = np.searchsorted(self.days, keyframe_day)
+            state = {(row[0], row[1], row[2]): [row[3], row[4], row[5]] for row in zip(*self._read_block(start))}
+            start += 1
+
+        for i in range(start, np.searchsorted(self.days, day) + 1):
+            kinds, organisms, xs, ys, energies, rep_threshs, tastes, dxs, dys, energy_changes = self._read_block(i)
+            spawns, moves = zip(energies, rep_threshs, tastes), zip(dxs, dys)
+
+            for kind, organism, x, y in zip(kinds, organisms, xs, ys):
+                if kind == SPAWN:
+                    state[(organism, x, y)] = list(next(spawns))
+                elif kind == KILL:
+                    del state[(organism, x, y)]
+                else:
+                    dx, dy = next(moves)
+                    state[(organism, x + dx, y + dy)] = state.pop((organism, x, y))
+
+            for key, change in zip(sorted(state), energy_changes):
+                state[key][0] += change
+
+        self._state, self._state_day = state, day
+        return state
+
+    def read_day(self, day):
+        """
+        Read the organisms alive at a time.
+        :param day: The time to read
+        :return: An array of organism names and an array of [x, y, energy, reproduction_threshold, taste] rows
+        """
+        rows = sorted((key[0], key[1], key[2], values[0], values[1], values[2])
+                      for key, values in self.state(day).items())
+        rows = np.array(rows, dtype=float).reshape(-1, 6)
+        return ORGANISM_NAMES[rows[:, 0].astype(int)], rows[:, 1:]
@@ -0,0 +1,276 @@
+import numpy as np
+import os
+import sys
+import json
+import fnmatch
+from constants import FOOD_NAME, BUG_NAME
+from world_archive import WorldArchive
+from world_history import HistoryReader, ORGANISM_CODES, ORGANISM_NAMES
+
+
+def index_path(seed):
+    return os.path.join('data', seed, 'data_files', 'world_index')
+
+
+def day_reader(seed):
+    """
+    Find the world data of a run, from its archive, history or CSVs.
+    :return: The list of recorded days, and a function returning the organism names and values of a day
+    """
+    if WorldArchive.exists(seed):
+        reader = WorldArchive(seed)
+    elif HistoryReader.exists(seed):
+        reader = HistoryReader(seed)
+    else:
+        reader = None
+
+    if reader is not None:
+        return reader.days.tolist(), reader.read_day
+
+    csv_path = os.path.join('data', seed, 'data_files', 'world_data')
+
+    def read_csv_day(day):
+        with open(os.path.join(csv_path, '%r.csv' % day)) as world_file:
+            rows = [line.split(',') for line in world_file.read().splitlines() if line]
+        return np.array([row[0].strip("'") for row in rows]), np.array([row[1:6] for row in rows], dtype=float)
+
+    return sorted(int(name[:-len('.csv')]) for name in fnmatch.filter(os.listdir(csv_path), '*.csv')), read_csv_day
+
+
+def recorded_days(seed):
+    """Yield (day, organism names, values) for every day recorded for a run, from its archive, history or CSVs."""
+    days, read_day = day_reader(seed)
+    for day in days:
+        yield (day,) + read_day(day)
+
+
+class IndexWriter:
+    """
+    A class to bucket the organisms of each day by day range and spatial tile as a run is recorded.
+
+    The days of a chunk are held in memory until the chunk is complete, then written as one file of rows sorted by
+    tile and day, so a query reads only the tiles it overlaps from the chunks it overlaps.
+    """
+    columns = ['day', 'organism', 'x', 'y', 'energy', 'reproduction_threshold', 'taste']
+
+    def __init__(self, seed, chunk_days=100, tile_size=16):
+        """
+        Index Writer Initialisation
+        :param seed: The seed of the run being indexed
+        :param chunk_days: The number of days in each chunk
+        :param tile_size: The width and height of the square tiles, in squares
+        """
+        self.path = index_path(seed)
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        for name in fnmatch.filter(os.listdir(self.path), 'chunk_*.bin'):
+            os.remove(os.path.join(self.path, name))
+
+        self.metadata = {'chunk_days': chunk_days, 'tile_size': tile_size, 'columns': self.columns,
+                         'days': [], 'chunks': []}
+        self.chunk = None
+        self.chunk_rows = []
+
+    def add_world(self, world):
+        """Add the organisms alive in a world at its current time."""
+        rows = [(world.time, ORGANISM_CODES[name], organism.position[0], organism.position[1], organism.energy,
+                 organism.reproduction_threshold, organism.taste)
+                for name in [FOOD_NAME, BUG_NAME] for organism in world.organism_lists[name]['alive']]
+        self._add(world.time, np.array(rows, dtype=np.int32).reshape(-1, len(self.columns)))
+
+    def add_day(self, day, names, values):
+        """
+        Add the organisms alive on a day.
+        :param day: The time of the organisms, days must be added in order
+        :param names: Array of organism names
+        :param values: Array of [x, y, energy, reproduction_threshold, taste] rows
+        """
+        rows = np.empty((len(names), len(self.columns)), dtype=np.int32)
+        rows[:, 0] = day
+        rows[:, 1] = [ORGANISM_CODES[name] for name in names]
+        rows[:, 2:] = values
+        self._add(day, rows)
+
+    def _add(self, day, rows):
+        chunk = day // self.metadata['chunk_days']
+        if chunk != self.chunk:
+            self._write_chunk()
+            self.chunk = chunk
+
+        self.chunk_rows.append(rows)
+        self.metadata['days'].append(day)
+
+    def _write_chunk(self):
+        if not self.chunk_rows:
+            return
+
+        rows = np.concatenate(self.chunk_rows)
+        tiles = rows[:, 2:4] // self.metadata['tile_size']
+        order = np.lexsort((rows[:, 0], tiles[:, 1], tiles[:, 0]))
+        rows, tiles = rows[order], tiles[order]
+
+        # The first row of each tile, and where its rows end
+        starts = np.flatnonzero(np.r_[True, np.any(tiles[1:] != tiles[:-1], axis=1)]) if len(rows) else \
+            np.zeros(0, dtype=int)
+        rows.tofile(os.path.join(self.path, 'chunk_%d.bin' % self.chunk))
+
+        self.metadata['chunks'].append({
+            'chunk': self.chunk, 'rows': len(rows),
+            'tiles': tiles[starts].tolist(), 'offsets': starts.tolist() + [len(rows)]})
+        self.chunk_rows = []
+
+        # The metadata is rewritten after each chunk, so a run that is stopped can still be queried
+        with open(os.path.join(self.path, 'index.json'), 'w') as index_file:
+            json.dump(self.metadata, index_file)
+
+    def close(self):
+        """Write the last, possibly partial, chunk."""
+        self._write_chunk()
+
+        with open(os.path.join(self.path, 'index.json'), 'w') as index_file:
+            json.dump(self.metadata, index_file)
+
+
+class WorldIndex:
+    """
+    A class to query the organisms of a run within a region and time window, reading only the chunks and tiles needed.
+
+    Regions and windows are given as [start, stop) pairs, and None leaves a dimension unbounded.
+    """
+
+    def __init__(self, seed):
+        """
+        World Index Initialisation
+        :param seed: The seed of the run to query
+        """
+        self.path = index_path(seed)
+        with open(os.path.join(self.path, 'index.json')) as index_file:
+            self.metadata = json.load(index_file)
+
+        self.tile_size = self.metadata['tile_size']
+        self.days = np.array(self.metadata['days'], dtype=np.int64)
+        self._chunks = {}
+
+    @staticmethod
+    def exists(seed):
+        return os.path.exists(os.path.join(index_path(seed), 'index.json'))
+
+    @staticmethod
+    def build(seed, chunk_days=100, tile_size=16):
+        """
+        Index a run that has already been recorded.
+        :param seed: The seed of the run to index
+        :param chunk_days: The number of days in each chunk
+        :param tile_size: The width and height of the square tiles, in squares
+        :return: The index of the run
+        """
+        index_writer = IndexWriter(seed, chunk_days, tile_size)
+        for day, names, values in recorded_days(seed):
+            sys.stdout.write('\r' + 'indexing world data, time: %r...' % day)
+            sys.stdout.flush()
+            index_writer.add_day(day, names, values)
+        index_writer.close()
+        print('\nindexed %d days of %s' % (len(index_writer.metadata['days']), seed))
+
+        return WorldIndex(seed)
+
+    def _chunk_rows(self, chunk):
+        if chunk['chunk'] not in self._chunks:
+            self._chunks[chunk['chunk']] = np.memmap(
+                os.path.join(self.path, 'chunk_%d.bin' % chunk['chunk']), dtype=np.int32, mode='r',
+                shape=(chunk['rows'], len(self.metadata['columns']))) if chunk['rows'] else \
+                np.zeros((0, len(self.metadata['columns'])), dtype=np.int32)
+        return self._chunks[chunk['chunk']]
+
+    def rows(self, x_range=None, y_range=None, days=None, organism=None):
+        """
+        Read the organisms in a region over a time window.
+        :param x_range: [start, stop) of x
+        :param y_range: [start, stop) of y
+        :param days: [start, stop) of time
+        :param organism: FOOD_NAME or BUG_NAME to read only one type of organism
+        :return: An array of organism names and an array of [day, x, y, energy, reproduction_threshold, taste] rows
+        """
+        unbounded = (-2 ** 31, 2 ** 31 - 1)
+        (x_start, x_stop), (y_start, y_stop), (day_start, day_stop) = [
+            unbounded if bounds is None else bounds for bounds in [x_range, y_range, days]]
+        tile_x_range = (x_start // self.tile_size, (x_stop - 1) // self.tile_size)
+        tile_y_range = (y_start // self.tile_size, (y_stop - 1) // self.tile_size)
+
+        selected = []
+        for chunk in self.metadata['chunks']:
+            chunk_start = chunk['chunk'] * self.metadata['chunk_days']
+            if chunk_start >= day_stop or chunk_start + self.metadata['chunk_days'] <= day_start:
+                continue
+
+            chunk_rows = self._chunk_rows(chunk)
+            for (tile_x, tile_y), start, stop in zip(chunk['tiles'], chunk['offsets'][:-1], chunk['offsets'][1:]):
+                if tile_x_range[0] <= tile_x <= tile_x_range[1] and tile_y_range[0] <= tile_y <= tile_y_range[1]:
+                    # Rows of a tile are in day order
+                    tile_days = chunk_rows[start:stop, 0]
+                    selected.append(chunk_rows[start + np.searchsorted(tile_days, day_start):
+                                               start + np.searchsorted(tile_days, day_stop)])
+
+        rows = np.concatenate(selected) if selected else np.zeros((0, len(self.metadata['columns'])), dtype=np.int32)
+        keep = (rows[:, 2] >= x_start) & (rows[:, 2] < x_stop) & (rows[:, 3] >= y_start) & (rows[:, 3] < y_stop)
+        if organism is not None:
+            keep &= rows[:, 1] == ORGANISM_CODES[organism]
+
+        rows = rows[keep]
+        rows = rows[np.argsort(rows[:, 0], kind='stable')]
+        return ORGANISM_NAMES[rows[:, 1]], np.delete(rows, 1, axis=1)
+
+    def window_days(self, days=None):
+        """Return the recorded days in a [start, stop) window."""
+        if days is None:
+            return self.days
+        return self.days[np.searchsorted(self.days, days[0]):np.searchsorted(self.days, days[1])]
+
+    def counts(self, x_range=None, y_range=None, days=None, organism=None):
+        """
+        Count the organisms in a region on each day of a time window.
+        :return: An array of the recorded days and an array of counts
+        """
+        _, rows = self.rows(x_range, y_range, days, organism)
+        window_days = self.window_days(days)
+        return window_days, np.bincount(np.searchsorted(window_days, rows[:, 0]), minlength=len(window_days))
+
+    def aggregate(self, column, statistic='mean', x_range=None, y_range=None, days=None, organism=None):
+        """
+        Summarise a column of the organisms in a region on each day of a time window.
+        :param column: 'energy', 'reproduction_threshold' or 'taste'
+        :param statistic: 'mean', 'sum', 'min' or 'max', the mean of taste is taken around the circle of tastes
+        :return: An array of the recorded days and an array of the statistic, nan on days with no organisms
+        """
+        _, rows = self.rows(x_range, y_range, days, organism)
+        window_days = self.window_days(days)
+        values = rows[:, ['day', 'x', 'y', 'energy', 'reproduction_threshold', 'taste'].index(column)].astype(float)
+        day_index = np.searchsorted(window_days, rows[:, 0])
+
+        counts = np.bincount(day_index, minlength=len(window_days))
+        if statistic == 'mean' and column == 'taste':
+            # Taste is an angle, so average it in polar co-ordinates as get_taste_average does
+            radians = np.radians(values)
+            sin_sum = np.bincount(day_index, weights=np.sin(radians), minlength=len(window_days))
+            cos_sum = np.bincount(day_index, weights=np.cos(radians), minlength=len(window_days))
+            result = np.degrees(np.arctan2(sin_sum, cos_sum)) % 360
+            result[counts == 0] = np.nan
+            return window_days, result
+        elif statistic in ['mean', 'sum']:
+            result = np.bincount(day_index, weights=values, minlength=len(window_days))
+            if statistic == 'mean':
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    result = result / counts
+            return window_days, result
+        elif statistic in ['min', 'max']:
+            result = np.full(len(window_days), np.inf if statistic == 'min' else -np.inf)
+            (np.minimum if statistic == 'min' else np.maximum).at(result, day_index, values)
+            result[counts == 0] = np.nan
+            return window_days, result
+        else:
+            raise ValueError('unknown statistic %r' % statistic)
+
+
+if __name__ == '__main__':
+    for index_seed in sys.argv[1:]:
+        WorldIndex.build(index_seed)
@@ -2,6 +2,7 @@ import os
 from collections import OrderedDict
 from shutil import move
 from tempfile import mkstemp
+import config as cfg
 from utility_methods import *
 
 
@@ -33,6 +34,12 @@ class WorldRecorder:
 
         self.organism_data = {'food': food_dict, 'bug': bug_dict}
 
+        # Online fit of the population dynamics, updated with each day's statistics
+        self.lv_estimator = None
+        if cfg.lv_estimation_window:
+            from lv_estimator import LotkaVolterraEstimator
+            self.lv_estimator = LotkaVolterraEstimator(world.rows * world.columns, cfg.lv_estimation_window)
+
         # Create output directories if they don't exist
         for path in ['world', 'data_files']:
             if not os.path.exists(os.path.join('data', world.seed, path)):
@@ -50,8 +57,58 @@ class WorldRecorder:
         os.close(fd)  # prevent file descriptor leakage
         move(new_path, os.path.join('data', world.seed, 'config.py'))  # move new file
 
+        # Statistics are generated every day and only the days due are written, the world data is only generated
+        # on the days due
+        from recording_policy import RecordingPolicy
+        self.stats_policy = RecordingPolicy(cfg.stats_policy, cfg.stats_interval, cfg.log_days_per_decade,
+                                            cfg.change_threshold, cfg.change_max_gap)
+        self.world_data_policy = RecordingPolicy(cfg.world_data_policy, cfg.world_data_interval,
+                                                 cfg.log_days_per_decade, cfg.change_threshold, cfg.change_max_gap)
+        self.stats_days_due = set()
+
+        # The optional recordings are only imported when they are switched on, so a plain run does not load them
+        self.world_history, self.histogram_writer, self.lineage_tracker, self.world_index = None, None, None, None
+        if cfg.world_data_format == 'history':
+            # Log the world as events with keyframes instead of a CSV file per day
+            from world_history import HistoryWriter
+            self.world_history = HistoryWriter(world, cfg.history_keyframe_interval)
+        if cfg.gene_histograms:
+            from gene_histograms import HistogramWriter
+            self.histogram_writer = HistogramWriter(world)
+        if cfg.lineage_tracking:
+            from lineage import LineageTracker
+            self.lineage_tracker = LineageTracker(world)
+        if cfg.world_index:
+            from world_index import IndexWriter
+            self.world_index = IndexWriter(world.seed, cfg.index_chunk_days, cfg.index_tile_size)
+
+        # Keep the run and its statistics in the catalogue of runs as well as in its own directory
+        self.run_catalogue, self.run_id = None, None
+        if cfg.run_catalogue:
+            from run_catalogue import RunCatalogue, config_columns
+            self.run_catalogue = RunCatalogue()
+            self.run_id = self.run_catalogue.add_run(dict(config_columns(cfg), seed=world.seed))
+
+        # Statistics are appended to the CSV files as the world runs, so start them empty
+        for organism in ['food', 'bug']:
+            open(self.world_stats_path(organism), 'w').close()
+
+    def world_stats_path(self, organism):
+        return os.path.join('data', self.world.seed, 'data_files', str(organism) + '_data.csv')
+
+    def change_signal(self):
+        """Return the populations and average reproduction thresholds watched by the 'change' recording policies."""
+        signal = []
+        for organism in ['food', 'bug']:
+            alive = self.world.organism_lists[organism]['alive']
+            signal += [len(alive), average_rep_thresh([alive])]
+        return signal
+
     def generate_world_stats(self):
         """Add statistics for the current world iteration to a list."""
+        # Write out a full chunk first, so the latest day is always held in the lists
+        if len(self.organism_data['food']['time']) >= cfg.stats_flush_interval:
+            self.flush_world_stats()
 
         world_param = ['time', 'energy', 'population', 'deaths', 'average_deaths', 'average_alive_lifetime',
                        'average_lifespan', 'average_reproduction_threshold']
@@ -60,30 +117,103 @@ class WorldRecorder:
             alive = self.world.organism_lists[organism]['alive']
             dead = self.world.organism_lists[organism]['dead']
 
+            # Set aside plants are only caught up when the world data is written, add the lifetime they are owed
+            alive_lifetime = average_lifetime([alive])
+            if organism == 'food' and alive:
+                alive_lifetime += self.world.pending_lifetime() / len(alive)
+
             world_append = [self.world.time, sum_list_energy(alive), len(alive), len(dead[-1]),
-                            sum([len(i) for i in dead[-10:]]) / 10, average_lifetime([alive]),
+                            sum([len(i) for i in dead[-10:]]) / 10, alive_lifetime,
                             average_lifetime(dead[-10:]), average_rep_thresh([alive])]
 
             for param_list, x in zip(world_param, world_append):
                 self.organism_data[organism][param_list].append(x)
 
-    def output_world_stats(self):
-        """Output statistics in CSV (comma-separated values) format for analysis."""
+        stats_due = self.stats_policy.due(self.world.time, [self.organism_data[organism][param_list][-1]
+                                                            for organism in ['food', 'bug'] for param_list in
+                                                            ['population', 'average_reproduction_threshold']])
+        if stats_due:
+            self.stats_days_due.add(self.world.time)
 
-        print('outputting world statistics...')
+        if self.histogram_writer is not None and stats_due:
+            self.histogram_writer.write_day()
+
+        if self.lineage_tracker is not None and self.world.time % cfg.lineage_prune_interval == 0:
+            self.lineage_tracker.prune()
 
+        if self.lv_estimator is not None:
+            self.lv_estimator.update(self.world.time, len(self.world.organism_lists['food']['alive']),
+                                     len(self.world.organism_lists['bug']['alive']))
+
+    def flush_world_stats(self, final=False):
+        """
+        Append the statistics of the days due held in the lists to the CSV (comma-separated values) files and empty
+        the lists.
+        :param final: Set to True to also write the latest day, so the end of a run is always recorded
+        """
+        days_due = self.stats_days_due
+        if final and self.organism_data['food']['time']:
+            days_due.add(self.organism_data['food']['time'][-1])
+
+        catalogue_rows = []
         for organism in ['food', 'bug']:
-            with open(os.path.join('data', self.world.seed, 'data_files', str(organism) + '_data.csv'),
-                      'w') as organism_file:
+            with open(self.world_stats_path(organism), 'a') as organism_file:
                 for time, energy, population, dead_population, average_dead_population, average_alive_lifetime, \
                         average_lifespan, average_reproduction_threshold in zip(*self.organism_data[organism].values()):
+                    if time not in days_due:
+                        continue
                     organism_file.write(
                         '%r,' % time + '%r,' % energy + '%r,' % population + '%r,' % dead_population
                         + '%r,' % average_dead_population + '%r,' % average_alive_lifetime + '%r,' % average_lifespan
                         + '%r,' % average_reproduction_threshold + '\n')
 
+                if cfg.stats_fsync:
+                    organism_file.flush()
+                    os.fsync(organism_file.fileno())
+
+            if self.run_catalogue is not None:
+                catalogue_rows += [(self.run_id, organism) + row for row in zip(*self.organism_data[organism].values())
+                                   if row[0] in days_due]
+
+            for param_list in self.organism_data[organism].values():
+                del param_list[:]
+        days_due.clear()
+
+        if catalogue_rows:
+            self.run_catalogue.add_stats(catalogue_rows)
+
+    def output_world_stats(self):
+        """Output statistics in CSV (comma-separated values) format for analysis."""
+
+        print('outputting world statistics...')
+        self.flush_world_stats(final=True)
+
+        if self.world_history is not None:
+            self.world_history.close()
+
+        if self.histogram_writer is not None:
+            self.histogram_writer.close()
+
+        if self.world_index is not None:
+            self.world_index.close()
+
+        if self.lineage_tracker is not None:
+            self.lineage_tracker.save(os.path.join('data', self.world.seed, 'data_files', 'lineage.npz'))
+
+        if self.run_catalogue is not None:
+            self.run_catalogue.finish_run(self.run_id, self.world.time)
+            self.run_catalogue.close()
+
+    def records_world_data(self):
+        """Return True if the world data of the current world iteration is recorded."""
+        return cfg.world_data_format != 'none' and self.world_data_policy.due(self.world.time, self.change_signal)
+
     def generate_world_data(self):
         """Add data for the current world iteration to a list."""
+        if self.world_history is not None or not self.records_world_data():
+            return
+
+        self.world.sync_dormant()
 
         organism_param = ['organism', 'x', 'y', 'energy', 'reproduction_threshold', 'taste']
 
@@ -103,6 +233,16 @@ class WorldRecorder:
     def output_world_data(self):
         """Output data in CSV (comma-separated values) format for each day."""
 
+        if not self.records_world_data():
+            return
+
+        if self.world_index is not None:
+            self.world_index.add_world(self.world)
+
+        if self.world_history is not None:
+            self.world_history.end_day()
+            return
+
         organism_param = ['organism', 'x', 'y', 'energy', 'reproduction_threshold', 'taste']
 
         with open(os.path.join('data', self.world.seed, 'data_files', 'world_data',
@@ -8,6 +8,11 @@ from matplotlib import pyplot as plt
 from matplotlib import collections as col
 import config as cfg
 from constants import FOOD_NAME, BUG_NAME
+from world_archive import WorldArchive
+from world_history import HistoryReader
+from gene_histograms import HistogramReader, TASTE_BIN, REPRODUCTION_THRESHOLD_BIN, TASTE_BINS
+from render_manifest import RenderManifest
+from tile_pyramid import TilePyramid
 
 
 class WorldViewer:
@@ -21,14 +26,33 @@ class WorldViewer:
         :param seed: The seed value for data to output
         """
         self.seed = seed
-
-        # World plotting axis initialisation
-        self.ax = plt.figure(figsize=(cfg.fig_size, cfg.fig_size)).add_subplot(1, 1, 1)
-        self.ax.set_xlim(0, cfg.world['settings']['columns'])
-        self.ax.set_ylim(0, cfg.world['settings']['rows'])
-        # Turn off axis labels
-        self.ax.xaxis.set_visible(False)
-        self.ax.yaxis.set_visible(False)
+        self._gene_figures = {}  # gene plots are kept open and updated in place for each day
+
+        # Read through the consolidated store of the run if it has been archived
+        self.archive = WorldArchive(seed) if WorldArchive.exists(seed) else None
+        self.history = HistoryReader(seed) if HistoryReader.exists(seed) else None
+        self.gene_histograms = HistogramReader(seed) if HistogramReader.exists(seed) else None
+
+        # Images already drawn from the same data and settings are not drawn again
+        self.render_manifest = RenderManifest(seed, {
+            'fig_size': cfg.fig_size, 'rows': cfg.world['settings']['rows'],
+            'columns': cfg.world['settings']['columns'], 'check_newly_spawned_plants': cfg.check_newly_spawned_plants,
+            'check_newly_spawned_bugs': cfg.check_newly_spawned_bugs, 'food': cfg.food, 'bug': cfg.bug})
+
+        # The world plotting axis is only created when the world is first plotted
+        self._ax = None
+
+    @property
+    def ax(self):
+        if self._ax is None:
+            # World plotting axis initialisation
+            self._ax = plt.figure(figsize=(cfg.fig_size, cfg.fig_size)).add_subplot(1, 1, 1)
+            self._ax.set_xlim(0, cfg.world['settings']['rows'])  # x indexes the rows of the world grid
+            self._ax.set_ylim(0, cfg.world['settings']['columns'])
+            # Turn off axis labels
+            self._ax.xaxis.set_visible(False)
+            self._ax.yaxis.set_visible(False)
+        return self._ax
 
     def view_world(self, world):
         """"Plot the world: rectangles=food, circles=bugs."""
@@ -105,8 +129,11 @@ class WorldViewer:
         plt.savefig(os.path.join('data', world.seed, 'world', '%s.png' % world.time))
         plt.cla()
 
-    def plot_world_stats(self):
-        """Read the CSV (comma-separated values) data files and plot the world statistics."""
+    def plot_world_stats(self, force=False):
+        """
+        Read the CSV (comma-separated values) data files and plot the world statistics.
+        :param force: Set to True to plot the statistics even if the plots are up to date
+        """
 
         print('reading & plotting world statistics...')
 
@@ -114,6 +141,13 @@ class WorldViewer:
         if not os.path.exists(os.path.join('data', self.seed, 'world_statistics')):
             os.makedirs(os.path.join('data', self.seed, 'world_statistics'))
 
+        # The plots are up to date if they were drawn from the same statistics
+        stats_files = []
+        for path in ['food_data', 'bug_data']:
+            with open(os.path.join('data', self.seed, 'data_files', path + '.csv'), 'rb') as stats_file:
+                stats_files.append(stats_file.read())
+        stats_key = self.render_manifest.key('stats', *stats_files)
+
         data = [(np.genfromtxt(os.path.join('data', self.seed, 'data_files', path + '.csv'), delimiter=',',
                                names=['time', 'energy', 'population', 'deaths', 'average_deaths',
                                       'average_alive_lifetime', 'average_lifespan', 'average_reproduction_threshold']))
@@ -190,28 +224,46 @@ class WorldViewer:
         data_to_plot.append({'data': data15, 'x_label': 'Time', 'y_label': 'Average Lifetime', 'y_lim': None,
                              'title': 'World Lifetimes', 'filename': 'world_lifetime.png'})
 
-        for data_dict in data_to_plot:
+        outputs = [os.path.join('data', self.seed, 'world_statistics', data_dict['filename'])
+                   for data_dict in data_to_plot]
+        if not force and not any(self.render_manifest.stale(output, stats_key) for output in outputs):
+            print('world statistics plots are up to date')
+            return
+
+        # Statistics written on unevenly spaced days are marked at each day, so gaps are not read as recorded data
+        marker = '.' if len(np.unique(np.diff(time))) > 1 else None
+
+        for data_dict, output in zip(data_to_plot, outputs):
             plt.figure()
             for (y, l) in data_dict['data']:
-                plt.plot(time, y, label=l)
+                plt.plot(time, y, label=l, marker=marker)
             plt.xlabel(data_dict['x_label'])
             plt.ylabel(data_dict['y_label'])
             plt.ylim(data_dict['y_lim'])
             plt.legend(loc=0)
             plt.title(data_dict['title'])
-            plt.savefig(os.path.join('data', self.seed, 'world_statistics', data_dict['filename']))
+            plt.savefig(output)
             plt.close()
+            self.render_manifest.rendered(output, stats_key)
 
-    def plot_day_data(self, day=None, world=False):
+    def plot_day_data(self, day=None, world=False, force=False):
         """
         Reads a CSV (comma-separated values) data file and plot the world and/or gene values for that time.
         :param day: The time to plot
         :param world: Set to True to plot the world
+        :param force: Set to True to plot even if the images for the time are up to date
+        :return: True if any image was drawn
         """
 
+        plot_genes = cfg.food['evolve_reproduction_threshold'] or cfg.food['evolve_taste'] or \
+            cfg.bug['evolve_reproduction_threshold'] or cfg.bug['evolve_taste']
+
+        # Gene plots are made from the recorded gene histograms if there are any for the day
+        histograms = self.gene_histograms.read_day(day) if plot_genes and self.gene_histograms is not None and \
+            day in self.gene_histograms else None
+
         # Check world parameter and evolution switches
-        if world or cfg.food['evolve_reproduction_threshold'] or cfg.food['evolve_taste'] or \
-                cfg.bug['evolve_reproduction_threshold'] or cfg.bug['evolve_taste']:
+        if world or plot_genes:
 
             # Create output directories if they don't exist
             for switch in ['evolve_reproduction_threshold', 'evolve_taste']:
@@ -222,17 +274,24 @@ class WorldViewer:
                     if not os.path.exists(os.path.join('data', self.seed, 'bug_' + str(switch.replace("'", "")))):
                         os.makedirs(os.path.join('data', self.seed, 'bug_' + str(switch.replace("'", ""))))
 
-            # Create the list of organisms for each day
-            world_file = csv.reader(open(os.path.join('data', self.seed, 'data_files', 'world_data', '%r.csv' % day)),
-                                    delimiter=',')
-
-            organism_list = []
-            for row in world_file:
-                row.remove(row[-1])  # remove the '\n' for CSV files
-                organism_list.append(row)
-
-            organism_list = [[float(organism[i]) if i > 0 else organism[i] for i in range(len(organism))] for organism
-                             in organism_list]  # convert text values to floats
+            # Read the organisms for the day into an array of names and an array of [x, y, energy, rt, taste]
+            if world or histograms is None:
+                organism_names, organism_values = self.read_day_data(day)
+
+            # Only draw the images that are missing or were drawn from other data or settings
+            if world:
+                world_output = os.path.join('data', self.seed, 'world', '%s.png' % day)
+                world_key = self.render_manifest.key('world', day, organism_names, organism_values)
+                world = force or self.render_manifest.stale(world_output, world_key)
+            if plot_genes:
+                gene_outputs = [os.path.join('data', self.seed, organism + '_' + switch, '%s.png' % day)
+                                for organism, switches in [('food', cfg.food), ('bug', cfg.bug)]
+                                for switch in ['evolve_reproduction_threshold', 'evolve_taste'] if switches[switch]]
+                gene_key = self.render_manifest.key('genes', day, *(
+                    [histograms[name][count] for name in (FOOD_NAME, BUG_NAME)
+                     for count in ['taste', 'reproduction_threshold', 'joint']] if histograms is not None
+                    else [organism_names, organism_values]))
+                plot_genes = force or any(self.render_manifest.stale(output, gene_key) for output in gene_outputs)
 
         # Plot the world
         if world:
@@ -240,23 +299,23 @@ class WorldViewer:
             food_x_offsets, food_y_offsets, food_facecolors = ([] for _ in range(3))
             bug_widths, bug_heights, bug_x_offsets, bug_y_offsets, bug_facecolors = ([] for _ in range(5))
 
-            for organism in organism_list:
+            for name, organism in zip(organism_names, organism_values):
 
                 # Food parameters for plotting
-                if organism[0] == "'food'":
-                    hue = float(organism[5]) / 360 if cfg.food['evolve_taste'] else 0.33  # else green
+                if name == FOOD_NAME:
+                    hue = float(organism[4]) / 360 if cfg.food['evolve_taste'] else 0.33  # else green
                     # Luminosity of plant depends on energy
-                    luminosity = 0.9 - organism[3] * 0.004 if organism[3] > 20 else 0.82  # maximum luminosity value
+                    luminosity = 0.9 - organism[2] * 0.004 if organism[2] > 20 else 0.82  # maximum luminosity value
 
-                    food_x_offsets.append(organism[1] + 0.5)
-                    food_y_offsets.append(organism[2] + 0.5)
+                    food_x_offsets.append(organism[0] + 0.5)
+                    food_y_offsets.append(organism[1] + 0.5)
                     food_facecolors.append(colorsys.hls_to_rgb(hue, luminosity, 1))
 
                 # Bug parameters for plotting
-                elif organism[0] == "'bug'":
+                elif name == BUG_NAME:
 
                     # Size of bug depends on energy
-                    bug_size = organism[3] * 0.01
+                    bug_size = organism[2] * 0.01
                     if bug_size < 0.3:
                         bug_size = 0.3
                     elif bug_size > 1.0:
@@ -264,17 +323,17 @@ class WorldViewer:
 
                     bug_widths.append(bug_size)
                     bug_heights.append(bug_size)
-                    bug_x_offsets.append(organism[1] + 0.5)
-                    bug_y_offsets.append(organism[2] + 0.5)
+                    bug_x_offsets.append(organism[0] + 0.5)
+                    bug_y_offsets.append(organism[1] + 0.5)
 
                     if cfg.bug['evolve_taste']:  # black outline with coloured dot in centre
                         bug_facecolors.append('k')
 
                         bug_widths.append(bug_size / 1.5)
                         bug_heights.append(bug_size / 1.5)
-                        bug_x_offsets.append(organism[1] + 0.5)
-                        bug_y_offsets.append(organism[2] + 0.5)
-                        bug_facecolors.append(colorsys.hls_to_rgb(float(organism[5]) / 360, 0.5, 1))
+                        bug_x_offsets.append(organism[0] + 0.5)
+                        bug_y_offsets.append(organism[1] + 0.5)
+                        bug_facecolors.append(colorsys.hls_to_rgb(float(organism[4]) / 360, 0.5, 1))
 
                     else:  # no outline
                         bug_facecolors.append('r')
@@ -282,7 +341,7 @@ class WorldViewer:
             # Add final parameters
             food_sizes = np.full(len(food_x_offsets), (
                 (cfg.fig_size * 1e5) / (cfg.world['settings']['columns'] * cfg.world['settings']['rows'])),
-                                 dtype=np.int)
+                                 dtype=int)
             food_linewidths = np.zeros(len(food_x_offsets))
             bug_angles = np.zeros(len(bug_widths))
             bug_linewidths = np.zeros(len(bug_widths))
@@ -302,120 +361,202 @@ class WorldViewer:
                                                        linewidths=bug_linewidths)
                 self.ax.add_collection(bug_collection)
 
-            plt.title('time=%s' % day, fontsize=30)
-            plt.savefig(os.path.join('data', self.seed, 'world', '%s.png' % day))
-            plt.cla()
+            # Gene figures persist between days, so draw on the world axis explicitly
+            self.ax.set_title('time=%s' % day, fontsize=30)
+            self.ax.figure.savefig(world_output)
+            self.ax.cla()
+            self.render_manifest.rendered(world_output, world_key)
 
         # Plot genes
-        if cfg.food['evolve_reproduction_threshold'] or cfg.food['evolve_taste'] or \
-                cfg.bug['evolve_reproduction_threshold'] or cfg.bug['evolve_taste']:
-
-            # Create lists of food and bug gene data for plotting
-            food_list, bug_list = [], []
-
-            for organism in organism_list:
-                if organism[0] == "'food'":
-                    food_list.append(organism)
-                elif organism[0] == "'bug'":
-                    bug_list.append(organism)
+        if plot_genes:
 
             data_to_plot = [
-                {'data': food_list, 'switch': cfg.food, 'path': 'food_evolve_reproduction_threshold', 'colour': 'g',
+                {'name': FOOD_NAME, 'switch': cfg.food, 'path': 'food_evolve_reproduction_threshold', 'colour': 'g',
                  'path2': 'food_evolve_taste', 'colour_maps': 'Greens'},
-                {'data': bug_list, 'switch': cfg.bug, 'path': 'bug_evolve_reproduction_threshold', 'colour': 'r',
+                {'name': BUG_NAME, 'switch': cfg.bug, 'path': 'bug_evolve_reproduction_threshold', 'colour': 'r',
                  'path2': 'bug_evolve_taste', 'colour_maps': 'Reds'}]
 
             for organism_data in data_to_plot:  # for food and bugs
 
-                rep_thresh = [organism[4] for organism in organism_data['data']]
-                max_rep_thresh = int(max(rep_thresh)) if rep_thresh else 0
+                # Count the organisms with each reproduction threshold, and in each bin of taste and threshold
+                if histograms is not None:
+                    rep_thresh_counts = histograms[organism_data['name']]['reproduction_threshold']
+                    joint_counts = histograms[organism_data['name']]['joint']
+                else:
+                    genes = organism_values[organism_names == organism_data['name']]
+                    rep_thresh_counts, joint_counts = self.count_genes(genes[:, 3].astype(int),
+                                                                       genes[:, 4].astype(int))
+
+                rep_counts, z, x_edges, y_edges, x_max = self.gene_frequencies(rep_thresh_counts, joint_counts)
 
                 # 1D Plot (bar chart)
                 if organism_data['switch']['evolve_reproduction_threshold']:
-
-                    # Reproduction threshold dictionary sets axis plot range
-                    rep_dict = {j: 0 for j in range(101)} if max_rep_thresh <= 100 else {j: 0 for j in
-                                                                                         range(max_rep_thresh + 1)}
-
-                    for organism in organism_data['data']:
-                        # Count number of occurrences of each reproduction threshold
-                        rep_dict[organism[4]] += 1
-
-                    y_pos = np.arange(len(rep_dict.keys()))  # set centre values for bars
-                    total = sum(rep_dict.values())
-                    if total > 0:
-                        for key, value in rep_dict.items():
-                            rep_dict[key] = value / total  # normalisation
-
-                    plt.figure()
-                    plt.bar(y_pos, rep_dict.values(), align='center', color=organism_data['colour'])
-                    if not rep_thresh:
-                        plt.ylim(0, 1)
-                    plt.xlabel('Reproduction Threshold')
-                    plt.ylabel('Population')
-                    plt.title('time=%s' % day)
-                    plt.savefig(os.path.join('data', self.seed, organism_data['path'], '%s.png' % day))
-                    plt.close()
+                    self._plot_gene_bars(organism_data['path'], day, rep_counts, organism_data['colour'])
 
                 # 2D Plot (heat map)
                 if organism_data['switch']['evolve_taste']:
+                    self._plot_gene_heat_map(organism_data['path2'], day, z, x_edges, y_edges, x_max,
+                                             organism_data['colour_maps'])
 
-                    # Create lists of gene data
-                    taste = [organism[5] for organism in organism_data['data']]
-
-                    # Create and set co-ordinate values in gene space
-                    x = [j for j in range(51)] if max_rep_thresh <= 100 else [j for j in
-                                                                              range((int(max_rep_thresh / 2) + 1))]
-                    y = [j for j in range(61)]
-
-                    # Bin values into binned co-ordinate values
-                    rep_thresh = [int(j / 2) for j in rep_thresh]
-                    taste = [int(j / 6) for j in taste]
-
-                    # Set 2D co-ordinate values
-                    z = [[0 for _ in range(len(x))] for _ in range(len(y))]
-                    z_list = [list(j) for j in zip(rep_thresh, taste)]
-
-                    # Update population frequencies
-                    for coordinates in z_list:
-                        z[coordinates[1]][coordinates[0]] += 1 / len(z_list)
-
-                    # Expand binned data to fit plot
-                    x = [j * 2 for j in x]
-                    y = [j * 6 for j in y]
-
-                    xi, yi = np.meshgrid(x, y)
-                    zi = np.array(z)
-
-                    plt.figure()
-                    plt.pcolormesh(xi, yi, zi, cmap=organism_data['colour_maps'])
-                    plt.colorbar()
-                    plt.xlim(0, 100) if max_rep_thresh <= 100 else plt.xlim(0, max_rep_thresh)
-                    plt.ylim(0, 360)
-                    plt.xlabel('Reproduction Threshold')
-                    plt.ylabel('Taste')
-                    plt.title('time=%s' % day)
-                    plt.savefig(os.path.join('data', self.seed, organism_data['path2'], '%s.png' % day))
-                    plt.close()
-
-    def plot_world_data(self, days=None, start=0, plot_world=False):
+            for output in gene_outputs:
+                self.render_manifest.rendered(output, gene_key)
+
+        return world or plot_genes
+
+    @staticmethod
+    def count_genes(rep_thresh, taste):
+        """
+        Count organisms by gene.
+        :param rep_thresh: Integer array of reproduction thresholds
+        :param taste: Integer array of tastes
+        :return: Counts of each reproduction threshold, and counts in bins of reproduction threshold by taste
+        """
+        rep_thresh_counts = np.bincount(rep_thresh)
+        joint_counts = np.zeros((len(rep_thresh_counts) // REPRODUCTION_THRESHOLD_BIN + 1, TASTE_BINS))
+        np.add.at(joint_counts, (rep_thresh // REPRODUCTION_THRESHOLD_BIN, taste // TASTE_BIN), 1)
+        return rep_thresh_counts, joint_counts
+
+    @staticmethod
+    def gene_frequencies(rep_thresh_counts, joint_counts):
+        """
+        Normalise gene counts into the population frequencies plotted.
+        :param rep_thresh_counts: Counts of each reproduction threshold
+        :param joint_counts: Counts in bins of reproduction threshold by taste
+        :return: Bar heights of each reproduction threshold, the heat map of taste by reproduction threshold, its x and
+        y bin edges, and the x axis limit
+        """
+        population = rep_thresh_counts.sum()
+        max_rep_thresh = int(np.flatnonzero(rep_thresh_counts)[-1]) if population else 0
+
+        # Occurrences of each reproduction threshold, the number of bars sets axis plot range
+        rep_counts = np.zeros(101 if max_rep_thresh <= 100 else max_rep_thresh + 1)
+        counted = rep_thresh_counts[:max_rep_thresh + 1]  # no counts at all for an empty population
+        rep_counts[:len(counted)] = counted
+
+        # Bin reproduction threshold in 2s and taste in 6s, giving population frequencies in gene space
+        x_max = 100 if max_rep_thresh <= 100 else max_rep_thresh
+        x_edges = np.arange(0, 2 * (int(x_max / 2) + 1) + 1, 2)
+        y_edges = np.arange(0, 6 * 61 + 1, 6)
+        z = np.zeros((len(y_edges) - 1, len(x_edges) - 1))
+        joint_counts = joint_counts[:len(x_edges) - 1]
+        z[:TASTE_BINS, :len(joint_counts)] = joint_counts.T
+
+        if population:
+            rep_counts = rep_counts / population  # normalisation
+            z /= population
+        return rep_counts, z, x_edges, y_edges, x_max
+
+    def read_day_data(self, day):
+        """
+        Read the organisms alive at a time.
+        :param day: The time to read
+        :return: An array of organism names and an array of [x, y, energy, reproduction_threshold, taste] rows
         """
-        Plot the data for a range of times.
-        :param days: Number of days to plot
+        if self.archive is not None and day in self.archive:
+            return self.archive.read_day(day)
+        if self.history is not None and day in self.history:
+            return self.history.read_day(day)
+
+        with open(os.path.join('data', self.seed, 'data_files', 'world_data', '%r.csv' % day)) as world_file:
+            rows = [row[:-1] for row in csv.reader(world_file, delimiter=',')]  # remove the '\n' for CSV files
+
+        organism_names = np.array([row[0].strip("'") for row in rows], dtype=str)
+        organism_values = np.array([row[1:] for row in rows], dtype=float).reshape(-1, 5)
+
+        return organism_names, organism_values
+
+    def _plot_gene_bars(self, path, day, heights, colour):
+        """Update the bar chart for a gene in place, only rebuilding it if the number of bars changes."""
+
+        figure = self._gene_figures.get(path)
+        if figure is None or len(figure['bars']) != len(heights):
+            if figure is not None:
+                plt.close(figure['figure'])
+            fig = plt.figure()
+            ax = fig.add_subplot(1, 1, 1)
+            bars = ax.bar(np.arange(len(heights)), heights, align='center', color=colour)
+            ax.set_xlabel('Reproduction Threshold')
+            ax.set_ylabel('Population')
+            figure = self._gene_figures[path] = {'figure': fig, 'ax': ax, 'bars': bars}
+        else:
+            for bar, height in zip(figure['bars'], heights):
+                bar.set_height(height)
+
+        top = heights.max() if len(heights) else 0
+        figure['ax'].set_ylim(0, top * 1.05 if top > 0 else 1)
+        figure['ax'].set_title('time=%s' % day)
+        figure['figure'].savefig(os.path.join('data', self.seed, path, '%s.png' % day))
+
+    def _plot_gene_heat_map(self, path, day, z, x_edges, y_edges, x_max, colour_map):
+        """Update the heat map for a pair of genes in place."""
+
+        extent = (x_edges[0], x_edges[-1], y_edges[0], y_edges[-1])
+        figure = self._gene_figures.get(path)
+        if figure is None:
+            fig = plt.figure()
+            ax = fig.add_subplot(1, 1, 1)
+            image = ax.imshow(z, cmap=colour_map, origin='lower', extent=extent, aspect='auto',
+                              interpolation='nearest')
+            fig.colorbar(image, ax=ax)
+            ax.set_ylim(0, 360)
+            ax.set_xlabel('Reproduction Threshold')
+            ax.set_ylabel('Taste')
+            figure = self._gene_figures[path] = {'figure': fig, 'ax': ax, 'image': image}
+        else:
+            figure['image'].set_data(z)
+            figure['image'].set_extent(extent)
+
+        figure['image'].set_clim(z.min(), z.max() if z.max() > z.min() else z.min() + 1)
+        figure['ax'].set_xlim(0, x_max)
+        figure['ax'].set_ylim(0, 360)
+        figure['ax'].set_title('time=%s' % day)
+        figure['figure'].savefig(os.path.join('data', self.seed, path, '%s.png' % day))
+
+    def plot_tile_pyramid(self, days=None, start=0, full_resolution=False):
+        """
+        Draw the recorded days as zoomable map tiles, viewed with data/<seed>/tiles/index.html, for worlds too large
+        for one image. See tile_pyramid.py to draw the zoomed tiles on demand.
+        :param days: Number of days from the start time to draw
+        :param start: Start time
+        :param full_resolution: Set to True to draw the zoomed tiles now rather than on demand
+        """
+        print('drawing map tiles...')
+        return TilePyramid(self.seed).build(days, start, full_resolution)
+
+    def plot_world_data(self, days=None, start=0, plot_world=False, force=False):
+        """
+        Plot the data for a range of times, skipping the times whose images are up to date.
+        :param days: Number of days from the start time to plot
         :param start: Start time
         :param plot_world: Set to True to plot the world
+        :param force: Set to True to plot every time even if its images are up to date
         """
 
-        # Counts number of CSV (comma-separated values) data files, equivalent to the total number of days simulated
-        total_days = len(
-            fnmatch.filter(os.listdir(os.path.join('data', self.seed, 'data_files', 'world_data')), '*.csv'))
+        # The days with world data, which are not every day if the world data was recorded at an interval
+        if self.archive is not None:
+            recorded_days = self.archive.days.tolist()
+        elif self.history is not None:
+            recorded_days = self.history.days.tolist()
+        else:
+            recorded_days = sorted(int(name[:-len('.csv')]) for name in fnmatch.filter(
+                os.listdir(os.path.join('data', self.seed, 'data_files', 'world_data')), '*.csv'))
+
+        # Without world data the genes can still be plotted from the gene histograms
+        if not recorded_days and not plot_world and self.gene_histograms is not None:
+            recorded_days = self.gene_histograms.days.tolist()
 
-        if days is None or days > total_days:
-            days = total_days - start
+        plot_days = [day for day in recorded_days if day >= start]
+        if days is not None:
+            plot_days = [day for day in plot_days if day < start + days]
 
         # Plot the data for each day
-        for i in range(days):
+        plotted = 0
+        for day in plot_days:
             sys.stdout.write(
-                '\r' + 'reading & plotting world data, time: %r' % (start + i) + '/%r' % (total_days - 1) + '...')
+                '\r' + 'reading & plotting world data, time: %r' % day + '/%r' % recorded_days[-1] + '...')
             sys.stdout.flush()
-            self.plot_day_data(day=start + i, world=plot_world)
+            plotted += self.plot_day_data(day=day, world=plot_world, force=force)
+
+        if plot_days:
+            print('\n%d of %d days plotted' % (plotted, len(plot_days))
+                  + (', %d were up to date' % (len(plot_days) - plotted) if plotted < len(plot_days) else ''))